@@ -7,18 +7,40 @@
 
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
 import requests
-import json
 import uuid
 import time
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 import logging
 import os
+import zlib
+import functools
+import math
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import Counter
 from dataclasses import dataclass, asdict
-from enum import Enum
+from models import Notification, NotificationType, Priority
+from notification_store import InvalidCursor, RetentionPolicy, WaiterLimit, parse_timestamp
+from storage import create_storage
+from circuit_breaker import CircuitOpenError
+from http_pool import (HTTP_TIMEOUT, SessionCache, auth_headers, breakers, get_session, is_notification_id,
+                       origin_of, pool_stats, rejects_items, upstream_request)
+from delivery_queue import DeliveryQueue, QueueFull
+from webhook_fanout import WebhookFanout
+from token_cache import TokenCache, token_expiry
+from feed_cache import FEED_CACHE_SIZE, FragmentCache
+from response_compression import CODECS, compress_response, encoded_etag
+from log_pipeline import JsonPayload, payload_logger, setup_logging
+import metrics
+from profiling import (ADMIN_TOKEN_HEADER, AllocationTracker, ProfilingMiddleware, SamplerBusy, StackSampler,
+                       authorized, collapsed, view_ranges)
+from werkzeug.exceptions import HTTPException
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# 配置日志：请求线程只把记录放入队列，格式化和写出在后台线程中进行
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()  # 日志级别
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.1'))  # 记录请求载荷详细日志的比例，1为全部记录
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # 日志队列容量，满时丢弃新记录
+log_pipeline = setup_logging(LOG_LEVEL, LOG_PAYLOAD_SAMPLE_RATE, LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -27,36 +49,72 @@ app.secret_key = 'demo_secret_key_change_in_production'
 # 配置
 HUISHEEN_BASE_URL = os.getenv('HUISHEEN_BASE_URL', 'http://localhost:3000')
 DEMO_BASE_URL = os.getenv('DEMO_BASE_URL', 'http://localhost:5000')
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'memory')  # memory 或 sqlite
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'demo.db')
+BATCH_PUSH_CONCURRENCY = int(os.getenv('BATCH_PUSH_CONCURRENCY', '8'))  # 批量推送的上游并发数
+BATCH_PUSH_MAX_ITEMS = int(os.getenv('BATCH_PUSH_MAX_ITEMS', '1000'))  # 单次批量推送的最大条数
+DELIVERY_WORKERS = int(os.getenv('DELIVERY_WORKERS', '4'))  # 异步投递的后台线程数
+DELIVERY_QUEUE_SIZE = int(os.getenv('DELIVERY_QUEUE_SIZE', '1000'))  # 异步投递队列容量
+DELIVERY_MAX_ATTEMPTS = int(os.getenv('DELIVERY_MAX_ATTEMPTS', '5'))  # 单条推送的最大尝试次数
+EXTERNAL_CALL_DEADLINE = float(os.getenv('EXTERNAL_CALL_DEADLINE', '5'))  # 外部API单次上游调用的截止时间（秒）
+EXTERNAL_CONCURRENCY = int(os.getenv('EXTERNAL_CONCURRENCY', '16'))  # 外部API并发上游调用的线程数
+BATCH_READ_CHUNK_SIZE = int(os.getenv('BATCH_READ_CHUNK_SIZE', '100'))  # 批量标记已读每次请求的ID数
+STREAM_CHUNK_ITEMS = int(os.getenv('STREAM_CHUNK_ITEMS', '50'))  # 流式响应每个分块包含的通知数
+STREAM_MIMETYPE = 'application/stream+json'  # Accept中包含此类型时使用流式响应
+LONG_POLL_MAX_WAIT = float(os.getenv('LONG_POLL_MAX_WAIT', '60'))  # 长轮询单次最长等待（秒）
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', '15'))  # SSE空闲时发送心跳的间隔（秒）
+SSE_BATCH_SIZE = int(os.getenv('SSE_BATCH_SIZE', '100'))  # SSE每次从存储读取的通知数
+LONG_POLL_MAX_WAITERS = int(os.getenv('LONG_POLL_MAX_WAITERS', '0'))  # 每个进程同时挂起的长轮询和SSE连接上限，0为不限制
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '16'))  # webhook扇出的后台线程数
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', '1000'))  # 每个订阅者最多积压的事件数
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5'))  # 单个事件的最大尝试次数
+WEBHOOK_MAX_DELAY = float(os.getenv('WEBHOOK_MAX_DELAY', '30'))  # 重试退避的上限（秒）
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))  # 单次webhook请求超时（秒）
+WEBHOOK_MAX_SESSIONS = int(os.getenv('WEBHOOK_MAX_SESSIONS', '64'))  # 最多保留连接的webhook主机数，超出时关闭最久未使用的
+TOKEN_REFRESH_MARGIN = float(os.getenv('TOKEN_REFRESH_MARGIN', '300'))  # token距离过期不足此秒数时在后台提前刷新
+TOKEN_DEFAULT_TTL = float(os.getenv('TOKEN_DEFAULT_TTL', '0'))  # 无法从token和验证结果得知过期时间时的有效期（秒），0为长期有效
+TOKEN_REFRESH_WORKERS = int(os.getenv('TOKEN_REFRESH_WORKERS', '2'))  # 后台刷新token的线程数
+RETENTION_MAX_COUNT = int(os.getenv('RETENTION_MAX_COUNT', '0'))  # 最多保留的通知数，0为不限制
+RETENTION_MAX_AGE = float(os.getenv('RETENTION_MAX_AGE', '0'))  # 通知最长保留时间（秒），0为不限制
+RETENTION_MAX_BYTES = int(os.getenv('RETENTION_MAX_BYTES', '0'))  # 通知表近似字节数上限，0为不限制
+DEMO_ADMIN_TOKEN = os.getenv('DEMO_ADMIN_TOKEN', '')  # 性能分析接口的管理员令牌，为空时不启用
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '60'))  # 单次采样和单个请求分析的最长时间（秒）
 
 class HuisheenExternalAPI:
-    """回声外部API客户端"""
+    """
+    回声外部API客户端
+    所有实例共享同一上游主机的连接池，token只作用于当前实例的请求；
+    对应端点熔断时抛出CircuitOpenError，由调用方快速返回503
+    """
     
-    def __init__(self, base_url: str = HUISHEEN_BASE_URL):
+    def __init__(self, base_url: str = HUISHEEN_BASE_URL, token: Optional[str] = None,
+                 timeout: float = HTTP_TIMEOUT):
         self.base_url = base_url
         self.api_base = f"{base_url}/api/external"
-        self.session = requests.Session()
-        self.session.timeout = 10
+        self.session = get_session(base_url)
+        self.token = token
+        self.timeout = timeout
         
     def authenticate(self, notify_code: str, third_party_name: str = "Demo应用") -> Optional[Dict]:
         """使用通知标识码获取访问Token"""
         try:
-            response = self.session.post(f"{self.api_base}/auth", json={
+            response = upstream_request('external.auth', 'POST', f"{self.api_base}/auth", self.session, json={
                 "notifyCode": notify_code,
                 "thirdPartyName": third_party_name,
                 "thirdPartyUrl": DEMO_BASE_URL
-            })
+            }, timeout=self.timeout)
             
             if response.status_code == 201:
                 data = response.json()
-                # 设置认证头
-                self.session.headers.update({
-                    'Authorization': f'Bearer {data["token"]}'
-                })
+                # 后续请求使用新token认证
+                self.token = data["token"]
                 return data
             else:
                 logger.error(f"认证失败: {response.status_code} - {response.text}")
                 return None
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"认证请求异常: {e}")
             return None
@@ -67,7 +125,9 @@ class HuisheenExternalAPI:
             params = {"limit": limit}
             params.update(filters)
             
-            response = self.session.get(f"{self.api_base}/notifications", params=params)
+            response = upstream_request('external.notifications', 'GET', f"{self.api_base}/notifications",
+                                        self.session, params=params,
+                                        headers=auth_headers(self.token), timeout=self.timeout)
             
             if response.status_code == 200:
                 return response.json()
@@ -75,6 +135,8 @@ class HuisheenExternalAPI:
                 logger.error(f"获取通知失败: {response.status_code} - {response.text}")
                 return None
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"获取通知异常: {e}")
             return None
@@ -82,16 +144,70 @@ class HuisheenExternalAPI:
     def mark_as_read(self, notification_id: str) -> bool:
         """标记通知为已读"""
         try:
-            response = self.session.patch(f"{self.api_base}/notifications/{notification_id}/read")
+            response = upstream_request('external.read', 'PATCH',
+                                        f"{self.api_base}/notifications/{notification_id}/read", self.session,
+                                        headers=auth_headers(self.token), timeout=self.timeout)
             return response.status_code == 200
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"标记已读异常: {e}")
             return False
             
+    def batch_read_status(self, notification_ids: List[str]) -> Optional[int]:
+        """一次请求批量标记通知为已读，返回上游状态码；网络错误或熔断时返回None"""
+        try:
+            response = upstream_request('external.batch_read', 'PATCH', f"{self.api_base}/notifications/batch/read",
+                                        self.session, json={"notificationIds": notification_ids},
+                                        headers=auth_headers(self.token), timeout=self.timeout)
+            if response.status_code != 200:
+                logger.error(f"批量标记已读失败: {response.status_code} - {response.text}")
+            return response.status_code
+        except Exception as e:
+            # 熔断时该批直接记为失败，不影响其他批的结果
+            logger.error(f"批量标记已读异常: {e}")
+            return None
+            
+    def mark_batch_as_read(self, notification_ids: List[str]) -> bool:
+        """一次请求批量标记通知为已读"""
+        return self.batch_read_status(notification_ids) == 200
+            
+    def mark_chunk_as_read(self, notification_ids: List[str]) -> Dict[str, str]:
+        """标记一批通知为已读；上游因个别ID拒绝整批时二分重试，定位到被拒绝的ID"""
+        status = self.batch_read_status(notification_ids)
+        if status == 200:
+            return dict.fromkeys(notification_ids, 'read')
+        if len(notification_ids) > 1 and rejects_items(status):
+            middle = len(notification_ids) // 2
+            results = self.mark_chunk_as_read(notification_ids[:middle])
+            results.update(self.mark_chunk_as_read(notification_ids[middle:]))
+            return results
+        return dict.fromkeys(notification_ids, 'failed')
+            
+    def mark_many_as_read(self, notification_ids: List[str], chunk_size: int = BATCH_READ_CHUNK_SIZE,
+                          executor: Optional[ThreadPoolExecutor] = None) -> Dict[str, str]:
+        """
+        标记任意数量的通知为已读，按chunk_size分批请求
+        格式错误的ID不发送；提供executor时各批并发发送。
+        返回每个ID的结果：read（已标记）、failed（上游失败）、invalid（ID格式错误）
+        """
+        ids = list(dict.fromkeys(notification_ids))  # 去重并保持顺序
+        results = {notification_id: 'invalid' for notification_id in ids if not is_notification_id(notification_id)}
+        valid = [notification_id for notification_id in ids if notification_id not in results]
+        chunks = [valid[i:i + chunk_size] for i in range(0, len(valid), chunk_size)]
+        if executor is not None:
+            outcomes = list(executor.map(self.mark_chunk_as_read, chunks))
+        else:
+            outcomes = [self.mark_chunk_as_read(chunk) for chunk in chunks]
+        for outcome in outcomes:
+            results.update(outcome)
+        return {notification_id: results[notification_id] for notification_id in ids}
+            
     def get_stats(self) -> Optional[Dict]:
         """获取统计信息"""
         try:
-            response = self.session.get(f"{self.api_base}/stats")
+            response = upstream_request('external.stats', 'GET', f"{self.api_base}/stats", self.session,
+                                        headers=auth_headers(self.token), timeout=self.timeout)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -99,39 +215,25 @@ class HuisheenExternalAPI:
             logger.error(f"获取统计异常: {e}")
             return None
 
-class NotificationType(Enum):
-    INFO = "info"
-    WARNING = "warning" 
-    ERROR = "error"
-    SUCCESS = "success"
+# 数据存储（memory为进程内存储，sqlite为持久化存储）
+storage = create_storage(STORAGE_BACKEND, SQLITE_PATH, RetentionPolicy(
+    max_count=RETENTION_MAX_COUNT,
+    max_age=RETENTION_MAX_AGE,
+    max_bytes=RETENTION_MAX_BYTES
+))
+notifications_db = storage.notifications  # 带时间索引的通知表
+subscribers_db = storage.subscribers
+tokens_db = storage.tokens  # 存储已验证的token
+external_tokens_db = storage.external_tokens  # 存储外部API token
 
-class Priority(Enum):
-    LOW = "low"
-    NORMAL = "normal"
-    HIGH = "high"
-    URGENT = "urgent"
+# 长轮询和SSE连接的并发上限，超出时立即返回503，不占用处理线程
+waiter_limit = WaiterLimit(LONG_POLL_MAX_WAITERS)
 
-@dataclass
-class Notification:
-    """通知数据结构"""
-    id: str
-    title: str
-    content: str
-    type: str
-    priority: str
-    timestamp: str
-    source: str
-    callback_url: str = None  # 回调链接
-    metadata: Dict[str, Any] = None
-    
-    def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+# 批量推送共用的线程池，限制进程内同时发往回声平台的请求数
+push_executor = ThreadPoolExecutor(max_workers=BATCH_PUSH_CONCURRENCY, thread_name_prefix='push')
 
-# 内存存储（生产环境应使用数据库）
-notifications_db: List[Notification] = []
-subscribers_db: List[Dict[str, Any]] = []
-tokens_db: List[Dict[str, Any]] = []  # 存储已验证的token
-external_tokens_db: List[Dict[str, Any]] = []  # 存储外部API token
+# 被动轮询响应中每条通知的预编码JSON片段
+feed_cache = FragmentCache(FEED_CACHE_SIZE)
 
 @dataclass
 class SavedExternalToken:
@@ -156,6 +258,7 @@ class SavedToken:
     third_party_name: str
     created_at: str
     subscription_info: Dict[str, Any] = None
+    expires_at: float = None  # 过期时间（epoch秒），None为未知
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -418,69 +521,210 @@ def create_sample_notifications():
     
     notifications_db.extend(sample_notifications)
     logger.info(f"创建了 {len(sample_notifications)} 个示例通知，使用固定ID")
+    return sample_notifications
+
+def init_sample_data():
+    """
+    启动时初始化示例数据
+    进程内存储每次启动都写入；共享存储只在首次启动时由一个进程写入，
+    多个worker同时启动也不会重复写入
+    """
+    if storage.claim('sample_data') and len(notifications_db) == 0:
+        create_sample_notifications()
 
 @app.route('/')
 def index():
     """首页 - 显示第三方网站功能"""
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     return render_template('index.html', 
-                         notifications=notifications_db,
-                         subscribers=subscribers_db,
+                         notifications=[n.to_dict() for n in notifications_db],
+                         subscribers=list(subscribers_db),
                          huisheen_url=HUISHEEN_BASE_URL,
                          demo_url=DEMO_BASE_URL,
                          current_time=current_time)
 
 # ============ 被动模式 API ============
 
+def feed_etag(scope: str) -> str:
+    """
+    根据通知表版本生成强ETag（不含引号）
+    scope区分同一版本下的不同表示，例如查询参数或通知ID
+    """
+    return f"{notifications_db.generation}.{notifications_db.version}.{zlib.crc32(scope.encode()):08x}"
+
+def not_modified(etag: str):
+    """If-None-Match命中时返回空的304响应，否则返回None；压缩表示的ETag同样视为命中"""
+    for tag in [etag] + [encoded_etag(etag, encoding) for encoding in CODECS]:
+        if tag in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(tag)
+            return response
+    return None
+
+def compressed(view):
+    """按请求的Accept-Encoding压缩视图返回的响应"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = app.make_response(view(*args, **kwargs))
+        return compress_response(response, request.accept_encodings)
+    return wrapper
+
+def format_feed_notification(n: Notification) -> Dict[str, Any]:
+    """转换为回声平台期望的格式"""
+    return {
+        'id': n.id,
+        'title': n.title,
+        'content': n.content,
+        'type': n.type,
+        'priority': n.priority,
+        'timestamp': n.timestamp,
+        'source': n.source,
+        'callback_url': n.callback_url,  # 添加回调链接
+        'metadata': n.metadata or {},
+        'seq': n.seq
+    }
+
+def feed_fragment(n: Notification) -> bytes:
+    """
+    通知的紧凑JSON编码，与 /api/notifications/<id> 中的notification对象内容相同；
+    非调试模式下编码也相同，调试模式下jsonify缩进输出，片段仍保持紧凑
+    通知写入后不再修改，按 (存储实例, 序号) 缓存编码结果；未命中、已被LRU淘汰或
+    FEED_CACHE_SIZE为0时重新编码
+    """
+    return feed_cache.get_or_encode(
+        (notifications_db.generation, n.seq),
+        lambda: app.json.dumps(format_feed_notification(n), separators=(',', ':')).encode()
+    )
+
+def wants_stream() -> bool:
+    """是否使用流式响应：stream=1 或 Accept 中明确包含 STREAM_MIMETYPE"""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return any(mimetype == STREAM_MIMETYPE for mimetype, _ in request.accept_mimetypes)
+
+def empty_page_seq(start_seq: int) -> int:
+    """
+    本页为空时下一页的起点：停在当前位置；
+    通知表清空过时跳到清空时的位置，否则last_seq始终大于cursor，长轮询会立即返回
+    """
+    return max(min(start_seq, notifications_db.last_seq), notifications_db.seq_before(None))
+
+def stream_feed(start_seq: int, limit: int, gap: bool = False):
+    """
+    逐块产出被动轮询响应，JSON结构与普通响应一致
+    通知从存储中逐条读取，内存占用与limit无关
+    """
+    yield b'{"notifications":['
+    count = 0
+    last_seq = None
+    chunk = []
+    for n in notifications_db.iter_after(start_seq, limit):
+        if count:
+            chunk.append(b',')
+        chunk.append(feed_fragment(n))
+        count += 1
+        last_seq = n.seq
+        if count % STREAM_CHUNK_ITEMS == 0:
+            yield b''.join(chunk)
+            chunk = []
+
+    # 下一页从本页最后一条之后开始
+    next_seq = last_seq if last_seq is not None else empty_page_seq(start_seq)
+    chunk.append(b'],"next_cursor":')
+    chunk.append(app.json.dumps(notifications_db.encode_cursor(next_seq)).encode())
+    chunk.append(b',"retention_gap":true}\n' if gap else b'}\n')
+    yield b''.join(chunk)
+    logger.info("被动模式API调用 - 流式返回 %d 个通知", count)
+
 @app.route('/api/notifications', methods=['GET'])
+@compressed
 def get_notifications():
     """
     被动模式API - 供回声平台轮询
-    回声平台会定期调用此接口获取新通知
+    回声平台会定期调用此接口获取新通知；带wait参数时为长轮询，没有新通知则挂起等待
     """
     try:
         # 获取查询参数
+        cursor = request.args.get('cursor')  # 上次响应返回的next_cursor，优先于since
         since = request.args.get('since')  # 时间戳，获取此时间之后的通知
         limit = int(request.args.get('limit', 10))  # 限制返回数量
+        wait = min(request.args.get('wait', 0, type=float), LONG_POLL_MAX_WAIT)  # 长轮询等待秒数
         
-        # 过滤通知
-        filtered_notifications = notifications_db.copy()
-        
-        if since:
+        # 定位起点：cursor直接换算为序号，since通过时间索引二分定位
+        since_epoch = None
+        if cursor:
             try:
-                since_time = datetime.fromisoformat(since.replace('Z', '+00:00'))
-                filtered_notifications = [
-                    n for n in filtered_notifications 
-                    if datetime.fromisoformat(n.timestamp.replace('Z', '+00:00')) > since_time
-                ]
-            except ValueError:
-                logger.warning(f"无效的since参数: {since}")
-        
-        # 限制返回数量
-        filtered_notifications = filtered_notifications[:limit]
-        
-        # 转换为回声平台期望的格式
-        notifications_formatted = []
-        for n in filtered_notifications:
-            notification_dict = {
-                'id': n.id,
-                'title': n.title,
-                'content': n.content,
-                'type': n.type,
-                'priority': n.priority,
-                'timestamp': n.timestamp,
-                'source': n.source,
-                'callback_url': n.callback_url,  # 添加回调链接
-                'metadata': n.metadata or {}
-            }
-            notifications_formatted.append(notification_dict)
-        
-        logger.info(f"被动模式API调用 - 返回 {len(notifications_formatted)} 个通知")
-        
-        # 返回回声平台期望的格式
-        return jsonify({
-            'notifications': notifications_formatted
-        })
+                start_seq = notifications_db.decode_cursor(cursor)
+            except InvalidCursor:
+                return jsonify({
+                    'error': f'无效的cursor参数: {cursor}'
+                }), 400
+        else:
+            if since:
+                try:
+                    since_epoch = parse_timestamp(since)
+                except ValueError:
+                    logger.warning(f"无效的since参数: {since}")
+            start_seq = notifications_db.seq_before(since_epoch)
+        
+        # 起点早于保留窗口：中间有通知已被淘汰，从最早的保留通知继续并提示调用方
+        gap = bool(cursor or since_epoch is not None) and notifications_db.retention_gap(start_seq, since_epoch)
+        if gap:
+            start_seq = max(start_seq, notifications_db.seq_before(None))
+            logger.warning(f"轮询位置早于保留窗口，部分通知已被淘汰: cursor={cursor} since={since}")
+        
+        # 长轮询：起点之后还没有通知时挂起，直到有新通知写入或等待超时
+        if wait > 0:
+            if not waiter_limit.acquire():
+                return waiters_exhausted()
+            try:
+                notifications_db.changed.wait(lambda: notifications_db.last_seq > start_seq, wait)
+            finally:
+                waiter_limit.release()
+        
+        # 流式和整页响应的字节不同，ETag按是否流式区分；可由Accept选择表示，因此响应都带 Vary: Accept
+        stream = wants_stream()
+        scope = request.query_string.decode()
+        etag = feed_etag(f"{scope}|stream" if stream else scope)
+
+        # 通知表未变化时直接返回304，不再查询和序列化
+        unchanged = not_modified(etag)
+        if unchanged:
+            unchanged.vary.add('Accept')
+            return unchanged
+        
+        # 流式响应：边读取边发送，不在内存中拼接整页
+        if stream:
+            response = app.response_class(stream_feed(start_seq, limit, gap), mimetype='application/json')
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            if gap:
+                response.headers['X-Retention-Gap'] = '1'
+            return response
+        
+        filtered_notifications = notifications_db.after(start_seq, limit)
+        # 下一页从本页最后一条之后开始
+        if filtered_notifications:
+            next_seq = filtered_notifications[-1].seq
+        else:
+            next_seq = empty_page_seq(start_seq)
+        
+        logger.info("被动模式API调用 - 返回 %d 个通知", len(filtered_notifications))
+        
+        # 返回回声平台期望的格式，各通知直接拼接缓存的JSON片段
+        body = b''.join([
+            b'{"next_cursor":',
+            app.json.dumps(notifications_db.encode_cursor(next_seq)).encode(),
+            b',"notifications":[',
+            b','.join([feed_fragment(n) for n in filtered_notifications]),
+            b'],"retention_gap":true}\n' if gap else b']}\n'
+        ])
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.vary.add('Accept')
+        if gap:
+            response.headers['X-Retention-Gap'] = '1'
+        return response
         
     except Exception as e:
         logger.error(f"获取通知失败: {str(e)}")
@@ -488,11 +732,79 @@ def get_notifications():
             'error': str(e)
         }), 500
 
+def waiters_exhausted():
+    """挂起的长轮询和SSE连接已达上限时的503响应，带Retry-After头"""
+    response = jsonify({
+        'error': f'同时等待的连接数已达上限（{waiter_limit.limit}），请稍后重试'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def sse_event(n: Notification) -> bytes:
+    """SSE事件，id为该通知对应的cursor，重连时通过Last-Event-ID从此处继续"""
+    return b''.join([
+        b'id: ', notifications_db.encode_cursor(n.seq).encode(),
+        b'\nevent: notification\ndata: ', feed_fragment(n), b'\n\n'
+    ])
+
+@app.route('/api/notifications/stream', methods=['GET'])
+def stream_notifications():
+    """
+    被动模式SSE推送 - 保持连接，有新通知写入时立即推送
+    起点为Last-Event-ID头或cursor参数；都未提供时只推送连接之后的新通知。
+    起点之后有通知已被保留策略淘汰时，先发送一个retention_gap事件
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    if cursor:
+        try:
+            start_seq = notifications_db.decode_cursor(cursor)
+        except InvalidCursor:
+            return jsonify({
+                'error': f'无效的cursor参数: {cursor}'
+            }), 400
+    else:
+        start_seq = notifications_db.last_seq
+
+    # SSE连接在整个生命周期内占用名额，响应关闭（客户端断开）时释放
+    if not waiter_limit.acquire():
+        return waiters_exhausted()
+
+    def events():
+        seq = start_seq
+        yield b': connected\n\n'
+        while True:
+            # 连接建立时或消费过慢时，读取位置可能已落到保留窗口之外
+            if notifications_db.retention_gap(seq):
+                seq = max(seq, notifications_db.seq_before(None))
+                yield b'event: retention_gap\ndata: {}\n\n'
+            batch = notifications_db.after(seq, SSE_BATCH_SIZE)
+            if batch:
+                seq = batch[-1].seq
+                yield b''.join([sse_event(n) for n in batch])
+                continue
+            seq = empty_page_seq(seq)
+            # 空闲时定期发送注释行作为心跳，连接断开后下次写入即可发现
+            if not notifications_db.changed.wait(lambda: notifications_db.last_seq > seq, SSE_HEARTBEAT):
+                yield b': keep-alive\n\n'
+
+    logger.info("SSE连接建立 - 起始序号 %s", start_seq)
+    response = app.response_class(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 禁止反向代理缓冲
+    response.call_on_close(waiter_limit.release)
+    return response
+
 @app.route('/api/notifications/<notification_id>', methods=['GET'])
+@compressed
 def get_notification(notification_id: str):
     """获取单个通知详情"""
     try:
-        notification = next((n for n in notifications_db if n.id == notification_id), None)
+        etag = feed_etag(notification_id)
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+        
+        notification = notifications_db.get(notification_id)
         
         if not notification:
             return jsonify({
@@ -500,10 +812,12 @@ def get_notification(notification_id: str):
                 'error': '通知不存在'
             }), 404
             
-        return jsonify({
+        response = jsonify({
             'success': True,
             'notification': notification.to_dict()
         })
+        response.set_etag(etag)
+        return response
         
     except Exception as e:
         logger.error(f"获取通知详情失败: {str(e)}")
@@ -514,6 +828,311 @@ def get_notification(notification_id: str):
 
 # ============ 主动模式功能 ============
 
+class PushError(Exception):
+    """主动推送失败，携带返回给调用方的错误内容和状态码；retry_after为建议的重试等待秒数"""
+
+    def __init__(self, payload: Dict[str, Any], status_code: int, retry_after: Optional[float] = None):
+        super().__init__(payload.get('error'))
+        self.payload = payload
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def circuit_open_error(e: CircuitOpenError, step: str) -> PushError:
+    """上游端点熔断时直接失败，不等待上游超时"""
+    logger.warning(f"{e}，跳过 {step}")
+    return PushError({
+        'success': False,
+        'error': str(e),
+        'step': step,
+        'status_code': 503,
+        'retry_after': math.ceil(e.retry_after)
+    }, 503, retry_after=e.retry_after)
+
+def circuit_open_response(e: CircuitOpenError):
+    """上游端点熔断时的503响应，带Retry-After头"""
+    response = jsonify({'error': f'回声平台暂时不可用: {e}', 'retry_after': math.ceil(e.retry_after)})
+    response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+    return response, 503
+
+def upstream_error(response, step: str, prefix: str) -> PushError:
+    """把回声平台的错误响应转换为PushError，保留原始状态码"""
+    try:
+        error_detail = response.json()
+        error_message = error_detail.get('error', '未知错误')
+        error_code = error_detail.get('code', 'UNKNOWN_ERROR')
+        error_details = error_detail.get('details', {})
+
+        logger.error(f"{prefix}: {response.status_code} - {error_message}")
+
+        return PushError({
+            'success': False,
+            'error': error_message,
+            'error_code': error_code,
+            'error_details': error_details,
+            'step': step,
+            'status_code': response.status_code
+        }, response.status_code)
+    except:
+        error_msg = f"{prefix}: {response.status_code} - {response.text}"
+        logger.error(error_msg)
+
+        return PushError({
+            'success': False,
+            'error': error_msg,
+            'step': step,
+            'status_code': response.status_code
+        }, response.status_code)
+
+def parse_notify_code(notify_code: Any) -> str:
+    """从通知标识码中解析notifyId，格式不正确时抛出PushError(400)"""
+    if not notify_code:
+        raise PushError({
+            'success': False,
+            'error': '必须提供notify_code或选择已保存的token'
+        }, 400)
+
+    if not isinstance(notify_code, str) or not notify_code.startswith('notify:user:'):
+        raise PushError({'error': '通知标识码格式不正确，应为: notify:user:xxxx-xxxx-xxxx:xxxxxx@huisheen.com'}, 400)
+
+    # 处理新格式的通知标识码（支持@域名后缀）
+    # 新格式: notify:user:1234-5678-9abc:ABC123@huisheen.com
+    at_index = notify_code.find('@')
+    if at_index != -1:
+        code_without_domain = notify_code[:at_index]
+    else:
+        code_without_domain = notify_code
+
+    parts = code_without_domain.split(':')
+    if len(parts) != 4:
+        raise PushError({
+            'success': False,
+            'error': '通知标识码格式不正确'
+        }, 400)
+
+    return parts[2]  # 提取notifyId部分
+
+def check_push_target(data: Dict[str, Any]) -> None:
+    """
+    不访问上游的推送目标检查（字段类型、目标是否给出、notify_code格式），
+    不通过时抛出PushError(400)；异步推送在入队前调用，避免必然失败的推送被接受
+    """
+    type_error = push_target_type_error(data)
+    if type_error:
+        raise PushError({'success': False, 'error': type_error}, 400)
+    if data.get('use_saved_token') and data.get('notify_id'):
+        return
+    parse_notify_code(data.get('notify_code'))
+
+def resolve_push_token(data: Dict[str, Any]):
+    """
+    确定推送目标并获取token，返回 (notify_id, token, verify_result)
+    优先使用已保存且未过期的token，如果没有则验证notify_code获取新token
+    """
+    # 方式1：使用已保存的token
+    if data.get('use_saved_token') and data.get('notify_id'):
+        notify_id = data['notify_id']
+        saved_token = token_cache.get(notify_id)
+
+        if saved_token:
+            logger.info("使用已保存的token: %s", notify_id)
+            return notify_id, saved_token['token'], None
+
+        # 已过期：用保存时的notify_code重新验证
+        expired_token = tokens_db.get(notify_id)
+        if not expired_token:
+            raise PushError({
+                'success': False,
+                'error': f'未找到保存的token: {notify_id}'
+            }, 400)
+        if not expired_token.get('notify_code'):
+            raise PushError({
+                'success': False,
+                'error': f'保存的token已过期: {notify_id}'
+            }, 401)
+
+        logger.info("保存的token已过期，重新验证: %s", notify_id)
+        record, verify_result = token_cache.verify(
+            notify_id, expired_token['notify_code'], expired_token.get('third_party_name', '第三方演示服务')
+        )
+        return notify_id, record['token'], verify_result
+
+    # 方式2：使用新的notify_code验证
+    notify_code = data.get('notify_code')
+    notify_id = parse_notify_code(notify_code)
+
+    # 检查是否已经保存过未过期的token
+    existing_token = token_cache.get(notify_id)
+    if existing_token:
+        logger.info("使用已存在的token: %s", notify_id)
+        return notify_id, existing_token['token'], None
+
+    # 同一notify_id的并发验证合并为一次上游调用
+    record, verify_result = token_cache.verify(notify_id, notify_code, data.get('source', '第三方演示服务'))
+    return notify_id, record['token'], verify_result
+
+def verify_notify_code(notify_id: str, notify_code: str, source: str):
+    """调用回声平台验证notify_code，返回 (要保存的token记录, 验证结果)"""
+    verify_url = f"{HUISHEEN_BASE_URL}/api/subscriptions/active/verify"
+    verify_data = {
+        'notifyCode': notify_code,
+        'thirdPartyName': source,
+        'thirdPartyUrl': DEMO_BASE_URL
+    }
+
+    logger.info("验证新的通知标识码: %s", verify_url)
+    payload_logger.info("验证数据: %s", JsonPayload(verify_data))
+
+    try:
+        verify_response = upstream_request(
+            'push.verify', 'POST', verify_url,
+            json=verify_data,
+            headers={'Content-Type': 'application/json'},
+            timeout=HTTP_TIMEOUT
+        )
+    except CircuitOpenError as e:
+        raise circuit_open_error(e, 'verify_notify_code')
+    except requests.exceptions.RequestException as e:
+        error_msg = f"无法连接到回声平台进行验证: {str(e)}"
+        logger.error(error_msg)
+        raise PushError({
+            'success': False,
+            'error': error_msg,
+            'step': 'verify_notify_code'
+        }, 503)
+
+    if verify_response.status_code not in [200, 201]:
+        raise upstream_error(verify_response, 'verify_notify_code', '验证通知标识码失败')
+
+    verify_result = verify_response.json()
+    token = verify_result.get('token')
+
+    if not token:
+        raise PushError({
+            'success': False,
+            'error': '验证成功但未获取到token'
+        }, 500)
+
+    # 新token记录，由token_cache保存；过期时间取自JWT的exp或验证结果
+    saved_token = {
+        'notify_id': notify_id,
+        'notify_code': notify_code,
+        'token': token,
+        'third_party_name': source,
+        'created_at': get_current_timestamp(),
+        'subscription_info': verify_result,
+        'expires_at': token_expiry(token, verify_result, TOKEN_DEFAULT_TTL)
+    }
+
+    logger.info("验证成功，获得token: %s", notify_id)
+    return saved_token, verify_result
+
+token_cache = TokenCache(
+    tokens_db,
+    verify_notify_code,
+    refresh_margin=TOKEN_REFRESH_MARGIN,
+    refresh_workers=TOKEN_REFRESH_WORKERS
+)
+
+def build_push_payload(notify_id: str, token: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """构造发送到回声平台的通知数据"""
+    notification_data = {
+        'notifyId': notify_id,
+        'token': token,
+        'title': data['title'],
+        'content': data['content'],
+        'type': data.get('type', NotificationType.INFO.value),
+        'priority': data.get('priority', Priority.NORMAL.value),
+        'source': {
+            'name': data.get('source', '第三方演示服务'),
+            'url': DEMO_BASE_URL,
+            'icon': None  # 可选字段
+        },
+        'metadata': data.get('metadata', {})
+    }
+
+    # 添加回调链接（如果提供）
+    callback_url = data.get('callback_url')
+    if callback_url and callback_url.strip():
+        notification_data['callbackUrl'] = callback_url.strip()
+
+    # 只有在提供了外部ID时才添加，避免空字符串
+    external_id = data.get('external_id')
+    if external_id and external_id.strip():
+        notification_data['externalId'] = external_id.strip()
+
+    return notification_data
+
+def deliver_push(notification_data: Dict[str, Any]) -> Dict[str, Any]:
+    """把通知发送到回声平台，返回平台响应；失败时抛出PushError"""
+    send_url = f"{HUISHEEN_BASE_URL}/api/notifications/receive"
+
+    logger.info("发送通知: %s", send_url)
+    payload_logger.info("通知数据: %s", JsonPayload(notification_data))
+
+    try:
+        send_response = upstream_request(
+            'push.send', 'POST', send_url,
+            json=notification_data,
+            headers={'Content-Type': 'application/json'},
+            timeout=HTTP_TIMEOUT
+        )
+    except CircuitOpenError as e:
+        raise circuit_open_error(e, 'send_notification')
+    except requests.exceptions.RequestException as e:
+        error_msg = f"无法连接到回声平台: {str(e)}"
+        logger.error(error_msg)
+        raise PushError({
+            'success': False,
+            'error': error_msg,
+            'step': 'send_notification',
+            'status_code': 503
+        }, 503)
+
+    if send_response.status_code not in [200, 201]:
+        if send_response.status_code == 401:
+            # token被上游拒绝（过期或已撤销），下次推送时重新验证
+            token_cache.invalidate(notification_data['notifyId'])
+        raise upstream_error(send_response, 'send_notification', '发送通知失败')
+
+    result = send_response.json()
+    payload_logger.info("通知发送成功: %s", result)
+    return result
+
+def push_job(data: Dict[str, Any]) -> Dict[str, Any]:
+    """异步投递任务：解析token并发送一条通知"""
+    notify_id, token, _ = resolve_push_token(data)
+    return {
+        'notify_id': notify_id,
+        'send_result': deliver_push(build_push_payload(notify_id, token, data))
+    }
+
+def is_retryable_push(exc: Exception) -> bool:
+    """网络错误、5xx和429值得重试；token无效、参数错误等直接失败"""
+    return isinstance(exc, PushError) and (exc.status_code >= 500 or exc.status_code == 429)
+
+delivery_queue = DeliveryQueue(
+    push_job,
+    is_retryable=is_retryable_push,
+    workers=DELIVERY_WORKERS,
+    max_size=DELIVERY_QUEUE_SIZE,
+    max_attempts=DELIVERY_MAX_ATTEMPTS
+)
+delivery_queue.start()
+
+def missing_push_fields(data: Dict[str, Any]) -> List[str]:
+    """检查推送必需字段"""
+    required_fields = ['title', 'content']
+    return [field for field in required_fields if not data.get(field)]
+
+PUSH_TARGET_FIELD_TYPES = (('notify_code', str, '字符串'), ('notify_id', str, '字符串'), ('use_saved_token', bool, '布尔值'))
+
+def push_target_type_error(data: Dict[str, Any]) -> Optional[str]:
+    """检查推送目标字段的类型，类型不对时返回错误信息"""
+    for field, expected, type_name in PUSH_TARGET_FIELD_TYPES:
+        if data.get(field) is not None and not isinstance(data[field], expected):
+            return f'{field}必须是{type_name}'
+    return None
+
 @app.route('/api/send-notification', methods=['POST'])
 def send_notification():
     """
@@ -522,240 +1141,183 @@ def send_notification():
     """
     try:
         data = request.get_json()
-        
+
         # 验证必需字段
-        required_fields = ['title', 'content']
-        missing_fields = [field for field in required_fields if not data.get(field)]
-        
+        missing_fields = missing_push_fields(data)
+
         if missing_fields:
             return jsonify({
                 'success': False,
                 'error': f'缺少必需字段: {", ".join(missing_fields)}'
             }), 400
-        
-        token = None
-        notify_id = None
-        verify_result = None
-        
-        # 方式1：使用已保存的token
-        if data.get('use_saved_token') and data.get('notify_id'):
-            notify_id = data['notify_id']
-            saved_token = next((t for t in tokens_db if t['notify_id'] == notify_id), None)
-            
-            if saved_token:
-                token = saved_token['token']
-                logger.info(f"使用已保存的token: {notify_id}")
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': f'未找到保存的token: {notify_id}'
-                }), 400
-        
-        # 方式2：使用新的notify_code验证
-        elif data.get('notify_code'):
-            notify_code = data['notify_code']
-            
-            # 解析notify_code获取notifyId
-            if not notify_code.startswith('notify:user:'):
-                return jsonify({'error': '通知标识码格式不正确，应为: notify:user:xxxx-xxxx-xxxx:xxxxxx@huisheen.com'}), 400
-                
-            # 处理新格式的通知标识码（支持@域名后缀）
-            # 新格式: notify:user:1234-5678-9abc:ABC123@huisheen.com
-            at_index = notify_code.find('@')
-            if at_index != -1:
-                code_without_domain = notify_code[:at_index]
-            else:
-                code_without_domain = notify_code
-                
-            parts = code_without_domain.split(':')
-            if len(parts) != 4:
-                return jsonify({
+
+        check_push_target(data)
+
+        # 异步模式：放入投递队列后立即返回，由后台线程验证、发送和重试
+        if data.get('async'):
+            try:
+                delivery_id = delivery_queue.submit(data, notify_id=data.get('notify_id'))
+            except QueueFull:
+                response = jsonify({
                     'success': False,
-                    'error': '通知标识码格式不正确'
-                }), 400
-                
-            notify_id = parts[2]  # 提取notifyId部分
-            
-            # 检查是否已经保存过这个token
-            existing_token = next((t for t in tokens_db if t['notify_id'] == notify_id), None)
-            if existing_token:
-                token = existing_token['token']
-                logger.info(f"使用已存在的token: {notify_id}")
-            else:
-                # 验证notify_code并获取新token
-                verify_url = f"{HUISHEEN_BASE_URL}/api/subscriptions/active/verify"
-                verify_data = {
-                    'notifyCode': notify_code,
-                    'thirdPartyName': data.get('source', '第三方演示服务'),
-                    'thirdPartyUrl': DEMO_BASE_URL
-                }
-                
-                logger.info(f"验证新的通知标识码: {verify_url}")
-                logger.info(f"验证数据: {json.dumps(verify_data, ensure_ascii=False, indent=2)}")
-                
-                try:
-                    verify_response = requests.post(
-                        verify_url,
-                        json=verify_data,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=10
-                    )
-                    
-                    if verify_response.status_code not in [200, 201]:
-                        try:
-                            error_detail = verify_response.json()
-                            error_message = error_detail.get('error', '未知错误')
-                            error_code = error_detail.get('code', 'UNKNOWN_ERROR')
-                            error_details = error_detail.get('details', {})
-                            
-                            logger.error(f"验证通知标识码失败: {verify_response.status_code} - {error_message}")
-                            
-                            return jsonify({
-                                'success': False,
-                                'error': error_message,
-                                'error_code': error_code,
-                                'error_details': error_details,
-                                'step': 'verify_notify_code',
-                                'status_code': verify_response.status_code
-                            }), verify_response.status_code  # 保留原始状态码
-                        except:
-                            error_msg = f"验证通知标识码失败: {verify_response.status_code} - {verify_response.text}"
-                            logger.error(error_msg)
-                            
-                            return jsonify({
-                                'success': False,
-                                'error': error_msg,
-                                'step': 'verify_notify_code',
-                                'status_code': verify_response.status_code
-                            }), verify_response.status_code  # 保留原始状态码
-                        
-                    verify_result = verify_response.json()
-                    token = verify_result.get('token')
-                    
-                    if not token:
-                        return jsonify({
-                            'success': False,
-                            'error': '验证成功但未获取到token'
-                        }), 500
-                        
-                    # 保存新token
-                    saved_token = {
-                        'notify_id': notify_id,
-                        'notify_code': notify_code,
-                        'token': token,
-                        'third_party_name': data.get('source', '第三方演示服务'),
-                        'created_at': get_current_timestamp(),
-                        'subscription_info': verify_result
-                    }
-                    tokens_db.append(saved_token)
-                    
-                    logger.info(f"验证成功并保存token: {notify_id}")
-                    
-                except requests.exceptions.RequestException as e:
-                    error_msg = f"无法连接到回声平台进行验证: {str(e)}"
-                    logger.error(error_msg)
-                    return jsonify({
-                        'success': False,
-                        'error': error_msg,
-                        'step': 'verify_notify_code'
-                    }), 503
-        else:
+                    'error': '投递队列已满，请稍后重试'
+                })
+                response.headers['Retry-After'] = '1'
+                return response, 429
+
+            return jsonify({
+                'success': True,
+                'message': '通知已加入投递队列',
+                'delivery_id': delivery_id,
+                'status_url': url_for('get_delivery', delivery_id=delivery_id)
+            }), 202
+
+        notify_id, token, verify_result = resolve_push_token(data)
+
+        # 发送通知
+        result = deliver_push(build_push_payload(notify_id, token, data))
+
+        return jsonify({
+            'success': True,
+            'message': '通知已成功发送到回声平台',
+            'verify_result': verify_result,
+            'send_result': result,
+            'notify_id': notify_id,
+            'used_saved_token': data.get('use_saved_token', False)
+        })
+
+    except PushError as e:
+        response = jsonify(e.payload)
+        if e.retry_after:
+            response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+        return response, e.status_code
+    except Exception as e:
+        logger.error(f"发送通知失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/deliveries/<delivery_id>', methods=['GET'])
+def get_delivery(delivery_id: str):
+    """查询异步投递状态"""
+    delivery = delivery_queue.get(delivery_id)
+
+    if not delivery:
+        return jsonify({
+            'success': False,
+            'error': '投递记录不存在'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'delivery': delivery
+    })
+
+def push_target_key(data: Dict[str, Any]):
+    """批量推送的分组键：同一目标的通知共用一次token解析"""
+    if data.get('use_saved_token') and data.get('notify_id'):
+        return ('saved', data['notify_id'])
+    return ('code', data.get('notify_code'))
+
+@app.route('/api/send-notification/batch', methods=['POST'])
+def send_notification_batch():
+    """
+    主动模式 - 批量发送通知到回声平台
+    按推送目标分组，每组只解析一次token，再以有限并发逐条发送，返回逐条结果
+    """
+    try:
+        data = request.get_json() or {}
+        if not isinstance(data, dict):
             return jsonify({
                 'success': False,
-                'error': '必须提供notify_code或选择已保存的token'
+                'error': '请求体必须是JSON对象'
             }), 400
-        
-        # 发送通知
-        notification_data = {
-            'notifyId': notify_id,
-            'token': token,
-            'title': data['title'],
-            'content': data['content'],
-            'type': data.get('type', NotificationType.INFO.value),
-            'priority': data.get('priority', Priority.NORMAL.value),
-            'source': {
-                'name': data.get('source', '第三方演示服务'),
-                'url': DEMO_BASE_URL,
-                'icon': None  # 可选字段
-            },
-            'metadata': data.get('metadata', {})
-        }
-        
-        # 添加回调链接（如果提供）
-        callback_url = data.get('callback_url')
-        if callback_url and callback_url.strip():
-            notification_data['callbackUrl'] = callback_url.strip()
-        
-        # 只有在提供了外部ID时才添加，避免空字符串
-        external_id = data.get('external_id')
-        if external_id and external_id.strip():
-            notification_data['externalId'] = external_id.strip()
-        
-        send_url = f"{HUISHEEN_BASE_URL}/api/notifications/receive"
-        
-        logger.info(f"发送通知: {send_url}")
-        logger.info(f"通知数据: {json.dumps(notification_data, ensure_ascii=False, indent=2)}")
-        
-        try:
-            send_response = requests.post(
-                send_url,
-                json=notification_data,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
-            )
-            
-            if send_response.status_code in [200, 201]:
-                result = send_response.json()
-                logger.info(f"通知发送成功: {result}")
-                
-                return jsonify({
-                    'success': True,
-                    'message': '通知已成功发送到回声平台',
-                    'verify_result': verify_result,
-                    'send_result': result,
-                    'notify_id': notify_id,
-                    'used_saved_token': data.get('use_saved_token', False)
-                })
-            else:
-                try:
-                    error_detail = send_response.json()
-                    error_message = error_detail.get('error', '未知错误')
-                    error_code = error_detail.get('code', 'UNKNOWN_ERROR')
-                    error_details = error_detail.get('details', {})
-                    
-                    logger.error(f"发送通知失败: {send_response.status_code} - {error_message}")
-                    
-                    return jsonify({
-                        'success': False,
-                        'error': error_message,
-                        'error_code': error_code,
-                        'error_details': error_details,
-                        'step': 'send_notification',
-                        'status_code': send_response.status_code
-                    }), send_response.status_code  # 保留原始状态码
-                except:
-                    error_msg = f"发送通知失败: {send_response.status_code} - {send_response.text}"
-                    logger.error(error_msg)
-                    
-                    return jsonify({
-                        'success': False,
-                        'error': error_msg,
-                        'step': 'send_notification',
-                        'status_code': send_response.status_code
-                    }), send_response.status_code  # 保留原始状态码
-                
-        except requests.exceptions.RequestException as e:
-            error_msg = f"无法连接到回声平台: {str(e)}"
-            logger.error(error_msg)
+        items = data.get('notifications')
+
+        if not isinstance(items, list) or not items:
             return jsonify({
                 'success': False,
-                'error': error_msg,
-                'step': 'send_notification',
-                'status_code': 503
-            }), 503
-        
+                'error': 'notifications必须是非空数组'
+            }), 400
+
+        if len(items) > BATCH_PUSH_MAX_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f'单次最多发送 {BATCH_PUSH_MAX_ITEMS} 条通知'
+            }), 400
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        groups: Dict[Any, List[int]] = {}
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'success': False, 'error': '通知必须是对象', 'status_code': 400}
+                continue
+            missing_fields = missing_push_fields(item)
+            if missing_fields:
+                results[index] = {
+                    'index': index,
+                    'success': False,
+                    'error': f'缺少必需字段: {", ".join(missing_fields)}',
+                    'status_code': 400
+                }
+                continue
+            type_error = push_target_type_error(item)
+            if type_error:
+                results[index] = {'index': index, 'success': False, 'error': type_error, 'status_code': 400}
+                continue
+            groups.setdefault(push_target_key(item), []).append(index)
+
+        # 每组用第一条通知解析token，各组并发进行
+        def resolve_group(indexes):
+            try:
+                return resolve_push_token(items[indexes[0]]), None
+            except PushError as e:
+                return None, e
+            except Exception as e:
+                # 意外错误只影响本组通知
+                logger.error(f"批量推送解析token失败: {str(e)}")
+                return None, PushError({'success': False, 'error': str(e)}, 500)
+
+        resolved = list(push_executor.map(resolve_group, groups.values()))
+
+        def push_item(index, notify_id, token):
+            try:
+                result = deliver_push(build_push_payload(notify_id, token, items[index]))
+                return {'index': index, 'success': True, 'notify_id': notify_id, 'send_result': result}
+            except PushError as e:
+                return dict(e.payload, index=index, success=False, notify_id=notify_id, status_code=e.status_code)
+            except Exception as e:
+                logger.error(f"批量发送通知失败: {str(e)}")
+                return {'index': index, 'success': False, 'notify_id': notify_id, 'error': str(e), 'status_code': 500}
+
+        futures = []
+        for indexes, (target, error) in zip(groups.values(), resolved):
+            if error:
+                for index in indexes:
+                    results[index] = dict(error.payload, index=index, success=False, status_code=error.status_code)
+                continue
+            notify_id, token, _ = target
+            futures.extend(push_executor.submit(push_item, index, notify_id, token) for index in indexes)
+
+        for future in futures:
+            result = future.result()
+            results[result['index']] = result
+
+        sent = sum(1 for r in results if r['success'])
+        logger.info("批量推送完成: %d/%d 条成功，%d 个推送目标", sent, len(items), len(groups))
+
+        return jsonify({
+            'success': sent == len(items),
+            'total': len(items),
+            'sent': sent,
+            'failed': len(items) - sent,
+            'results': results
+        })
+
     except Exception as e:
-        logger.error(f"发送通知失败: {str(e)}")
+        logger.error(f"批量发送通知失败: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -782,6 +1344,7 @@ def create_notification():
         )
         
         notifications_db.append(notification)
+        publish_notification(notification)
         logger.info(f"创建新通知: {notification.title}")
         
         if request.is_json:
@@ -807,7 +1370,6 @@ def create_notification():
 @app.route('/admin/clear-notifications', methods=['POST'])
 def clear_notifications():
     """清空所有通知"""
-    global notifications_db
     notifications_db.clear()
     logger.info("清空所有通知")
     
@@ -820,7 +1382,8 @@ def clear_notifications():
 @app.route('/admin/generate-sample', methods=['POST'])
 def generate_sample():
     """生成示例通知"""
-    create_sample_notifications()
+    for notification in create_sample_notifications():
+        publish_notification(notification)
     
     if request.is_json:
         return jsonify({
@@ -941,6 +1504,7 @@ def generate_test_notification():
         )
         
         notifications_db.append(notification)
+        publish_notification(notification)
         logger.info(f"生成测试通知: {notification.title}")
         
         return jsonify({
@@ -985,11 +1549,7 @@ def get_tokens():
 def delete_token(notify_id: str):
     """删除指定的token"""
     try:
-        global tokens_db
-        original_count = len(tokens_db)
-        tokens_db = [t for t in tokens_db if t['notify_id'] != notify_id]
-        
-        if len(tokens_db) < original_count:
+        if tokens_db.delete(notify_id):
             logger.info(f"删除token: {notify_id}")
             return jsonify({
                 'success': True,
@@ -1011,7 +1571,6 @@ def delete_token(notify_id: str):
 def clear_tokens():
     """清空所有token"""
     try:
-        global tokens_db
         count = len(tokens_db)
         tokens_db.clear()
         logger.info(f"清空所有token，共删除 {count} 个")
@@ -1027,6 +1586,272 @@ def clear_tokens():
             'error': str(e)
         }), 500
 
+# ============ Webhook订阅 ============
+
+class WebhookError(Exception):
+    """订阅者的webhook返回了非2xx状态码"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+# 订阅者地址由调用方提供，会话放在有上限的缓存中，不进入回声平台共用的连接池；
+# 同时发送的请求不超过后台线程数，每个主机的连接池按此大小
+webhook_sessions = SessionCache(WEBHOOK_MAX_SESSIONS, WEBHOOK_WORKERS)
+
+def send_webhook(subscriber: Dict[str, Any], body: bytes) -> None:
+    """向订阅者的webhook发送一个事件，同一主机的订阅者共用连接池"""
+    url = subscriber['url']
+    response = webhook_sessions.get(url).post(
+        url,
+        data=body,
+        headers={'Content-Type': 'application/json', 'X-Demo-Event': 'notification.created'},
+        timeout=WEBHOOK_TIMEOUT
+    )
+    if not 200 <= response.status_code < 300:
+        raise WebhookError(response.status_code)
+
+def is_retryable_webhook(exc: Exception) -> bool:
+    """网络错误、5xx、408和429值得重试；其他4xx说明订阅者配置有误，直接失败"""
+    if isinstance(exc, WebhookError):
+        return exc.status_code >= 500 or exc.status_code in (408, 429)
+    return isinstance(exc, requests.exceptions.RequestException)
+
+webhook_fanout = WebhookFanout(
+    send_webhook,
+    is_retryable=is_retryable_webhook,
+    workers=WEBHOOK_WORKERS,
+    max_pending=WEBHOOK_MAX_PENDING,
+    max_attempts=WEBHOOK_MAX_ATTEMPTS,
+    max_delay=WEBHOOK_MAX_DELAY
+)
+webhook_fanout.start()
+
+def publish_notification(notification: Notification) -> int:
+    """把新通知推送给所有webhook订阅者，事件体只编码一次，返回订阅者数"""
+    subscribers = list(subscribers_db)
+    if not subscribers:
+        return 0
+    body = b''.join([b'{"event":"notification.created","notification":', feed_fragment(notification), b'}'])
+    return webhook_fanout.publish(subscribers, body)
+
+@app.route('/api/subscribers', methods=['GET'])
+def get_subscribers():
+    """获取所有webhook订阅者及其投递统计"""
+    try:
+        fanout_stats = webhook_fanout.metrics()
+        subscribers = [
+            dict(subscriber, metrics=fanout_stats['subscribers'].get(subscriber['id']))
+            for subscriber in subscribers_db
+        ]
+        return jsonify({
+            'success': True,
+            'subscribers': subscribers,
+            'count': len(subscribers),
+            'totals': fanout_stats['totals']
+        })
+    except Exception as e:
+        logger.error(f"获取订阅者列表失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/subscribers', methods=['POST'])
+def create_subscriber():
+    """注册webhook订阅者，之后创建的通知都会推送到该地址"""
+    try:
+        data = request.get_json() or {}
+        url = (data.get('url') or '').strip()
+        
+        if not url.startswith(('http://', 'https://')):
+            return jsonify({
+                'success': False,
+                'error': 'url必须是http或https地址'
+            }), 400
+        
+        subscriber = {
+            'id': generate_id(),
+            'url': url,
+            'name': data.get('name', url),
+            'created_at': get_current_timestamp()
+        }
+        subscribers_db.upsert(subscriber)
+        logger.info(f"注册webhook订阅者: {subscriber['name']} -> {url}")
+        
+        return jsonify({
+            'success': True,
+            'subscriber': subscriber
+        }), 201
+    except Exception as e:
+        logger.error(f"注册订阅者失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/subscribers/<subscriber_id>', methods=['DELETE'])
+def delete_subscriber(subscriber_id: str):
+    """删除webhook订阅者，未发送的事件一并丢弃；该主机没有其他订阅者时释放其连接"""
+    try:
+        webhook_fanout.remove(subscriber_id)
+        subscriber = subscribers_db.get(subscriber_id)
+        if subscribers_db.delete(subscriber_id):
+            origin = origin_of(subscriber['url']) if subscriber else None
+            if origin and not any(origin_of(s['url']) == origin for s in subscribers_db):
+                webhook_sessions.discard(origin)
+            logger.info(f"删除webhook订阅者: {subscriber_id}")
+            return jsonify({
+                'success': True,
+                'message': f'订阅者 {subscriber_id} 已删除'
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'error': f'订阅者 {subscriber_id} 不存在'
+            }), 404
+    except Exception as e:
+        logger.error(f"删除订阅者失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# ============ 指标 ============
+
+REQUEST_SECONDS = metrics.histogram(
+    'demo_http_request_duration_seconds', '请求处理耗时（秒），流式响应（SSE、流式轮询）计到开始返回为止', ('route', 'method')
+)
+REQUESTS_TOTAL = metrics.counter('demo_http_requests_total', '按路由、方法和状态码统计的请求数', ('route', 'method', 'status'))
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+# 钩子中每次访问request代理都要查找当前上下文（微秒级），因此只取一次实际的请求对象
+
+@app.before_request
+def start_request_timer():
+    request._get_current_object().environ['demo.started'] = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由模板记录请求数和耗时；未匹配任何路由的请求归为unmatched，避免标签数量随路径无限增长"""
+    req = request._get_current_object()
+    started = req.environ.get('demo.started')
+    if started is not None:
+        rule = req.url_rule
+        route = rule.rule if rule is not None else 'unmatched'
+        REQUEST_SECONDS.labels(route, req.method).observe(time.perf_counter() - started)
+        REQUESTS_TOTAL.labels(route, req.method, response.status_code).inc()
+    return response
+
+def labeled(stats: Dict[str, Any], exclude=()):
+    """把统计字典转换为以键为标签值的指标样本"""
+    return [((key,), value) for key, value in stats.items() if key not in exclude]
+
+# 以下指标在导出时从各组件已有的统计中读取，记录路径上没有额外开销
+metrics.callback('demo_store_records', '各存储表的记录数', 'gauge', lambda: [
+    (('notifications',), len(notifications_db)),
+    (('tokens',), len(tokens_db)),
+    (('external_tokens',), len(external_tokens_db)),
+    (('subscribers',), len(subscribers_db)),
+], ('store',))
+metrics.callback('demo_notifications_bytes', '通知表的近似字节数', 'gauge',
+                 lambda: notifications_db.retention_stats()['bytes'])
+metrics.callback('demo_notifications_evicted_total', '按原因统计的累计淘汰通知数', 'counter',
+                 lambda: labeled(notifications_db.retention_stats()['evicted']), ('reason',))
+metrics.callback('demo_feed_cache_entries', '被动轮询缓存的通知JSON片段数', 'gauge', lambda: len(feed_cache))
+metrics.callback('demo_feed_cache_events_total', '被动轮询缓存的命中、未命中和淘汰次数', 'counter',
+                 lambda: labeled(feed_cache.info(), exclude=('size', 'max_size')), ('event',))
+metrics.callback('demo_delivery_queue_depth', '异步投递队列中等待发送和等待重试的推送数', 'gauge', lambda: delivery_queue.depth())
+metrics.callback('demo_delivery_in_flight', '正在发送的异步投递数', 'gauge', lambda: delivery_queue.in_flight())
+metrics.callback('demo_deliveries_total', '异步投递按结果统计的次数', 'counter',
+                 lambda: labeled(delivery_queue.stats), ('result',))
+metrics.callback('demo_webhook_pending', 'webhook订阅者积压的事件数', 'gauge',
+                 lambda: webhook_fanout.metrics()['totals']['pending'])
+metrics.callback('demo_webhook_events_total', 'webhook事件按结果统计的累计次数（含已删除的订阅者）', 'counter',
+                 lambda: labeled(webhook_fanout.stats), ('result',))
+metrics.callback('demo_token_cache_events_total', '主动推送token缓存的命中、过期、验证和刷新次数', 'counter',
+                 lambda: labeled(token_cache.info()), ('event',))
+metrics.callback('demo_upstream_circuit_state', '上游端点熔断器状态：0 closed, 1 half_open, 2 open', 'gauge',
+                 lambda: [((name,), CIRCUIT_STATES[info['state']]) for name, info in breakers.info().items()],
+                 ('endpoint',))
+metrics.callback('demo_upstream_circuit_rejected_total', '熔断期间被拒绝的上游调用数', 'counter',
+                 lambda: [((name,), info['rejected']) for name, info in breakers.info().items()], ('endpoint',))
+metrics.callback('demo_upstream_pool_idle_connections', '上游连接池中的空闲keep-alive连接数', 'gauge',
+                 lambda: [((host,), stats['idle']) for host, stats in pool_stats().items()], ('host',))
+metrics.callback('demo_upstream_pool_connections_created_total', '上游连接池累计新建的连接数', 'counter',
+                 lambda: [((host,), stats['connections_created']) for host, stats in pool_stats().items()], ('host',))
+metrics.callback('demo_log_queue_depth', '日志队列中等待写出的记录数', 'gauge', lambda: log_pipeline.queue.qsize())
+metrics.callback('demo_log_dropped_total', '日志队列满时丢弃的记录数', 'counter', lambda: log_pipeline.handler.dropped)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus文本格式的指标（当前worker进程）"""
+    return app.response_class(metrics.registry.expose(), mimetype='text/plain; version=0.0.4')
+
+# ============ 性能分析 ============
+
+stack_sampler = StackSampler()
+allocation_tracker = AllocationTracker()
+
+def admin_required(view):
+    """未配置DEMO_ADMIN_TOKEN时返回404，令牌不符时返回403"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not DEMO_ADMIN_TOKEN:
+            return jsonify({'error': '性能分析未启用，请设置 DEMO_ADMIN_TOKEN'}), 404
+        if not authorized(DEMO_ADMIN_TOKEN, request.headers.get(ADMIN_TOKEN_HEADER)):
+            return jsonify({'error': f'缺少或错误的 {ADMIN_TOKEN_HEADER}'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def route_of(environ: Dict[str, Any]) -> str:
+    """请求对应的路由模板，采样时作为调用栈的栈底，避免同一路由按路径参数分散"""
+    try:
+        rule, _ = app.url_map.bind_to_environ(environ).match(return_rule=True)
+        return rule.rule
+    except HTTPException:
+        return 'unmatched'
+
+@app.route('/admin/profile/sample', methods=['GET'])
+@admin_required
+def profile_sample():
+    """
+    采样seconds秒内正在处理请求的线程的调用栈，返回折叠栈文件（flamegraph.pl、speedscope可直接使用）。
+    interval_ms为采样间隔，all_threads=1时包括空闲线程和后台线程
+    """
+    seconds = min(max(request.args.get('seconds', 10, type=float), 0.1), PROFILE_MAX_SECONDS)
+    interval = max(request.args.get('interval_ms', 10, type=float), 1) / 1000
+    all_threads = request.args.get('all_threads', '').lower() in ('1', 'true')
+    try:
+        stacks, rounds = stack_sampler.sample(seconds, interval, all_threads)
+    except SamplerBusy:
+        return jsonify({'error': '已有采样正在进行'}), 409
+    response = app.response_class(collapsed(stacks), mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'attachment; filename=profile-{int(time.time())}.collapsed'
+    response.headers['X-Sample-Rounds'] = str(rounds)
+    return response
+
+@app.route('/admin/profile/tracemalloc', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def profile_tracemalloc():
+    """
+    POST开启内存分配跟踪（frames为记录的调用栈深度），GET返回开启以来按路由汇总的新增分配，DELETE关闭跟踪
+    """
+    if request.method == 'POST':
+        allocation_tracker.start(min(max(request.args.get('frames', 32, type=int), 1), 256))
+        return jsonify(allocation_tracker.info())
+    if request.method == 'DELETE':
+        allocation_tracker.stop()
+        return jsonify(allocation_tracker.info())
+    try:
+        report = allocation_tracker.report(view_ranges(app), request.args.get('limit', 10, type=int))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(report)
+
+# 最外层的WSGI中间件，单个请求的分析包括Flask的请求处理和响应体生成
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app, DEMO_ADMIN_TOKEN, stack_sampler, route_of, PROFILE_MAX_SECONDS)
+
 # ============ 健康检查和信息 ============
 
 @app.route('/health')
@@ -1037,6 +1862,18 @@ def health():
         'service': '第三方演示服务',
         'timestamp': get_current_timestamp(),
         'notifications_count': len(notifications_db),
+        'retention': notifications_db.retention_stats(),
+        'waiters': waiter_limit.info(),
+        'storage_backend': storage.backend,
+        'token_cache': token_cache.info(),
+        'circuit_breakers': breakers.info(),
+        'logging': log_pipeline.info(),
+        'profiling': {
+            'enabled': bool(DEMO_ADMIN_TOKEN),
+            'sampling': stack_sampler.running,
+            'tracemalloc': allocation_tracker.info()['tracing']
+        },
+        'worker_pid': os.getpid(),
         'version': '1.0.0'
     })
 
@@ -1051,16 +1888,30 @@ def api_info():
             'passive_mode': {
                 'get_notifications': '/api/notifications',
                 'get_notification': '/api/notifications/{id}',
+                'stream_notifications': '/api/notifications/stream',
                 'description': '被动模式 - 供回声平台轮询'
             },
             'active_mode': {
                 'send_notification': '/api/send-notification',
+                'send_notification_batch': '/api/send-notification/batch',
+                'get_delivery': '/api/deliveries/{delivery_id}',
                 'description': '主动模式 - 向回声平台推送通知'
             },
+            'webhooks': {
+                'subscribers': '/api/subscribers',
+                'delete_subscriber': '/api/subscribers/{id}',
+                'description': '新通知推送到已注册的webhook'
+            },
             'admin': {
                 'create_notification': '/admin/create-notification',
                 'clear_notifications': '/admin/clear-notifications',
                 'generate_sample': '/admin/generate-sample'
+            },
+            'monitoring': {
+                'health': '/health',
+                'metrics': '/metrics',
+                'profile_sample': '/admin/profile/sample',
+                'profile_tracemalloc': '/admin/profile/tracemalloc'
             }
         },
         'huisheen_integration': {
@@ -1240,11 +2091,42 @@ def test_page():
 
 # ==================== 外部API功能 ====================
 
+# 外部API路由并发发起上游调用所用的线程池
+external_executor = ThreadPoolExecutor(max_workers=EXTERNAL_CONCURRENCY, thread_name_prefix='external')
+
+def timed_call(func, *args, **kwargs):
+    """执行上游调用，返回 (结果, 耗时毫秒)"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+def wait_upstream(future, started_at: float, deadline_at: float):
+    """
+    在截止时间前等待上游调用，返回 (结果, 耗时毫秒, 是否超时)
+    超时的调用不再等待，其结果被丢弃，耗时为从发起到放弃等待实际经过的时间
+    """
+    try:
+        result, elapsed_ms = future.result(timeout=max(deadline_at - time.perf_counter(), 0))
+        return result, elapsed_ms, False
+    except FutureTimeoutError:
+        future.cancel()
+        return None, (time.perf_counter() - started_at) * 1000, True
+
+def server_timing(timings: Dict[str, Any]) -> str:
+    """生成Server-Timing响应头，报告各上游调用的耗时"""
+    entries = []
+    for name, (elapsed_ms, timed_out) in timings.items():
+        entry = f"{name};dur={elapsed_ms:.1f}"
+        if timed_out:
+            entry += ';desc="timeout"'
+        entries.append(entry)
+    return ', '.join(entries)
+
 @app.route('/external-api')
 def external_api_page():
     """外部API管理页面"""
     return render_template('external_api.html', 
-                         tokens=external_tokens_db,
+                         tokens=list(external_tokens_db),
                          huisheen_url=HUISHEEN_BASE_URL)
 
 @app.route('/api/external/auth', methods=['POST'])
@@ -1278,17 +2160,8 @@ def external_api_auth():
             expires_in=auth_result['expiresIn']
         )
         
-        # 检查是否已存在相同的notify_id，如果存在则更新
-        existing_index = None
-        for i, token_info in enumerate(external_tokens_db):
-            if token_info.get('notify_id') == saved_token.notify_id:
-                existing_index = i
-                break
-        
-        if existing_index is not None:
-            external_tokens_db[existing_index] = saved_token.to_dict()
-        else:
-            external_tokens_db.append(saved_token.to_dict())
+        # 已存在相同的notify_id时更新，否则新增
+        external_tokens_db.upsert(saved_token.to_dict())
         
         return jsonify({
             'success': True,
@@ -1297,29 +2170,25 @@ def external_api_auth():
             'expiresIn': auth_result['expiresIn']
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.error(f"外部API认证错误: {e}")
         return jsonify({'error': f'认证过程中发生错误: {str(e)}'}), 500
 
 @app.route('/api/external/notifications/<notify_id>')
+@compressed
 def get_external_notifications(notify_id: str):
     """获取指定用户的回声通知"""
     try:
         # 查找对应的token
-        token_info = None
-        for token in external_tokens_db:
-            if token.get('notify_id') == notify_id:
-                token_info = token
-                break
+        token_info = external_tokens_db.get(notify_id)
         
         if not token_info:
             return jsonify({'error': '未找到认证信息，请先进行认证'}), 401
         
-        # 创建API客户端并设置token
-        api_client = HuisheenExternalAPI()
-        api_client.session.headers.update({
-            'Authorization': f'Bearer {token_info["token"]}'
-        })
+        # 创建API客户端（复用共享连接池，超时与截止时间一致）
+        api_client = HuisheenExternalAPI(token=token_info["token"], timeout=EXTERNAL_CALL_DEADLINE)
         
         # 获取通知
         limit = request.args.get('limit', 20, type=int)
@@ -1333,15 +2202,33 @@ def get_external_notifications(notify_id: str):
         if request.args.get('since'):
             filters['since'] = request.args.get('since')
         
-        notifications_data = api_client.get_notifications(limit=limit, **filters)
+        # 通知和统计信息并发获取，各自受截止时间约束
+        started_at = time.perf_counter()
+        deadline_at = started_at + EXTERNAL_CALL_DEADLINE
+        notifications_future = external_executor.submit(
+            timed_call, api_client.get_notifications, limit=limit, **filters
+        )
+        stats_future = external_executor.submit(timed_call, api_client.get_stats)
+        
+        notifications_data, notifications_ms, notifications_timeout = wait_upstream(notifications_future, started_at, deadline_at)
+        # 统计信息较慢或失败时不影响通知返回
+        stats_data, stats_ms, stats_timeout = wait_upstream(stats_future, started_at, deadline_at)
+        
+        timings = {
+            'notifications': (notifications_ms, notifications_timeout),
+            'stats': (stats_ms, stats_timeout)
+        }
+        logger.info("外部API上游耗时 - notifications: %.1fms, stats: %.1fms", notifications_ms, stats_ms)
+        
+        if notifications_timeout:
+            response = jsonify({'error': '获取通知超时，请稍后重试'})
+            response.headers['Server-Timing'] = server_timing(timings)
+            return response, 504
         
         if not notifications_data:
             return jsonify({'error': '获取通知失败，Token可能已过期'}), 401
         
-        # 同时获取统计信息
-        stats_data = api_client.get_stats()
-        
-        return jsonify({
+        response = jsonify({
             'success': True,
             'notifications': notifications_data['data']['notifications'],
             'pagination': notifications_data['data']['pagination'],
@@ -1351,7 +2238,11 @@ def get_external_notifications(notify_id: str):
                 'username': token_info['username']
             }
         })
+        response.headers['Server-Timing'] = server_timing(timings)
+        return response
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.error(f"获取外部通知错误: {e}")
         return jsonify({'error': f'获取通知时发生错误: {str(e)}'}), 500
@@ -1361,20 +2252,13 @@ def mark_external_notification_read(notify_id: str, notification_id: str):
     """标记回声通知为已读"""
     try:
         # 查找对应的token
-        token_info = None
-        for token in external_tokens_db:
-            if token.get('notify_id') == notify_id:
-                token_info = token
-                break
+        token_info = external_tokens_db.get(notify_id)
         
         if not token_info:
             return jsonify({'error': '未找到认证信息'}), 401
         
-        # 创建API客户端并设置token
-        api_client = HuisheenExternalAPI()
-        api_client.session.headers.update({
-            'Authorization': f'Bearer {token_info["token"]}'
-        })
+        # 创建API客户端（复用共享连接池）
+        api_client = HuisheenExternalAPI(token=token_info["token"])
         
         # 标记为已读
         success = api_client.mark_as_read(notification_id)
@@ -1384,19 +2268,56 @@ def mark_external_notification_read(notify_id: str, notification_id: str):
         else:
             return jsonify({'error': '标记已读失败'}), 500
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.error(f"标记外部通知已读错误: {e}")
         return jsonify({'error': f'操作失败: {str(e)}'}), 500
 
+@app.route('/api/external/notifications/<notify_id>/batch/read', methods=['POST'])
+def mark_external_notifications_read(notify_id: str):
+    """批量标记回声通知为已读"""
+    try:
+        token_info = external_tokens_db.get(notify_id)
+        
+        if not token_info:
+            return jsonify({'error': '未找到认证信息'}), 401
+        
+        data = request.get_json() or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': '请求体必须是JSON对象'}), 400
+        notification_ids = data.get('notification_ids')
+        
+        if not isinstance(notification_ids, list) or not notification_ids:
+            return jsonify({'error': 'notification_ids必须是非空数组'}), 400
+        if not all(isinstance(notification_id, str) for notification_id in notification_ids):
+            return jsonify({'error': 'notification_ids必须是字符串数组'}), 400
+        
+        # 按回声平台的批量接口分批，各批并发发送；格式错误的ID不发送，单独标记为invalid
+        api_client = HuisheenExternalAPI(token=token_info["token"])
+        results = api_client.mark_many_as_read(notification_ids, executor=external_executor)
+        
+        counts = Counter(results.values())
+        logger.info("批量标记已读: %d/%d 条成功", counts['read'], len(results))
+        
+        return jsonify({
+            'success': counts['read'] == len(results),
+            'marked': counts['read'],
+            'failed': counts['failed'],
+            'invalid': counts['invalid'],
+            'results': results
+        })
+        
+    except Exception as e:
+        logger.error(f"批量标记外部通知已读错误: {e}")
+        return jsonify({'error': f'操作失败: {str(e)}'}), 500
+
 @app.route('/api/external/tokens/<notify_id>', methods=['DELETE'])
 def delete_external_token(notify_id: str):
     """删除保存的外部API token"""
     try:
-        global external_tokens_db
-        
         # 查找并删除token
-        external_tokens_db = [token for token in external_tokens_db 
-                            if token.get('notify_id') != notify_id]
+        external_tokens_db.delete(notify_id)
         
         return jsonify({'success': True, 'message': 'Token已删除'})
         
@@ -1408,7 +2329,6 @@ def delete_external_token(notify_id: str):
 def clear_external_tokens():
     """清空所有外部API token"""
     try:
-        global external_tokens_db
         external_tokens_db.clear()
         
         return jsonify({'success': True, 'message': '所有Token已清空'})
@@ -1418,8 +2338,8 @@ def clear_external_tokens():
         return jsonify({'error': f'清空失败: {str(e)}'}), 500
 
 if __name__ == '__main__':
-    # 初始化示例数据
-    create_sample_notifications()
+    # 初始化示例数据（持久化存储中已有数据时跳过）
+    init_sample_data()
     
     print("\n" + "="*60)
     print("🎯 第三方演示服务启动中...")
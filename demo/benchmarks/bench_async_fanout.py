@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 多用户通知拉取：阻塞客户端逐个拉取 vs 异步客户端并发扇出
+桩服务每个请求延迟20ms，模拟真实的上游往返时间
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+stub = StubHuisheen().start()
+os.environ['HUISHEEN_BASE_URL'] = stub.url
+
+from app import HuisheenExternalAPI  # noqa: E402
+from huisheen_async import AsyncHuisheenPool  # noqa: E402
+
+USERS = 500
+CONCURRENCY = 50
+
+
+async def fan_out(tokens):
+    received = 0
+    async with AsyncHuisheenPool(stub.url, concurrency=CONCURRENCY) as pool:
+        async for token, data in pool.fetch_notifications_many(tokens, limit=20):
+            if data is not None:
+                received += 1
+    return received
+
+
+def main():
+    logging.disable(logging.INFO)
+    stub.delay = 0.02
+    tokens = [f"token-{i}" for i in range(USERS)]
+    print("=" * 60)
+    print(f"🌐 多用户通知拉取基准测试 ({USERS} 个用户, 上游延迟 {stub.delay * 1000:.0f}ms)")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    ok = sum(1 for token in tokens if HuisheenExternalAPI(stub.url, token=token).get_notifications(limit=20))
+    blocking = time.perf_counter() - started
+    print(f"阻塞客户端逐个拉取: {blocking:.2f}s ({ok}/{USERS} 成功)")
+
+    started = time.perf_counter()
+    ok = asyncio.run(fan_out(tokens))
+    concurrent = time.perf_counter() - started
+    print(f"异步并发扇出(并发{CONCURRENCY}): {concurrent:.2f}s ({ok}/{USERS} 成功)")
+    print(f"\n📈 提升: {blocking / concurrent:.1f}x")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
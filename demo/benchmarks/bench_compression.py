@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 被动轮询响应压缩：传输字节数 vs CPU耗时
+对比各可用编码的压缩率和压缩耗时，以及命中压缩缓存时的完整轮询耗时
+"""
+
+import gzip
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from response_compression import CODECS, compressed_cache  # noqa: E402
+
+NOTIFICATIONS = 200
+ROUNDS = 200
+LIMITS = [10, 50, 200]
+
+
+def per_call_ms(func, *args, **kwargs):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args, **kwargs)
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    logging.disable(logging.INFO)
+    client = demo_app.app.test_client()
+    for _ in range(NOTIFICATIONS):
+        client.post('/admin/generate-test-notification', json={})
+
+    codecs = dict(CODECS)
+    codecs['gzip-1'] = lambda data: gzip.compress(data, compresslevel=1, mtime=0)
+    codecs['gzip-9'] = lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+    print("=" * 64)
+    print(f"🗜️  响应压缩基准测试 ({NOTIFICATIONS} 条复杂通知, 可用编码: {', '.join(CODECS)})")
+    print("=" * 64)
+    print(f"{'limit':<7} {'编码':<8} {'字节数':>10} {'压缩率':>8} {'压缩ms':>9}")
+    for limit in LIMITS:
+        body = client.get(f'/api/notifications?limit={limit}').data
+        print(f"{limit:<7} {'identity':<8} {len(body):>10} {'1.00':>8} {'-':>9}")
+        for name, codec in codecs.items():
+            data = codec(body)
+            print(f"{limit:<7} {name:<8} {len(data):>10} {len(body) / len(data):>8.2f} {per_call_ms(codec, body):>9.3f}")
+
+    print("\n完整轮询请求 (limit=50, ms/次):")
+    url = '/api/notifications?limit=50'
+    identity = per_call_ms(client.get, url)
+    for encoding in CODECS:
+        headers = {'Accept-Encoding': encoding}
+        compressed_cache.max_size = 0
+        uncached = per_call_ms(client.get, url, headers=headers)
+        compressed_cache.max_size = 256
+        client.get(url, headers=headers)
+        cached = per_call_ms(client.get, url, headers=headers)
+        print(f"  identity {identity:.3f} | {encoding} 每次压缩 {uncached:.3f} | {encoding} 命中缓存 {cached:.3f}")
+
+
+if __name__ == "__main__":
+    main()
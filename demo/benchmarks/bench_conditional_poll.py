@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 空闲通知流的轮询吞吐：完整响应 vs If-None-Match条件请求(304)
+通知表不再变化时，带上次ETag的轮询只需比较版本号
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+POLLS = 3_000
+URL = '/api/notifications?limit=50'
+
+
+def polls_per_second(client, headers=None):
+    started = time.perf_counter()
+    for _ in range(POLLS):
+        client.get(URL, headers=headers)
+    return POLLS / (time.perf_counter() - started)
+
+
+def main():
+    logging.disable(logging.INFO)
+    print("=" * 60)
+    print(f"🔁 空闲通知流轮询基准测试 (limit=50, {POLLS} 次轮询)")
+    print("=" * 60)
+    print(f"{'存储后端':<10} {'完整响应/秒':>12} {'304/秒':>12} {'提升':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ('memory', 'sqlite'):
+            storage = create_storage(backend, os.path.join(tmp, 'bench.db'))
+            demo_app.notifications_db = storage.notifications
+            for _ in range(10):
+                demo_app.create_sample_notifications()
+            client = demo_app.app.test_client()
+
+            full = polls_per_second(client)
+            etag = client.get(URL).headers['ETag']
+            assert client.get(URL, headers={'If-None-Match': etag}).status_code == 304
+            conditional = polls_per_second(client, {'If-None-Match': etag})
+            print(f"{backend:<10} {full:>12.0f} {conditional:>12.0f} {conditional / full:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
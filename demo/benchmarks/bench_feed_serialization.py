@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 被动轮询响应的序列化：逐次构造字典并jsonify vs 拼接预编码的JSON片段
+通知使用 generate-test-notification 生成的深层嵌套metadata
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from feed_cache import FragmentCache  # noqa: E402
+
+NOTIFICATIONS = 200
+POLLS = 500
+LIMITS = [10, 50, 200]
+
+
+def jsonify_poll(limit):
+    """原实现：每次轮询构造字典并整体编码"""
+    records = demo_app.notifications_db.after(0, limit)
+    response = demo_app.jsonify({
+        'notifications': [demo_app.format_feed_notification(n) for n in records],
+        'next_cursor': demo_app.notifications_db.encode_cursor(records[-1].seq)
+    })
+    return response.get_data()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    for _ in range(POLLS):
+        func(*args)
+    return (time.perf_counter() - started) / POLLS * 1000
+
+
+def main():
+    logging.disable(logging.INFO)
+    client = demo_app.app.test_client()
+    for _ in range(NOTIFICATIONS):
+        client.post('/admin/generate-test-notification', json={})
+
+    print("=" * 60)
+    print(f"🧱 轮询响应序列化基准测试 ({NOTIFICATIONS} 条复杂通知, 每项 {POLLS} 次)")
+    print("=" * 60)
+
+    print("\n视图内处理，不含HTTP层 (ms/次):")
+    print(f"{'limit':<8} {'jsonify':>10} {'片段拼接':>10} {'提升':>8}")
+    for limit in LIMITS:
+        with demo_app.app.test_request_context(f'/api/notifications?limit={limit}'):
+            baseline = timed(jsonify_poll, limit)
+            demo_app.get_notifications()  # 预热缓存
+            cached = timed(demo_app.get_notifications)
+            print(f"{limit:<8} {baseline:>10.3f} {cached:>10.3f} {baseline / cached:>7.1f}x")
+
+    print("\n完整轮询请求 (ms/次):")
+    print(f"{'limit':<8} {'无缓存':>10} {'有缓存':>10} {'提升':>8}")
+    for limit in LIMITS:
+        url = f'/api/notifications?limit={limit}'
+        demo_app.feed_cache = FragmentCache(0)
+        uncached = timed(client.get, url)
+        demo_app.feed_cache = FragmentCache()
+        client.get(url)
+        cached = timed(client.get, url)
+        print(f"{limit:<8} {uncached:>10.3f} {cached:>10.3f} {uncached / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 日志管道：开启INFO日志时主动推送和被动轮询的吞吐
+先测量每次推送的日志调用在请求线程中的耗时，再对比在请求线程中同步格式化并写出（改造前的logging.basicConfig方式）、
+经队列在后台线程写出、以及载荷日志按采样率记录时的吞吐和延迟；
+日志分别写到文件和一个模拟的慢输出（每次写入阻塞0.2ms，相当于终端或管道被读取方拖慢）
+"""
+
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+stub = StubHuisheen().start()
+os.environ['HUISHEEN_BASE_URL'] = stub.url
+
+import app as demo_app  # noqa: E402
+from log_pipeline import LOG_FORMAT, JsonPayload, payload_logger, setup_logging  # noqa: E402
+from models import Notification  # noqa: E402
+
+THREADS = 8
+DURATION = 3.0
+SLOW_WRITE = 0.0002
+LOG_CALLS = 2000
+PUSH = {'use_saved_token': True, 'notify_id': 'bench-log', 'title': '日志基准测试',
+        'content': '内容' * 50, 'metadata': {'order_id': 12345, 'tags': ['物流', '订单'] * 5}}
+CONFIGS = [
+    ('同步写出, 载荷全量', True, 1.0),
+    ('队列写出, 载荷全量', False, 1.0),
+    ('队列写出, 载荷采样10%', False, 0.1),
+    ('队列写出, 不记载荷', False, 0.0),
+]
+
+
+class SlowStream:
+    """每次写入阻塞一段时间的输出"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        time.sleep(SLOW_WRITE)
+        self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def configure(stream, synchronous, rate):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    pipeline = setup_logging(logging.INFO, rate, handlers=[handler])
+    if synchronous:
+        # 改造前：根日志器上直接挂处理器，格式化和写出都在请求线程中
+        pipeline.stop()
+        logging.getLogger().addHandler(handler)
+    return pipeline, handler
+
+
+def push_log_cost(stream, synchronous, rate):
+    """
+    一次推送产生的日志调用（与deliver_push相同）占用调用线程的平均CPU时间（微秒）；
+    用thread_time只计调用线程，不含后台线程写日志的时间
+    """
+    logger = logging.getLogger('app')
+    payload = demo_app.build_push_payload('bench-log', 'stub-token', PUSH)
+    result = {'success': True, 'notificationId': 'bench'}
+    pipeline, handler = configure(stream, synchronous, rate)
+    started = time.thread_time()
+    for _ in range(LOG_CALLS):
+        logger.info("发送通知: %s", stub.url)
+        payload_logger.info("通知数据: %s", JsonPayload(payload))
+        payload_logger.info("通知发送成功: %s", result)
+    elapsed = time.thread_time() - started
+    pipeline.stop()
+    logging.getLogger().removeHandler(handler)
+    return elapsed / LOG_CALLS * 1e6
+
+
+def run(request):
+    latencies = []
+    lock = threading.Lock()
+    stop = time.monotonic() + DURATION
+
+    def worker():
+        client = demo_app.app.test_client()
+        local = []
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            request(client)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies
+
+
+def main():
+    demo_app.tokens_db.upsert({'notify_id': 'bench-log', 'token': 'stub-token'})
+    demo_app.notifications_db.extend(
+        Notification(id=f"log-{i}", title=f"通知 {i}", content="内容", type="info", priority="normal",
+                     timestamp="2024-01-01T00:00:00Z", source="bench")
+        for i in range(100)
+    )
+    workloads = [
+        ('主动推送', lambda client: client.post('/api/send-notification', json=PUSH)),
+        ('被动轮询', lambda client: client.get('/api/notifications?limit=20')),
+    ]
+    print("=" * 84)
+    print(f"📝 日志管道基准测试 ({THREADS} 个线程, 每轮 {DURATION:.0f}s, INFO级别)")
+    print("=" * 84)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"\n每次推送的日志调用占用请求线程的CPU时间 (写到文件, {LOG_CALLS} 次取平均)")
+        for name, synchronous, rate in CONFIGS:
+            with open(os.path.join(tmp, 'cost.log'), 'w') as stream:
+                print(f"  {name:<18} {push_log_cost(stream, synchronous, rate):>8.1f} µs")
+
+        for sink_name, make_stream in (('文件', lambda: open(os.path.join(tmp, 'bench.log'), 'w')),
+                                       ('慢输出', lambda: SlowStream(open(os.devnull, 'w')))):
+            print(f"\n日志输出: {sink_name}")
+            print(f"{'负载':<6} {'配置':<18} {'请求/秒':>10} {'p50 ms':>8} {'p99 ms':>8} {'丢弃':>7}")
+            for workload, request in workloads:
+                for name, synchronous, rate in CONFIGS:
+                    stream = make_stream()
+                    pipeline, handler = configure(stream, synchronous, rate)
+                    latencies = run(request)
+                    dropped = pipeline.handler.dropped
+                    pipeline.stop()
+                    logging.getLogger().removeHandler(handler)
+                    stream.stream.close() if isinstance(stream, SlowStream) else stream.close()
+                    print(f"{workload:<6} {name:<18} {len(latencies) / DURATION:>10.0f} "
+                          f"{statistics.median(latencies) * 1000:>8.2f} "
+                          f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>8.2f} {dropped:>7}")
+    stub.stop()
+    print("\n注: 丢弃为队列满时未写出的记录数（请求线程不等待）；单核机器上后台写日志的线程与请求线程争用CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 长轮询：大量空闲等待方的开销与唤醒延迟
+同时挂起WAITERS个长轮询请求，测量空闲期间的CPU占用，
+再写入一条通知，测量从写入到所有等待方收到响应的延迟
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+import aiohttp
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from models import Notification  # noqa: E402
+
+WAITERS = 1_000
+IDLE_SECONDS = 3
+
+
+async def run(base_url):
+    cursor = demo_app.notifications_db.encode_cursor(demo_app.notifications_db.last_seq)
+    url = f"{base_url}/api/notifications?wait=60&cursor={cursor}"
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=120)) as session:
+        received = []
+
+        async def wait_one():
+            async with session.get(url) as response:
+                data = await response.json()
+                received.append((time.perf_counter(), len(data['notifications'])))
+
+        tasks = [asyncio.ensure_future(wait_one()) for _ in range(WAITERS)]
+        # 等待所有请求进入挂起状态
+        while demo_app.notifications_db.changed.waiters < WAITERS:
+            await asyncio.sleep(0.1)
+
+        cpu_started = time.process_time()
+        await asyncio.sleep(IDLE_SECONDS)
+        idle_cpu = time.process_time() - cpu_started
+
+        written_at = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(None, demo_app.notifications_db.append, Notification(
+            id='wake', title='唤醒', content='唤醒所有等待方', type='info', priority='normal',
+            timestamp=demo_app.get_current_timestamp(), source='bench', metadata={}
+        ))
+        await asyncio.gather(*tasks)
+
+    latencies = sorted((at - written_at) * 1000 for at, _ in received)
+    return idle_cpu, latencies, sum(count for _, count in received)
+
+
+def main():
+    logging.disable(logging.INFO)
+    server = make_server('127.0.0.1', 0, demo_app.app, threaded=True)
+    server.socket.listen(WAITERS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print("=" * 60)
+    print(f"⏳ 长轮询基准测试 ({WAITERS} 个并发等待方)")
+    print("=" * 60)
+    idle_cpu, latencies, delivered = asyncio.run(run(f"http://127.0.0.1:{server.server_port}"))
+    print(f"空闲 {IDLE_SECONDS}s 内CPU占用: {idle_cpu * 1000:.1f}ms ({idle_cpu / IDLE_SECONDS * 100:.2f}%)")
+    print(f"收到新通知的等待方: {delivered}/{WAITERS}")
+    print(f"唤醒延迟: p50 {statistics.median(latencies):.1f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f}ms, 最大 {latencies[-1]:.1f}ms")
+    print("对比: 间隔轮询的平均延迟为轮询间隔的一半（1分钟间隔约30000ms）")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
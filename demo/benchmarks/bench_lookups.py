@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 通知与token查找：线性扫描 vs 字典索引
+在10万条通知、10万个token上测量查找、更新、删除，以及不访问上游的查找类路由
+"""
+
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from models import Notification  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+SIZE = 100_000
+
+
+def build_notifications(count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        timestamp = (start + timedelta(milliseconds=i)).isoformat().replace('+00:00', 'Z')
+        yield Notification(id=f"n-{i}", title="t", content="c", type="info",
+                           priority="normal", timestamp=timestamp, source="bench")
+
+
+def build_token(i):
+    return {'notify_id': f"id-{i}", 'token': f"token-{i}".ljust(32, 'x'), 'username': 'bench'}
+
+
+# ---- 原实现：列表 + 线性扫描 ----
+
+def list_get(records, notify_id):
+    return next((t for t in records if t['notify_id'] == notify_id), None)
+
+
+def list_upsert(records, record):
+    for i, existing in enumerate(records):
+        if existing.get('notify_id') == record['notify_id']:
+            records[i] = record
+            return records
+    records.append(record)
+    return records
+
+
+def list_delete(records, notify_id):
+    return [t for t in records if t['notify_id'] != notify_id]
+
+
+def measure(func, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    logging.disable(logging.INFO)
+    print("=" * 60)
+    print(f"🔎 查找基准测试 ({SIZE} 条通知 / {SIZE} 个token, µs/次)")
+    print("=" * 60)
+
+    token_list = [build_token(i) for i in range(SIZE)]
+    storage = create_storage('memory')
+    for record in token_list:
+        storage.tokens.upsert(record)
+    storage.notifications.extend(build_notifications(SIZE))
+    notification_list = list(storage.notifications)
+
+    target = f"id-{SIZE - 1}"
+    rows = [
+        ("token查找", lambda: list_get(token_list, target), lambda: storage.tokens.get(target)),
+        ("token更新", lambda: list_upsert(token_list, build_token(SIZE - 1)),
+         lambda: storage.tokens.upsert(build_token(SIZE - 1))),
+        ("token删除", lambda: list_delete(token_list, target),
+         lambda: (storage.tokens.delete(target), storage.tokens.upsert(build_token(SIZE - 1)))),
+        ("通知查找", lambda: next((n for n in notification_list if n.id == f"n-{SIZE - 1}"), None),
+         lambda: storage.notifications.get(f"n-{SIZE - 1}")),
+    ]
+    print(f"{'操作':<10} {'线性扫描':>12} {'字典索引':>12} {'加速比':>10}")
+    for name, linear, indexed in rows:
+        linear_us = measure(linear, rounds=20)
+        indexed_us = measure(indexed, rounds=20_000)
+        print(f"{name:<10} {linear_us:>12.2f} {indexed_us:>12.2f} {linear_us / indexed_us:>9.0f}x")
+
+    # 路由级：查找单个通知、删除token（删除后补回，保持规模不变）
+    demo_app.notifications_db = storage.notifications
+    demo_app.tokens_db = storage.tokens
+    client = demo_app.app.test_client()
+    print("\n📡 路由耗时 (µs/次)")
+    get_us = measure(lambda: client.get(f"/api/notifications/n-{SIZE - 1}"), rounds=2_000)
+    print(f"  GET    /api/notifications/<id>  {get_us:>10.2f}")
+
+    def delete_and_restore():
+        client.delete(f"/api/tokens/{target}")
+        storage.tokens.upsert(build_token(SIZE - 1))
+
+    delete_us = measure(delete_and_restore, rounds=2_000)
+    print(f"  DELETE /api/tokens/<notify_id>  {delete_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 通知记录的内存占用：普通dataclass vs 紧凑的__slots__记录
+生成大量字段取值接近真实请求的通知（来源、类型等字符串每条都是新对象，
+与从请求JSON解析出来时一样），测量每条通知占用的字节数和属性读取开销
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Notification  # noqa: E402
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+TYPES = ['info', 'warning', 'error', 'success']
+PRIORITIES = ['low', 'normal', 'high', 'urgent']
+SOURCES = ['系统管理', '订单中心', '监控告警', '管理员']
+
+
+@dataclass
+class DataclassNotification:
+    """改造前的通知结构，作为对照"""
+    id: str
+    title: str
+    content: str
+    type: str
+    priority: str
+    timestamp: str
+    source: str
+    callback_url: str = None
+    metadata: Dict[str, Any] = None
+    seq: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def fresh(value):
+    """返回内容相同的新字符串对象，模拟从请求中解析出的字段"""
+    return ''.join(list(value))
+
+
+def build(cls, count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    records = []
+    for i in range(count):
+        records.append(cls(
+            id=f"notif-{i:08d}",
+            title=f"订单 {i} 状态更新",
+            content=f"您的订单 {i} 已发货，预计3天内送达。",
+            type=fresh(TYPES[i % 4]),
+            priority=fresh(PRIORITIES[i % 4]),
+            timestamp=(start + timedelta(microseconds=i * 1234)).isoformat().replace('+00:00', 'Z'),
+            source=fresh(SOURCES[i % 4]),
+            metadata={"order_id": i, "status": "shipped", "tags": ["物流", "订单"]},
+            seq=i + 1
+        ))
+    return records
+
+
+def measure(cls, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    records = build(cls, count)
+    build_time = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample = records[:10_000]
+    started = time.perf_counter()
+    for record in sample:
+        record.timestamp, record.type, record.source
+    field_read = (time.perf_counter() - started) / len(sample) * 1e9
+    started = time.perf_counter()
+    for record in sample:
+        record.to_dict()
+    to_dict = (time.perf_counter() - started) / len(sample) * 1e6
+    del records
+    return current / count, build_time, field_read, to_dict
+
+
+def main():
+    print("=" * 72)
+    print(f"🧮 通知记录内存基准测试 ({COUNT:,} 条)")
+    print("=" * 72)
+    print(f"{'结构':<14} {'字节/条':>10} {'总计MB':>10} {'构造s':>8} {'读字段ns':>10} {'to_dict µs':>11}")
+    results = {}
+    for name, cls in (('dataclass', DataclassNotification), ('slots', Notification)):
+        per_record, build_time, field_read, to_dict = measure(cls, COUNT)
+        results[name] = per_record
+        print(f"{name:<14} {per_record:>10.0f} {per_record * COUNT / 1024 / 1024:>10.1f} "
+              f"{build_time:>8.2f} {field_read:>10.0f} {to_dict:>11.2f}")
+    print(f"\n每条通知节省 {results['dataclass'] - results['slots']:.0f} 字节 "
+          f"({(1 - results['slots'] / results['dataclass']) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
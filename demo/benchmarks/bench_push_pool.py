@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 主动推送吞吐：每次新建连接 vs 共享keep-alive连接池
+对本地桩服务持续调用 /api/send-notification，统计每秒推送数和上游TCP连接数
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+stub = StubHuisheen().start()
+os.environ['HUISHEEN_BASE_URL'] = stub.url
+
+import requests  # noqa: E402
+
+import app as demo_app  # noqa: E402
+import http_pool  # noqa: E402
+
+THREADS = 8
+PUSHES_PER_THREAD = 300
+
+
+def run_pushes():
+    """多线程经Flask路由推送，返回每秒推送数"""
+    payload = {'use_saved_token': True, 'notify_id': 'bench', 'title': '基准测试', 'content': '推送'}
+    errors = []
+
+    def worker():
+        client = demo_app.app.test_client()
+        for _ in range(PUSHES_PER_THREAD):
+            if client.post('/api/send-notification', json=payload).status_code != 200:
+                errors.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        print(f"⚠️  {len(errors)} 次推送失败")
+    return THREADS * PUSHES_PER_THREAD / elapsed
+
+
+def main():
+    logging.disable(logging.INFO)
+    demo_app.tokens_db.upsert({'notify_id': 'bench', 'token': 'bench-token'})
+    print("=" * 60)
+    print(f"🚀 主动推送吞吐基准测试 ({THREADS} 线程 x {PUSHES_PER_THREAD} 次)")
+    print("=" * 60)
+
+    # 原实现：模块级 requests.post，每次推送新建TCP连接
+    demo_app.get_session = lambda base_url: requests
+    stub.connections = 0
+    before = run_pushes()
+    before_connections = stub.connections
+
+    # 新实现：进程内共享连接池
+    demo_app.get_session = http_pool.get_session
+    stub.connections = 0
+    after = run_pushes()
+    after_connections = stub.connections
+
+    print(f"{'模式':<14} {'推送/秒':>10} {'上游连接数':>12}")
+    print(f"{'每次新建连接':<14} {before:>10.0f} {before_connections:>12}")
+    print(f"{'共享连接池':<14} {after:>10.0f} {after_connections:>12}")
+    print(f"\n📈 提升: {after / before:.2f}x")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 通知保留策略：持续写入时的内存占用与追加耗时
+对比不限制、按条数、按字节数、按时间保留时，写入大量通知后的常驻内存和单次追加耗时
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Notification  # noqa: E402
+from notification_store import RetentionPolicy  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+MEMORY_COUNT = 100_000
+SQLITE_COUNT = 20_000
+
+
+def build_records(count):
+    """生成带少量元数据的通知，时间戳为生成时的当前时间"""
+    for i in range(count):
+        timestamp = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        yield Notification(
+            id=f"bench-{i}", title="基准测试", content="内容" * 20, type="info",
+            priority="normal", timestamp=timestamp, source="bench",
+            metadata={"index": i, "tags": ["a", "b"]}
+        )
+
+
+def append_all(backend, policy, count, path=None):
+    notifications = create_storage(backend, path, policy).notifications
+    records = list(build_records(count))
+    started = time.perf_counter()
+    for notification in records:
+        notifications.append(notification)
+    return notifications, (time.perf_counter() - started) / count * 1e6
+
+
+def memory_mb(policy, count):
+    """写入后仍被通知表引用的内存（单独一轮，tracemalloc会拖慢追加）"""
+    tracemalloc.start()
+    notifications = create_storage('memory', None, policy).notifications
+    for notification in build_records(count):
+        notifications.append(notification)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / 1024 / 1024
+
+
+def main():
+    policies = [
+        ('不限制', RetentionPolicy()),
+        ('max_count=10000', RetentionPolicy(max_count=10_000)),
+        ('max_bytes=2MB', RetentionPolicy(max_bytes=2 * 1024 * 1024)),
+        ('max_age=0.5s', RetentionPolicy(max_age=0.5)),
+    ]
+
+    print("=" * 78)
+    print("🧹 通知保留策略基准测试 (每条约200字节)")
+    print("=" * 78)
+    print(f"{'后端':<8} {'策略':<17} {'写入数':>8} {'保留数':>8} {'淘汰数':>8} {'追加µs':>8} {'内存MB':>8}")
+    for name, policy in policies:
+        notifications, per_append = append_all('memory', policy, MEMORY_COUNT)
+        stats = notifications.retention_stats()
+        memory = memory_mb(policy, MEMORY_COUNT)
+        print(f"{'memory':<8} {name:<17} {MEMORY_COUNT:>8} {stats['count']:>8} "
+              f"{sum(stats['evicted'].values()):>8} {per_append:>8.2f} {memory:>8.1f}")
+
+    for name, policy in policies:
+        with tempfile.TemporaryDirectory() as tmp:
+            notifications, per_append = append_all('sqlite', policy, SQLITE_COUNT, os.path.join(tmp, 'bench.db'))
+            stats = notifications.retention_stats()
+            size = os.path.getsize(os.path.join(tmp, 'bench.db')) / 1024 / 1024
+        print(f"{'sqlite':<8} {name:<17} {SQLITE_COUNT:>8} {stats['count']:>8} "
+              f"{sum(stats['evicted'].values()):>8} {per_append:>8.2f} {size:>7.1f}*")
+    print("* sqlite一列为数据库文件大小")
+
+
+if __name__ == "__main__":
+    main()
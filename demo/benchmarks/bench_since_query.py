@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 被动模式since查询：线性扫描 vs 时间索引二分
+分别在1万、10万、100万条通知上测量单次轮询耗时
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Notification  # noqa: E402
+from notification_store import NotificationStore, parse_timestamp  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+LIMIT = 10
+
+
+def build_records(count):
+    """生成按时间递增的通知"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    records = []
+    for i in range(count):
+        timestamp = (start + timedelta(milliseconds=i)).isoformat().replace('+00:00', 'Z')
+        records.append(Notification(
+            id=f"bench-{i}", title="基准测试", content="内容", type="info",
+            priority="normal", timestamp=timestamp, source="bench", metadata={}
+        ))
+    return records
+
+
+def linear_since(records, since, limit):
+    """原实现：复制整个列表并逐条解析时间戳"""
+    filtered = records.copy()
+    since_time = datetime.fromisoformat(since.replace('Z', '+00:00'))
+    filtered = [
+        n for n in filtered
+        if datetime.fromisoformat(n.timestamp.replace('Z', '+00:00')) > since_time
+    ]
+    return filtered[:limit]
+
+
+def indexed_since(store, since, limit):
+    """新实现：时间索引二分 + 切片"""
+    return store.since(parse_timestamp(since), limit)
+
+
+def measure(func, *args, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    print("=" * 60)
+    print("⏱️  被动模式 since 查询基准测试")
+    print("=" * 60)
+    print(f"{'记录数':>10} {'线性扫描(ms)':>14} {'时间索引(µs)':>14} {'加速比':>10}")
+    for size in SIZES:
+        records = build_records(size)
+        store = NotificationStore()
+        store.extend(records)
+        # 轮询最近的通知：since指向倒数第100条
+        since = records[-100].timestamp
+
+        assert linear_since(records, since, LIMIT) == indexed_since(store, since, LIMIT)
+
+        linear = measure(linear_since, records, since, LIMIT, rounds=3)
+        indexed = measure(indexed_since, store, since, LIMIT, rounds=10_000)
+        print(f"{size:>10} {linear * 1e3:>14.2f} {indexed * 1e6:>14.2f} {linear / indexed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 存储后端轮询延迟：memory vs sqlite
+对比since查询、cursor翻页、按ID查询，以及完整的 /api/notifications 请求耗时
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from models import Notification  # noqa: E402
+from notification_store import parse_timestamp  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+SIZES = [10_000, 100_000]
+LIMIT = 10
+ROUNDS = 2_000
+
+
+def build_records(count):
+    """生成按时间递增、带少量元数据的通知"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        timestamp = (start + timedelta(milliseconds=i)).isoformat().replace('+00:00', 'Z')
+        yield Notification(
+            id=f"bench-{i}", title="基准测试", content="内容" * 10, type="info",
+            priority="normal", timestamp=timestamp, source="bench",
+            metadata={"index": i, "tags": ["a", "b"]}
+        )
+
+
+def measure(func, rounds=ROUNDS):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def bench_backend(storage, size):
+    notifications = storage.notifications
+    notifications.extend(build_records(size))
+    since_epoch = parse_timestamp(next(iter(notifications.after(size - 100, 1))).timestamp)
+    cursor_seq = notifications.last_seq - 100
+
+    # 完整请求：路由通过模块级仓库访问通知表
+    demo_app.notifications_db = notifications
+    client = demo_app.app.test_client()
+    poll_url = f"/api/notifications?limit={LIMIT}&cursor={notifications.encode_cursor(cursor_seq)}"
+    return {
+        'since': measure(lambda: notifications.since(since_epoch, LIMIT)),
+        'cursor': measure(lambda: notifications.after(cursor_seq, LIMIT)),
+        'get': measure(lambda: notifications.get(f"bench-{size - 50}"), rounds=200),
+        'poll': measure(lambda: client.get(poll_url), rounds=500),
+    }
+
+
+def main():
+    logging.disable(logging.INFO)
+    print("=" * 60)
+    print("⏱️  存储后端轮询延迟基准测试 (µs/次)")
+    print("=" * 60)
+    print(f"{'记录数':>8} {'操作':>8} {'memory':>10} {'sqlite':>10} {'倍数':>8}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = bench_backend(create_storage('memory'), size)
+            sqlite = bench_backend(create_storage('sqlite', os.path.join(tmp, 'bench.db')), size)
+        for op in ('since', 'cursor', 'get', 'poll'):
+            print(f"{size:>8} {op:>8} {memory[op]:>10.2f} {sqlite[op]:>10.2f} {sqlite[op] / memory[op]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 大页被动轮询：整页响应 vs 流式响应
+测量单次请求的内存峰值和首字节时间；关闭片段缓存，只统计请求本身的分配
+"""
+
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as demo_app  # noqa: E402
+from feed_cache import FragmentCache  # noqa: E402
+
+LIMITS = [100, 1_000, 10_000]
+
+
+def measure(url):
+    """返回 (内存峰值KB, 首字节ms, 总耗时ms, 响应字节数)"""
+    with demo_app.app.test_request_context(url):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = demo_app.get_notifications()
+        first_byte = None
+        size = 0
+        for chunk in response.response:
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / 1024, first_byte * 1000, total * 1000, size
+
+
+def main():
+    logging.disable(logging.INFO)
+    for _ in range(max(LIMITS) // 5):
+        demo_app.create_sample_notifications()
+    demo_app.feed_cache = FragmentCache(0)
+
+    print("=" * 72)
+    print(f"🌊 大页轮询基准测试 ({len(demo_app.notifications_db)} 条通知)")
+    print("=" * 72)
+    print(f"{'limit':<8} {'模式':<6} {'内存峰值KB':>12} {'首字节ms':>10} {'总耗时ms':>10} {'响应KB':>10}")
+    for limit in LIMITS:
+        for mode, query in (('整页', ''), ('流式', '&stream=1')):
+            peak, first_byte, total, size = measure(f'/api/notifications?limit={limit}{query}')
+            print(f"{limit:<8} {mode:<6} {peak:>12.0f} {first_byte:>10.2f} {total:>10.2f} {size / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
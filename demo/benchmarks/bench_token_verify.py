@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 推送token的验证合并与提前刷新
+1. 突发推送：多个新用户各有大量并发推送，对比合并前后打到上游verify接口的请求数
+2. 提前刷新：token即将过期时持续推送，检查刷新在后台完成、推送不需要等待验证
+桩服务的verify接口有固定延迟，返回带exp的JWT
+"""
+
+import base64
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+stub = StubHuisheen().start()
+os.environ['HUISHEEN_BASE_URL'] = stub.url
+
+import app as demo_app  # noqa: E402
+
+VERIFY_PATH = '/api/subscriptions/active/verify'
+VERIFY_DELAY = 0.2
+USERS = 20
+PUSHES_PER_USER = 25
+TOKEN_LIFETIME = 3600
+
+
+def make_jwt(lifetime):
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    payload = {'sub': uuid.uuid4().hex, 'exp': time.time() + lifetime}
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(payload)}.signature"
+
+
+def install_route(lifetime):
+    default_route = StubHuisheen.route.__get__(stub)
+
+    def route(method, path, body, headers):
+        if path == VERIFY_PATH:
+            time.sleep(VERIFY_DELAY)
+            return 201, {'message': '主动模式订阅验证成功', 'token': make_jwt(lifetime)}
+        return default_route(method, path, body, headers)
+
+    stub.route = route
+
+
+def push(payload):
+    started = time.perf_counter()
+    status = demo_app.app.test_client().post('/api/send-notification', json=payload).status_code
+    return status, time.perf_counter() - started
+
+
+class NoSingleFlight:
+    """对照组：不合并并发验证"""
+    shared = 0
+
+    def do(self, key, func):
+        return func()
+
+    def in_flight(self, key):
+        return False
+
+
+def burst(single_flight):
+    demo_app.tokens_db.clear()
+    stub.requests.clear()
+    if not single_flight:
+        demo_app.token_cache._flight = NoSingleFlight()
+    payloads = [{'notify_code': f"notify:user:burst-{user}:ABC123@huisheen.com", 'title': '突发推送', 'content': '内容'}
+                for user in range(USERS) for _ in range(PUSHES_PER_USER)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+        results = list(executor.map(push, payloads))
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for status, _ in results if status != 200)
+    return stub.requests[f"POST {VERIFY_PATH}"], elapsed, failed
+
+
+def refresh_ahead():
+    """token有效期3秒、提前2秒刷新，持续推送4秒"""
+    demo_app.tokens_db.clear()
+    stub.requests.clear()
+    install_route(3)
+    demo_app.token_cache.refresh_margin = 2
+    demo_app.token_cache.retry_interval = 0.5
+    payload = {'notify_code': 'notify:user:refresh-0:ABC123@huisheen.com', 'title': '刷新', 'content': '内容'}
+    push(payload)  # 首次验证
+
+    latencies = []
+    stop = time.monotonic() + 4
+
+    def pusher():
+        while time.monotonic() < stop:
+            status, latency = push(payload)
+            latencies.append(latency)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=pusher) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return latencies, stub.requests[f"POST {VERIFY_PATH}"]
+
+
+def main():
+    logging.disable(logging.ERROR)  # 不合并时大量并发连接会被桩服务拒绝，失败数单独统计
+    install_route(TOKEN_LIFETIME)
+    print("=" * 64)
+    print(f"🔑 推送token验证基准测试 (verify延迟 {VERIFY_DELAY * 1000:.0f}ms)")
+    print("=" * 64)
+
+    print(f"\n突发推送: {USERS} 个新用户 x {PUSHES_PER_USER} 次并发推送")
+    flight = demo_app.token_cache._flight
+    verifies, elapsed, failed = burst(single_flight=False)
+    print(f"  不合并: verify请求 {verifies:>4} 次, 耗时 {elapsed:.2f}s, 失败 {failed}")
+    demo_app.token_cache._flight = flight
+    verifies, elapsed, failed = burst(single_flight=True)
+    print(f"  合并:   verify请求 {verifies:>4} 次, 耗时 {elapsed:.2f}s, 失败 {failed}"
+          f" (共享结果 {flight.shared} 次)")
+
+    latencies, verifies = refresh_ahead()
+    info = demo_app.token_cache.info()
+    print("\n提前刷新: token有效期3s，剩余2s时后台刷新，4个线程持续推送4s")
+    print(f"  推送 {len(latencies)} 次, verify请求 {verifies} 次, 后台刷新 {info['refreshes']} 次, "
+          f"推送时已过期 {info['expired']} 次")
+    print(f"  推送延迟: p50 {statistics.median(latencies) * 1000:.1f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms, "
+          f"最大 {latencies[-1] * 1000:.1f}ms (同步验证需要 {VERIFY_DELAY * 1000:.0f}ms 以上)")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
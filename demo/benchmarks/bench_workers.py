@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 多worker部署：1/2/4/8个gunicorn worker共享同一个sqlite存储
+混合负载为被动轮询、单条通知查询、使用已保存token的主动推送（推送到本地桩服务），
+统计各worker数下的吞吐和延迟，并检查在一个worker写入的通知其他worker立即可见
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+DEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DEMO_DIR)
+
+from stub_server import StubHuisheen  # noqa: E402
+
+from models import Notification  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+WORKER_COUNTS = [1, 2, 4, 8]
+CONCURRENCY = 32
+DURATION = 5.0
+NOTIFICATIONS = 1_000
+TOKENS = 50
+MIX = [('poll', 0.7), ('get', 0.2), ('push', 0.1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(path):
+    storage = create_storage('sqlite', path)
+    storage.claim('sample_data')  # 不写入示例数据
+    storage.notifications.extend(
+        Notification(id=f"bench-{i}", title=f"基准测试 {i}", content="内容" * 20, type="info",
+                     priority="normal", timestamp="2024-01-01T00:00:00Z", source="bench",
+                     metadata={"index": i})
+        for i in range(NOTIFICATIONS)
+    )
+    for i in range(TOKENS):
+        storage.tokens.upsert({'notify_id': f"token-{i}", 'token': f"stub-token-{i}",
+                               'notify_code': f"notify:user:token-{i}:ABC@huisheen.com"})
+
+
+def start_workers(workers, path, stub_url):
+    port = free_port()
+    env = dict(os.environ, STORAGE_BACKEND='sqlite', SQLITE_PATH=path, HUISHEEN_BASE_URL=stub_url,
+               GUNICORN_WORKERS=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}")
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning', 'wsgi:app'],
+        cwd=DEMO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(session, base_url, workers):
+    """等待所有worker都能响应（session不复用连接，每次请求可能落到不同worker）"""
+    pids = set()
+    deadline = time.monotonic() + 60
+    while len(pids) < workers and time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                pids.add((await response.json())['worker_pid'])
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.2)
+            continue
+        await asyncio.sleep(0.01)
+    return pids
+
+
+async def check_visibility(session, base_url):
+    """在任一worker创建通知后，用新连接连续读取（分散到各worker），检查都能读到"""
+    async with session.post(f"{base_url}/admin/create-notification", json={'title': '可见性检查'}) as response:
+        notification_id = (await response.json())['notification']['id']
+    statuses = []
+    for _ in range(20):
+        async with session.get(f"{base_url}/api/notifications/{notification_id}") as response:
+            statuses.append(response.status)
+    return all(status == 200 for status in statuses)
+
+
+async def load(session, base_url):
+    latencies = {kind: [] for kind, _ in MIX}
+    errors = 0
+    kinds = [kind for kind, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    deadline = time.monotonic() + DURATION
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            kind = random.choices(kinds, weights)[0]
+            if kind == 'poll':
+                request = session.get(f"{base_url}/api/notifications?limit=20")
+            elif kind == 'get':
+                request = session.get(f"{base_url}/api/notifications/bench-{random.randrange(NOTIFICATIONS)}")
+            else:
+                request = session.post(f"{base_url}/api/send-notification", json={
+                    'use_saved_token': True, 'notify_id': f"token-{random.randrange(TOKENS)}",
+                    'title': '基准测试推送', 'content': '内容'
+                })
+            started = time.perf_counter()
+            async with request as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies[kind].append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(CONCURRENCY)))
+    return latencies, errors
+
+
+async def run(workers, path, stub_url):
+    process, base_url = start_workers(workers, path, stub_url)
+    try:
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True), timeout=timeout) as session:
+            pids = await wait_ready(session, base_url, workers)
+            visible = await check_visibility(session, base_url)
+        connector = aiohttp.TCPConnector(limit=CONCURRENCY)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            latencies, errors = await load(session, base_url)
+    finally:
+        process.terminate()
+        process.wait()
+    return len(pids), visible, latencies, errors
+
+
+def main():
+    logging.disable(logging.INFO)
+    stub = StubHuisheen().start()
+    print("=" * 78)
+    print(f"🏭 多worker基准测试 (CPU核数 {os.cpu_count()}, {CONCURRENCY} 个并发客户端, 每轮 {DURATION:.0f}s)")
+    print(f"   负载: " + ", ".join(f"{kind} {weight:.0%}" for kind, weight in MIX))
+    print("=" * 78)
+    print(f"{'worker':>6} {'总请求/秒':>10} {'poll/秒':>9} {'get/秒':>8} {'push/秒':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'错误':>5} {'跨worker可见':>10}")
+    for workers in WORKER_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            seed(path)
+            ready, visible, latencies, errors = asyncio.run(run(workers, path, stub.url))
+        merged = sorted(latency for values in latencies.values() for latency in values)
+        rates = {kind: len(values) / DURATION for kind, values in latencies.items()}
+        print(f"{ready:>6} {len(merged) / DURATION:>10.0f} {rates['poll']:>9.0f} {rates['get']:>8.0f} "
+              f"{rates['push']:>8.0f} {statistics.median(merged) * 1000:>8.1f} "
+              f"{merged[int(len(merged) * 0.99) - 1] * 1000:>8.1f} {errors:>5} {'✅' if visible else '❌':>10}")
+    stub.stop()
+    print("注: 吞吐随worker数的增长受CPU核数限制；单核机器上多worker只增加调度开销")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查脚本 - 上游熔断：把本地桩服务切换为故障（返回503）或变慢（超过超时时间），
+检查熔断器按失败率/慢调用比例打开、熔断期间的推送和外部API请求立即返回503、
+冷却后探测成功即恢复，并对比熔断前后单次请求的耗时
+"""
+
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+stub = StubHuisheen().start()
+os.environ.update({
+    'HUISHEEN_BASE_URL': stub.url,
+    'HTTP_TIMEOUT': '1',
+    'BREAKER_WINDOW': '10',
+    'BREAKER_MIN_CALLS': '5',
+    'BREAKER_SLOW_CALL': '0.5',
+    'BREAKER_OPEN_SECONDS': '2',
+})
+
+import logging  # noqa: E402
+
+import app as demo_app  # noqa: E402
+from http_pool import breakers  # noqa: E402
+
+NOTIFY_ID = 'breaker-check'
+PUSH = {'use_saved_token': True, 'notify_id': NOTIFY_ID, 'title': '熔断检查', 'content': '内容'}
+SEND_PATH = 'POST /api/notifications/receive'
+failures = []
+
+
+def check(ok, message):
+    print(f"  {'✅' if ok else '❌'} {message}")
+    if not ok:
+        failures.append(message)
+
+
+def push():
+    started = time.perf_counter()
+    response = demo_app.app.test_client().post('/api/send-notification', json=PUSH)
+    return response, time.perf_counter() - started
+
+
+def state(name='push.send'):
+    return breakers.info().get(name, {}).get('state', 'closed')
+
+
+def trip(label, calls):
+    """连续推送直到熔断器打开，返回 (打开前各次耗时, 打开后各次耗时)"""
+    before, after = [], []
+    for _ in range(calls):
+        response, elapsed = push()
+        (after if response.headers.get('Retry-After') and state() == 'open' else before).append(elapsed)
+    requests_sent = stub.requests[SEND_PATH]
+    _, elapsed = push()
+    check(state() == 'open', f"{label}: 熔断器已打开（{len(before)} 次调用后）")
+    check(stub.requests[SEND_PATH] == requests_sent, f"{label}: 熔断期间不再请求上游")
+    if after:
+        print(f"     熔断前每次推送 {statistics.mean(before) * 1000:.0f}ms，"
+              f"熔断后 {statistics.mean(after) * 1000:.1f}ms")
+    return before, after
+
+
+def recover(label):
+    stub.fail = False
+    stub.delay = 0.0
+    response, _ = push()
+    check(response.status_code == 503, f"{label}: 冷却期内仍快速失败")
+    time.sleep(breakers.get('push.send').open_seconds)
+    response, _ = push()
+    check(response.status_code == 200 and state() == 'closed', f"{label}: 冷却后探测成功，熔断器关闭")
+
+
+def concurrent_wave(size=16):
+    """并发推送一波，返回总耗时"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=size) as executor:
+        list(executor.map(lambda _: push(), range(size)))
+    return time.perf_counter() - started
+
+
+def main():
+    logging.disable(logging.ERROR)
+    demo_app.tokens_db.upsert({'notify_id': NOTIFY_ID, 'token': 'stub-token',
+                               'notify_code': f"notify:user:{NOTIFY_ID}:ABC@huisheen.com"})
+    print("=" * 64)
+    print("⚡ 上游熔断检查 (超时1s，窗口10次/至少5次，慢调用0.5s，冷却2s)")
+    print("=" * 64)
+
+    print("\n1. 上游正常")
+    response, _ = push()
+    check(response.status_code == 200 and state() == 'closed', "推送成功，熔断器关闭")
+
+    print("\n2. 上游故障（返回503）")
+    stub.fail = True
+    trip("故障", 8)
+    response, _ = push()
+    check(response.status_code == 503 and response.headers.get('Retry-After') is not None,
+          f"熔断期间返回503，Retry-After: {response.headers.get('Retry-After')}")
+    recover("故障")
+
+    print("\n3. 上游变慢（每个请求1.5s，超过1s超时）")
+    stub.delay = 1.5
+    trip("超时", 7)
+    print(f"     熔断期间16个并发推送总耗时 {concurrent_wave() * 1000:.0f}ms")
+    recover("超时")
+
+    print("\n4. 上游变慢但未超时（每个请求0.6s，慢调用阈值0.5s）")
+    stub.delay = 0.6
+    trip("慢调用", 7)
+    recover("慢调用")
+
+    print("\n5. 外部API（与推送的熔断器相互独立）")
+    demo_app.external_tokens_db.upsert({'notify_id': NOTIFY_ID, 'token': 'stub-token', 'username': 'stub'})
+    stub.fail = True
+    client = demo_app.app.test_client()
+    for _ in range(6):
+        client.get(f'/api/external/notifications/{NOTIFY_ID}')
+    started = time.perf_counter()
+    response = client.get(f'/api/external/notifications/{NOTIFY_ID}')
+    elapsed = time.perf_counter() - started
+    check(response.status_code == 503 and state('external.notifications') == 'open',
+          f"外部通知查询熔断后返回503（{elapsed * 1000:.1f}ms）")
+    check(state() == 'closed', "推送端点的熔断器不受影响")
+    stub.fail = False
+
+    health = demo_app.app.test_client().get('/health').get_json()['circuit_breakers']
+    print("\n/health 中的熔断器状态:")
+    for name, info in health.items():
+        print(f"  {name:<24} {info['state']:<10} 调用 {info['calls']:>3}  失败 {info['failures']:>3}  "
+              f"慢调用 {info['slow_calls']:>3}  拒绝 {info['rejected']:>3}  打开 {info['opened']} 次")
+
+    stub.stop()
+    if failures:
+        print(f"\n❌ {len(failures)} 项检查失败")
+        sys.exit(1)
+    print("\n✅ 所有检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查脚本 - 性能分析接口：管理员令牌保护、单个请求的cProfile结果、
+在被动轮询和主动推送负载下采样得到的折叠栈、按路由汇总的内存分配，
+以及未分析时中间件和采样期间对请求的额外开销
+"""
+
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import timeit
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+stub = StubHuisheen().start()
+ADMIN_TOKEN = 'check-admin-token'
+os.environ.update({'HUISHEEN_BASE_URL': stub.url, 'DEMO_ADMIN_TOKEN': ADMIN_TOKEN})
+
+import app as demo_app  # noqa: E402
+from models import Notification  # noqa: E402
+from profiling import ProfilingMiddleware, StackSampler  # noqa: E402
+
+ADMIN = {'X-Admin-Token': ADMIN_TOKEN}
+PUSH = {'use_saved_token': True, 'notify_id': 'profile-check', 'title': '分析检查', 'content': '内容'}
+THREADS = 4
+SAMPLE_SECONDS = 2.0
+failures = []
+
+
+def check(ok, message):
+    print(f"  {'✅' if ok else '❌'} {message}")
+    if not ok:
+        failures.append(message)
+
+
+def poll(client):
+    client.get('/api/notifications?limit=20')
+
+
+def push(client):
+    client.post('/api/send-notification', json=PUSH)
+
+
+def run_load(stop, workload):
+    client = demo_app.app.test_client()
+    while not stop.is_set():
+        workload(client)
+
+
+def requests_per_second(workload, seconds=1.0):
+    client = demo_app.app.test_client()
+    count, deadline = 0, time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        workload(client)
+        count += 1
+    return count / seconds
+
+
+def main():
+    logging.disable(logging.ERROR)
+    demo_app.tokens_db.upsert({'notify_id': 'profile-check', 'token': 'stub-token'})
+    demo_app.notifications_db.extend(
+        Notification(id=f"profile-{i}", title=f"通知 {i}", content="内容", type="info", priority="normal",
+                     timestamp="2024-01-01T00:00:00Z", source="check")
+        for i in range(100)
+    )
+    client = demo_app.app.test_client()
+    print("=" * 64)
+    print("🔬 性能分析接口检查")
+    print("=" * 64)
+
+    print("\n1. 管理员令牌")
+    response = client.get('/admin/profile/sample?seconds=0.1')
+    check(response.status_code == 403, f"无令牌访问采样接口返回 {response.status_code}")
+    response = client.get('/admin/profile/tracemalloc', headers={'X-Admin-Token': 'wrong'})
+    check(response.status_code == 403, f"错误令牌访问内存接口返回 {response.status_code}")
+    response = client.get('/api/notifications?limit=5&_profile=1')
+    check(response.is_json and 'notifications' in response.get_json(), "无令牌的分析标记按普通请求处理")
+
+    print("\n2. 单个请求的cProfile")
+    response = client.get('/api/notifications?limit=20&_profile=1&_profile_limit=15', headers=ADMIN)
+    text = response.get_data(as_text=True)
+    check(response.mimetype == 'text/plain' and 'get_notifications' in text,
+          f"被动轮询返回分析文本（原状态 {response.headers.get('X-Profiled-Status')}，"
+          f"{float(response.headers.get('X-Profiled-Seconds', 0)) * 1000:.2f}ms）")
+    response = client.post('/api/send-notification?_profile_limit=60', json=PUSH,
+                           headers=dict(ADMIN, **{'X-Profile': '1'}))
+    text = response.get_data(as_text=True)
+    check('deliver_push' in text and response.headers.get('X-Profiled-Status', '').startswith('200'),
+          "X-Profile 头分析主动推送，结果包含 deliver_push")
+    print('     ' + '\n     '.join(text.splitlines()[:2]))
+    response = client.get('/api/notifications?_profile=pstats', headers=ADMIN)
+    stats = marshal.loads(response.get_data())
+    check(any(func[2] == 'get_notifications' for func in stats), f"pstats格式包含 {len(stats)} 个函数")
+
+    print(f"\n3. 调用栈采样（{THREADS} 个线程持续轮询和推送，采样 {SAMPLE_SECONDS:.0f}s）")
+    stop = threading.Event()
+    threads = [threading.Thread(target=run_load, args=(stop, poll if i % 2 else push)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    result = {}
+    sampling = threading.Thread(target=lambda: result.update(response=demo_app.app.test_client().get(
+        f'/admin/profile/sample?seconds={SAMPLE_SECONDS}&interval_ms=5', headers=ADMIN)))
+    sampling.start()
+    time.sleep(0.2)
+    busy = client.get('/admin/profile/sample?seconds=0.1', headers=ADMIN)
+    busy.close()  # WSGI服务器在响应发送完后调用close，测试客户端需要手动关闭
+    sampling.join()
+    response = result['response']
+    stop.set()
+    for thread in threads:
+        thread.join()
+    lines = response.get_data(as_text=True).splitlines()
+    roots, leaves = Counter(), Counter()
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        frames = stack.split(';')
+        roots[frames[0]] += int(count)
+        leaves[frames[-1]] += int(count)
+    check({'GET /api/notifications', 'POST /api/send-notification'} <= set(roots),
+          f"{len(lines)} 条折叠栈（{response.headers.get('X-Sample-Rounds')} 轮采样），栈底为路由")
+    check(all(line.rsplit(' ', 1)[1].isdigit() for line in lines), "每行为 \"栈 次数\"，可交给 flamegraph.pl")
+    for root, count in roots.most_common():
+        print(f"     {root:<36} {count:>6} 次")
+    print("     采样最多的栈顶函数:")
+    for leaf, count in leaves.most_common(5):
+        print(f"       {leaf:<50} {count:>5}")
+    check(busy.status_code == 409, f"采样进行中再次请求返回 {busy.status_code}")
+
+    print("\n4. 按路由的内存分配")
+    client.post('/admin/profile/tracemalloc?frames=32', headers=ADMIN)
+    for i in range(300):
+        client.post('/admin/create-notification', json={'title': f'内存 {i}', 'content': '内容' * 200})
+        poll(client)
+    report = client.get('/admin/profile/tracemalloc?limit=3', headers=ADMIN).get_json()
+    routes = [entry['route'] for entry in report['routes']]
+    check(report['tracing'] and '/admin/create-notification' in routes,
+          f"开启以来新增 {report['traced_bytes'] / 1024:.0f} KiB，归属到 {len(routes)} 个路由")
+    for entry in report['routes'][:3]:
+        print(f"     {entry['route']:<32} {entry['size_diff'] / 1024:>8.1f} KiB {entry['count_diff']:>7} 个")
+        for site in entry['top'][:2]:
+            print(f"       {os.path.basename(site['location']):<40} {site['size_diff'] / 1024:>8.1f} KiB")
+    client.delete('/admin/profile/tracemalloc', headers=ADMIN)
+    check(not client.get('/health').get_json()['profiling']['tracemalloc'], "关闭后不再跟踪")
+
+    print("\n5. 开销")
+    sampler = StackSampler()
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/notifications', 'QUERY_STRING': 'limit=20'}
+    bare = lambda environ, start_response: []  # noqa: E731
+    wrapped = ProfilingMiddleware(bare, ADMIN_TOKEN, sampler, demo_app.route_of)
+    number = 200_000
+    base = timeit.timeit(lambda: bare(environ, None), number=number)
+    middleware_ns = (timeit.timeit(lambda: wrapped(environ, None), number=number) - base) / number * 1e9
+    print(f"     未分析的请求经过中间件: +{middleware_ns:.0f} ns")
+    idle = requests_per_second(poll)
+    sampling = threading.Thread(target=demo_app.stack_sampler.sample, args=(1.0, 0.01))
+    sampling.start()
+    during = requests_per_second(poll)
+    sampling.join()
+    print(f"     被动轮询（单线程）: {idle:.0f} 请求/秒，采样期间（10ms间隔） {during:.0f} 请求/秒")
+
+    stub.stop()
+    if failures:
+        print(f"\n❌ {len(failures)} 项检查失败")
+        sys.exit(1)
+    print("\n✅ 所有检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压力测试 - webhook扇出：1000个本地桩订阅者
+其中少量订阅者响应很慢或间歇失败，检查其余订阅者的延迟不受影响，
+且每个订阅者收到的通知顺序与创建顺序一致
+"""
+
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubHuisheen  # noqa: E402
+
+import app as demo_app  # noqa: E402
+
+SUBSCRIBERS = 1_000
+SLOW = 10  # 每次响应延迟SLOW_DELAY秒的订阅者数
+FLAKY = 10  # 每个事件首次发送返回503的订阅者数
+SLOW_DELAY = 0.2
+NOTIFICATIONS = 20
+
+
+def main():
+    logging.disable(logging.WARNING)  # 间歇失败的订阅者会产生大量重试警告
+    received = {}
+    failed_once = set()
+    lock = threading.Lock()
+
+    def route(method, path, body, headers):
+        name = path.rsplit('/', 1)[-1]
+        title = body['notification']['title']
+        if name.startswith('slow'):
+            time.sleep(SLOW_DELAY)
+        with lock:
+            if name.startswith('flaky') and (name, title) not in failed_once:
+                failed_once.add((name, title))
+                return 503, {'error': 'unavailable'}
+            received.setdefault(name, []).append(title)
+        return 200, {'success': True}
+
+    stub = StubHuisheen().start()
+    stub.route = route
+    demo_app.webhook_fanout.base_delay = 0.05
+
+    names = ([f"slow-{i}" for i in range(SLOW)] + [f"flaky-{i}" for i in range(FLAKY)]
+             + [f"fast-{i}" for i in range(SUBSCRIBERS - SLOW - FLAKY)])
+    for name in names:
+        demo_app.subscribers_db.upsert({'id': name, 'url': f"{stub.url}/hook/{name}", 'name': name})
+
+    print("=" * 64)
+    print(f"📡 webhook扇出压力测试 ({SUBSCRIBERS} 个订阅者 x {NOTIFICATIONS} 条通知, "
+          f"{demo_app.WEBHOOK_WORKERS} 个工作线程)")
+    print("=" * 64)
+
+    client = demo_app.app.test_client()
+    titles = [f"通知-{i}" for i in range(NOTIFICATIONS)]
+    started = time.perf_counter()
+    for title in titles:
+        client.post('/admin/create-notification', json={'title': title})
+    publish_time = time.perf_counter() - started
+
+    expected = SUBSCRIBERS * NOTIFICATIONS
+    fast_names = [name for name in names if name.startswith('fast')]
+    fast_done_at = None
+    while demo_app.webhook_fanout.metrics()['totals']['delivered'] < expected:
+        if fast_done_at is None and all(len(received.get(name, [])) == NOTIFICATIONS for name in fast_names):
+            fast_done_at = time.perf_counter() - started
+        if time.perf_counter() - started > 300:
+            break
+        time.sleep(0.05)
+    total_time = time.perf_counter() - started
+
+    metrics = demo_app.webhook_fanout.metrics()
+    totals = metrics['totals']
+    print(f"创建 {NOTIFICATIONS} 条通知（含入队）耗时: {publish_time * 1000:.1f}ms")
+    print(f"投递: {totals['delivered']}/{expected} 成功, 重试 {totals['retried']}, 失败 {totals['failed']}")
+    print(f"普通订阅者全部送达: {fast_done_at or total_time:.2f}s; 全部送达: {total_time:.2f}s")
+    print(f"整体吞吐: {totals['delivered'] / total_time:.0f} 次/秒")
+
+    for group in ('fast', 'flaky', 'slow'):
+        group_metrics = [m for name, m in metrics['subscribers'].items() if name.startswith(group)]
+        p50 = statistics.median(m['latency_p50_ms'] for m in group_metrics)
+        p99 = max(m['latency_p99_ms'] for m in group_metrics)
+        print(f"  {group:<6} {len(group_metrics):>4} 个: 延迟p50中位数 {p50:.0f}ms, 最大p99 {p99:.0f}ms")
+
+    in_order = all(received.get(name) == titles for name in names)
+    print(f"\n{'✅' if in_order else '❌'} 每个订阅者按创建顺序收到全部通知: {in_order}")
+    demo_app.webhook_fanout.stop()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
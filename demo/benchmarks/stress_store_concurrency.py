@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压力测试 - 存储并发访问：多线程轮询的同时持续写入、清空、增删token
+检查每次读取的结果都自洽（序号连续递增、按ID查到的就是该ID的通知、
+ETag版本号对应的数据已可见），并统计不同轮询线程数下的吞吐
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Notification  # noqa: E402
+from notification_store import RetentionPolicy  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+READER_COUNTS = [1, 2, 4, 8]
+WRITERS = 2
+PHASE_SECONDS = 2.0
+PAGE = 50
+
+
+def make_notification(i):
+    return Notification(
+        id=f"stress-{i % 5000}", title=f"压力测试 {i}", content="内容", type="info", priority="normal",
+        timestamp=datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'), source="stress",
+        metadata={"i": i}
+    )
+
+
+class Stress:
+    def __init__(self, storage):
+        self.notifications = storage.notifications
+        self.tokens = storage.tokens
+        self.stop = threading.Event()
+        self.errors = []
+        self.polls = 0
+        self.writes = 0
+        self._counter_lock = threading.Lock()
+
+    def fail(self, message):
+        if len(self.errors) < 20:
+            self.errors.append(message)
+
+    def writer(self, index):
+        i = index * 10_000_000
+        while not self.stop.is_set():
+            if random.random() < 0.2:
+                self.notifications.extend([make_notification(i + k) for k in range(10)])
+                i += 10
+            else:
+                self.notifications.append(make_notification(i))
+                i += 1
+            if random.random() < 0.0005:
+                self.notifications.clear()
+            # token表：增删交替
+            key = f"token-{random.randrange(100)}"
+            if random.random() < 0.5:
+                self.tokens.upsert({'notify_id': key, 'token': 'x'})
+            else:
+                self.tokens.delete(key)
+            with self._counter_lock:
+                self.writes += 1
+
+    def reader(self):
+        store = self.notifications
+        cursor = 0
+        polls = 0
+        while not self.stop.is_set():
+            version = store.version
+            last_seq = store.last_seq
+            page = store.after(cursor, PAGE)
+            seqs = [n.seq for n in page]
+            if page and seqs[0] <= cursor:
+                self.fail(f"after({cursor}) 返回了不大于cursor的序号 {seqs[0]}")
+            if seqs and seqs != list(range(seqs[0], seqs[0] + len(seqs))):
+                self.fail(f"一页内序号不连续: {seqs[:5]}...")
+            # 版本号未变时视图未变：cursor之后还有通知，就不应读到空页
+            first_retained = store.seq_before(None)
+            if not page and version == store.version and last_seq > max(cursor, first_retained):
+                self.fail(f"版本 {version} 下last_seq={last_seq}，但after({cursor})为空")
+            # 空页时的下一页起点，与接口的empty_page_seq一致
+            cursor = seqs[-1] if seqs else max(min(cursor, last_seq), first_retained)
+
+            since_page = store.since(None, PAGE)
+            if since_page and any(a.seq + 1 != b.seq for a, b in zip(since_page, since_page[1:])):
+                self.fail("since结果序号不连续")
+
+            key = f"stress-{random.randrange(5000)}"
+            found = store.get(key)
+            if found is not None and found.id != key:
+                self.fail(f"get({key}) 返回了 {found.id}")
+
+            for record in self.tokens:
+                if 'notify_id' not in record:
+                    self.fail("token记录不完整")
+                    break
+            polls += 1
+        with self._counter_lock:
+            self.polls += polls
+
+
+def run_phase(storage, readers, writers):
+    stress = Stress(storage)
+    threads = [threading.Thread(target=stress.reader) for _ in range(readers)]
+    threads += [threading.Thread(target=stress.writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(PHASE_SECONDS)
+    stress.stop.set()
+    for thread in threads:
+        thread.join()
+    return stress
+
+
+def main():
+    storage = create_storage('memory', retention=RetentionPolicy(max_count=5000))
+    storage.notifications.extend(make_notification(i) for i in range(5000))
+
+    print("=" * 72)
+    print(f"🧵 存储并发压力测试 (CPU核数 {os.cpu_count()}, 每轮 {PHASE_SECONDS:.0f}s, 每页 {PAGE} 条)")
+    print("=" * 72)
+    print(f"{'轮询线程':>8} {'写入线程':>8} {'轮询/秒':>10} {'写入/秒':>10} {'错误':>6}")
+    all_errors = []
+    for writers in (0, WRITERS):
+        for readers in READER_COUNTS:
+            stress = run_phase(storage, readers, writers)
+            all_errors += stress.errors
+            print(f"{readers:>8} {writers:>8} {stress.polls / PHASE_SECONDS:>10.0f} "
+                  f"{stress.writes / PHASE_SECONDS:>10.0f} {len(stress.errors):>6}")
+
+    stats = storage.notifications.retention_stats()
+    print(f"\n通知表: {stats['count']} 条, 累计淘汰 {sum(stats['evicted'].values())} 条")
+    if all_errors:
+        print("❌ 发现不一致:")
+        for error in all_errors[:10]:
+            print(f"  - {error}")
+        sys.exit(1)
+    print("✅ 所有读取结果自洽")
+    print("注: 读取方不加锁，写入不阻塞轮询；CPython的GIL下纯Python读取无法在多核上并行，\n"
+          "    吞吐能否随线程数增长取决于CPU核数和请求中释放GIL的部分（网络IO、sqlite查询）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地回声平台桩服务 - 供基准测试使用
+实现主动推送和外部API用到的端点，支持HTTP/1.1 keep-alive，
+可以通过 delay / fail 属性模拟上游变慢或故障
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHuisheen:
+    """回声平台桩服务"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.delay = 0.0  # 每个请求的额外延迟（秒）
+        self.fail = False  # 为True时所有请求返回503
+        self.rejected_ids = set()  # 批量已读接口额外拒绝的ID（格式正确但上游校验失败）
+        self.requests = Counter()  # 按路径统计请求数
+        self.connections = 0  # 建立的TCP连接数
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写出，关闭Nagle避免keep-alive连接上的延迟确认等待
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                path = self.path.split('?')[0]
+                stub.requests[f"{method} {path}"] += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if stub.fail:
+                    return self._reply(503, {'error': '服务不可用'})
+                status, payload = stub.route(method, path, body, self.headers)
+                self._reply(status, payload)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PATCH(self):
+                self._handle('PATCH')
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # 客户端超时后断开连接时写响应会失败，属于预期情况
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self.server = Server((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def route(self, method, path, body, headers):
+        """按路径返回模拟响应"""
+        if path == '/api/subscriptions/active/verify':
+            return 201, {'message': '主动模式订阅验证成功', 'token': f"stub-{uuid.uuid4().hex}"}
+        if path == '/api/notifications/receive':
+            return 201, {'success': True, 'notificationId': uuid.uuid4().hex}
+        if path == '/api/external/auth':
+            notify_id = body.get('notifyCode', 'notify:user:stub:0').split(':')[2]
+            return 201, {
+                'token': f"stub-{uuid.uuid4().hex}",
+                'userInfo': {'notifyId': notify_id, 'username': 'stub'},
+                'expiresIn': '30天'
+            }
+        if path == '/api/external/notifications':
+            return 200, {'data': {'notifications': [], 'pagination': {'page': 1, 'total': 0}}}
+        if path == '/api/external/stats':
+            return 200, {'data': {'total': 0, 'unread': 0}}
+        if path == '/api/external/notifications/batch/read':
+            ids = body.get('notificationIds', [])
+            # 与上游一致：任一ID不是ObjectId时整批返回400
+            invalid = [i for i in ids if not re.fullmatch(r'[0-9a-fA-F]{24}', str(i)) or i in self.rejected_ids]
+            if invalid:
+                return 400, {'error': '请求参数验证失败', 'details': [{'msg': '通知ID格式不正确', 'value': i} for i in invalid]}
+            return 200, {'success': True, 'modifiedCount': len(ids), 'totalRequested': len(ids)}
+        if re.fullmatch(r'/api/external/notifications/[^/]+/read', path):
+            return 200, {'success': True}
+        return 404, {'error': 'not found'}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熔断器 - 按上游端点统计最近调用的失败率和慢调用比例，超过阈值时熔断：
+熔断期间的调用立即失败，不再等待上游超时；冷却时间过后放行少量探测调用，
+探测成功则恢复，失败则继续熔断
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """熔断期间的调用被拒绝，retry_after为建议的重试等待秒数"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"上游端点 {name} 已熔断，{retry_after:.0f}秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    单个上游端点的熔断器
+
+    - closed: 正常放行，记录最近window次调用的结果；调用数不少于min_calls且
+      失败率达到error_rate或慢调用（耗时不少于slow_call秒）比例达到slow_rate时转为open
+    - open: 调用立即抛出CircuitOpenError，open_seconds秒后转为half_open
+    - half_open: 最多同时放行half_open_calls个探测调用，全部成功则转为closed，
+      任一失败或过慢则重新open
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call: float = 2.0, slow_rate: float = 0.5, open_seconds: float = 30.0,
+                 half_open_calls: int = 1):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._results = deque(maxlen=window)  # (是否失败, 是否过慢)
+        self._opened_at = 0.0
+        self._probes = 0  # half_open状态下正在进行的探测调用数
+        self._probe_successes = 0
+        self.stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+
+    def _advance(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._results.clear()
+        self.stats['opened'] += 1
+
+    def before(self) -> bool:
+        """调用前检查，熔断中时抛出CircuitOpenError；返回本次调用是否为half_open状态下的探测调用"""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.stats['rejected'] += 1
+            retry_after = self._opened_at + self.open_seconds - now if self._state == OPEN else 1.0
+        raise CircuitOpenError(self.name, max(retry_after, 1.0))
+
+    def record(self, failed: bool, elapsed: float, probe: bool = False) -> None:
+        """记录一次放行调用的结果，probe为before()的返回值"""
+        slow = elapsed >= self.slow_call
+        with self._lock:
+            now = time.monotonic()
+            self.stats['calls'] += 1
+            self.stats['failures'] += failed
+            self.stats['slow_calls'] += slow
+            if probe:
+                if self._state != HALF_OPEN:
+                    return  # 其他探测调用已经决定了状态
+                self._probes -= 1
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        self._state = CLOSED
+                return
+            if self._state != CLOSED:
+                return  # 熔断前已放行的调用，结果不再计入
+            self._results.append((failed, slow))
+            total = len(self._results)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._results if failed)
+            slow_calls = sum(1 for _, slow in self._results if slow)
+            if failures >= self.error_rate * total or slow_calls >= self.slow_rate * total:
+                self._open(now)
+
+    def release(self, probe: bool) -> None:
+        """放行的调用被取消、没有结果时调用，归还探测名额"""
+        with self._lock:
+            if probe and self._state == HALF_OPEN:
+                self._probes -= 1
+
+    def call(self, func: Callable[[], Any], is_failure: Callable[[Any], bool] = lambda result: False) -> Any:
+        """经熔断器执行func；抛出异常或is_failure(结果)为真时记为失败"""
+        probe = self.before()
+        started = time.perf_counter()
+        try:
+            result = func()
+        except BaseException:
+            self.record(True, time.perf_counter() - started, probe)
+            raise
+        self.record(is_failure(result), time.perf_counter() - started, probe)
+        return result
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            total = len(self._results)
+            info = dict(
+                self.stats,
+                state=self._state,
+                window_calls=total,
+                error_rate=round(sum(1 for failed, _ in self._results if failed) / total, 3) if total else 0.0,
+                slow_rate=round(sum(1 for _, slow in self._results if slow) / total, 3) if total else 0.0,
+            )
+            if self._state == OPEN:
+                info['retry_after'] = round(self._opened_at + self.open_seconds - now, 1)
+            return info
+
+
+class CircuitBreakers:
+    """按名称（上游端点）创建和查找熔断器，各熔断器使用相同的配置"""
+
+    def __init__(self, **config):
+        self.config = config
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name, **self.config))
+        return breaker
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """丢弃熔断器的状态（name为None时全部丢弃）"""
+        with self._lock:
+            if name is None:
+                self._breakers.clear()
+            else:
+                self._breakers.pop(name, None)
+
+    def info(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.info() for breaker in sorted(breakers, key=lambda b: b.name)}
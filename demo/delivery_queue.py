@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步投递队列 - 主动推送的后台发送
+推送先进入有界的进程内队列，由后台线程取出发送；失败的推送按指数退避加随机抖动重试，
+队列满时拒绝新推送，调用方据此返回429
+"""
+
+import heapq
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """投递队列已满"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class DeliveryQueue:
+    """
+    有界投递队列
+
+    send(payload) 返回发送结果，失败时抛出异常；is_retryable(exc) 判断该异常是否值得重试。
+    等待重试的推送放在按到期时间排序的堆中，不占用工作线程，也计入队列容量。
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Any],
+                 is_retryable: Callable[[Exception], bool] = lambda exc: True,
+                 workers: int = 4, max_size: int = 1000, max_attempts: int = 5,
+                 base_delay: float = 0.5, max_delay: float = 30.0, history_size: int = 10000):
+        self._send = send
+        self._is_retryable = is_retryable
+        self.workers = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.history_size = history_size
+
+        self._cond = threading.Condition()
+        self._ready = deque()  # 待发送的投递ID
+        self._delayed = []  # (到期时间, 投递ID) 小顶堆
+        self._in_flight = 0
+        self._deliveries: Dict[str, Dict[str, Any]] = {}
+        self._finished: Deque[str] = deque()  # 已结束的投递ID，按结束顺序，历史记录超出上限时从头部淘汰
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self._threads = []
+        self._stopping = False
+        self.stats = {'submitted': 0, 'delivered': 0, 'failed': 0, 'retried': 0, 'rejected': 0}
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'delivery-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, payload: Dict[str, Any], **info) -> str:
+        """加入队列并返回投递ID，队列满时抛出QueueFull"""
+        delivery_id = str(uuid.uuid4())
+        with self._cond:
+            if len(self._ready) + len(self._delayed) >= self.max_size:
+                self.stats['rejected'] += 1
+                raise QueueFull()
+            self._deliveries[delivery_id] = dict(
+                info, id=delivery_id, status='queued', attempts=0,
+                created_at=_now(), updated_at=_now(), result=None, last_error=None
+            )
+            self._payloads[delivery_id] = payload
+            self._ready.append(delivery_id)
+            self.stats['submitted'] += 1
+            self._trim_history()
+            self._cond.notify()
+        return delivery_id
+
+    def get(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            delivery = self._deliveries.get(delivery_id)
+            return dict(delivery) if delivery else None
+
+    def depth(self) -> int:
+        """排队和等待重试的推送数"""
+        with self._cond:
+            return len(self._ready) + len(self._delayed)
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间：指数退避，在[0, 上限]内随机抖动"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _trim_history(self) -> None:
+        # 只淘汰已结束的投递记录（最早结束的先淘汰），排队中的记录保留
+        while len(self._deliveries) > self.history_size and self._finished:
+            del self._deliveries[self._finished.popleft()]
+
+    def _finish(self, delivery_id: str) -> None:
+        self._payloads.pop(delivery_id, None)
+        self._finished.append(delivery_id)
+        self._trim_history()
+
+    def _next(self) -> Optional[str]:
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[1])
+                if self._ready:
+                    self._in_flight += 1
+                    return self._ready.popleft()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._cond.wait(timeout)
+            return None
+
+    def _run(self) -> None:
+        while True:
+            delivery_id = self._next()
+            if delivery_id is None:
+                return
+            self._attempt(delivery_id)
+
+    def _attempt(self, delivery_id: str) -> None:
+        with self._cond:
+            delivery = self._deliveries.get(delivery_id)
+            payload = self._payloads.get(delivery_id)
+            delivery['status'] = 'sending'
+            delivery['attempts'] += 1
+            delivery['updated_at'] = _now()
+
+        try:
+            result = self._send(payload)
+        except Exception as e:
+            retry = self._is_retryable(e) and delivery['attempts'] < self.max_attempts
+            with self._cond:
+                self._in_flight -= 1
+                delivery['last_error'] = str(e)
+                delivery['updated_at'] = _now()
+                if retry:
+                    # 异常带有retry_after（如上游熔断）时至少等待到该时间之后
+                    delay = max(self.backoff(delivery['attempts']), getattr(e, 'retry_after', None) or 0)
+                    delivery['status'] = 'retrying'
+                    delivery['next_attempt_in'] = round(delay, 3)
+                    heapq.heappush(self._delayed, (time.monotonic() + delay, delivery_id))
+                    self.stats['retried'] += 1
+                    self._cond.notify()
+                else:
+                    delivery['status'] = 'failed'
+                    self._finish(delivery_id)
+                    self.stats['failed'] += 1
+            if retry:
+                logger.warning(f"投递失败，{delay:.2f}秒后重试 ({delivery['attempts']}/{self.max_attempts}): {delivery_id} - {e}")
+            else:
+                logger.error(f"投递失败，不再重试: {delivery_id} - {e}")
+            return
+
+        with self._cond:
+            self._in_flight -= 1
+            delivery['status'] = 'delivered'
+            delivery['result'] = result
+            delivery['updated_at'] = _now()
+            delivery.pop('next_attempt_in', None)
+            self._finish(delivery_id)
+            self.stats['delivered'] += 1
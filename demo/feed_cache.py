@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知序列化缓存 - 被动轮询响应的预编码JSON片段
+通知写入后内容不再变化，每条通知只需编码一次；轮询响应直接拼接缓存的片段，
+缓存有容量上限，超出时淘汰最久未使用的片段
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+FEED_CACHE_SIZE = int(os.getenv('FEED_CACHE_SIZE', '10000'))  # 缓存的通知片段数上限
+
+
+class FragmentCache:
+    """
+    线程安全的LRU片段缓存
+
+    用法:
+        cache = FragmentCache(1000)
+        data = cache.get_or_encode(key, lambda: json.dumps(obj).encode())
+    """
+
+    def __init__(self, max_size: int = FEED_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._fragments: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_encode(self, key: Hashable, encode: Callable[[], bytes]) -> bytes:
+        """返回key对应的片段，未缓存时调用encode生成并缓存"""
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.stats['hits'] += 1
+                return fragment
+            self.stats['misses'] += 1
+
+        # 编码在锁外进行，并发未命中时最多重复编码一次
+        fragment = encode()
+        if self.max_size <= 0:
+            return fragment
+
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_size:
+                self._fragments.popitem(last=False)
+                self.stats['evictions'] += 1
+        return fragment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fragments.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, size=len(self._fragments), max_size=self.max_size)
+
+    def __len__(self) -> int:
+        return len(self._fragments)
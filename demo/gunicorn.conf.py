@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gunicorn配置 - 多worker部署
+所有worker通过sqlite后端（WAL模式）共享同一份数据，进程内存储只能单worker运行
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))  # worker进程数
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))  # 每个worker的线程数，长轮询和SSE连接各占一个线程
+# gthread下挂起的连接会一直占用线程：每个worker最多挂起 threads - GUNICORN_RESERVED_THREADS 个
+# 长轮询和SSE连接，超出时立即返回503，剩余线程留给普通请求；worker进程继承这里设置的环境变量
+os.environ.setdefault('LONG_POLL_MAX_WAITERS',
+                      str(max(1, threads - int(os.getenv('GUNICORN_RESERVED_THREADS', '8')))))
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+# 不预加载：app导入时会启动投递队列和webhook扇出的后台线程，这些线程不会随fork复制到worker中
+preload_app = False
+
+if workers > 1 and os.getenv('STORAGE_BACKEND', 'memory') != 'sqlite':
+    raise SystemExit("多worker部署需要共享存储，请设置 STORAGE_BACKEND=sqlite（或将 GUNICORN_WORKERS 设为1）")
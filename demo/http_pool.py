@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游HTTP连接池 - 进程内共享的keep-alive会话
+每个上游主机一个requests.Session，各线程复用其中的TCP/TLS连接；
+认证信息按请求传入，不写入共享会话的请求头；
+对回声平台的请求经按端点划分的熔断器发送，上游故障或变慢时快速失败
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from circuit_breaker import CircuitBreakers
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))  # 每个上游主机保持的最大连接数
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))  # 上游请求超时（秒）
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))  # 熔断器统计的最近调用数
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '10'))  # 统计窗口内至少有这么多调用才判断是否熔断
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', '0.5'))  # 失败率达到此值时熔断
+BREAKER_SLOW_CALL = float(os.getenv('BREAKER_SLOW_CALL', '2'))  # 耗时不少于此秒数的调用记为慢调用
+BREAKER_SLOW_RATE = float(os.getenv('BREAKER_SLOW_RATE', '0.5'))  # 慢调用比例达到此值时熔断
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))  # 熔断后多少秒放行探测调用
+BREAKER_HALF_OPEN_CALLS = int(os.getenv('BREAKER_HALF_OPEN_CALLS', '1'))  # 探测调用数，全部成功后恢复
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# 回声平台各端点的熔断器，进程内共享（同步客户端与asyncio客户端共用）
+breakers = CircuitBreakers(
+    window=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    error_rate=BREAKER_ERROR_RATE,
+    slow_call=BREAKER_SLOW_CALL,
+    slow_rate=BREAKER_SLOW_RATE,
+    open_seconds=BREAKER_OPEN_SECONDS,
+    half_open_calls=BREAKER_HALF_OPEN_CALLS
+)
+
+
+def origin_of(url: str) -> str:
+    """URL的来源（scheme://host:port），同一来源的请求共用一个会话"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _new_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    # pool_block=True: 并发超过连接池上限时排队等待空闲连接，而不是新建临时连接
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+def get_session(base_url: str) -> requests.Session:
+    """获取指定上游主机的共享会话，首次调用时创建；只用于配置中固定的上游，会话不会释放"""
+    origin = origin_of(base_url)
+    session = _sessions.get(origin)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(origin)
+            if session is None:
+                session = _sessions[origin] = _new_session(HTTP_POOL_SIZE)
+    return session
+
+
+class SessionCache:
+    """
+    按来源缓存的会话，最多保留max_sessions个，超出时关闭最久未使用的。
+    用于由调用方提供地址的请求（如webhook订阅者），会话数不随提交过的来源数增长
+    """
+
+    def __init__(self, max_sessions: int = 64, pool_size: int = HTTP_POOL_SIZE):
+        self.max_sessions = max(1, max_sessions)
+        self.pool_size = pool_size
+        self._sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, url: str) -> requests.Session:
+        origin = origin_of(url)
+        evicted = None
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is not None:
+                self._sessions.move_to_end(origin)
+                return session
+            session = self._sessions[origin] = _new_session(self.pool_size)
+            if len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self.evicted += 1
+        if evicted is not None:
+            # 正在使用该会话的请求仍可完成，连接用完后不再放回连接池
+            evicted.close()
+        return session
+
+    def discard(self, url: str) -> None:
+        """关闭并移除url所在来源的会话（如该来源的最后一个订阅者被删除时）"""
+        with self._lock:
+            session = self._sessions.pop(origin_of(url), None)
+        if session is not None:
+            session.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+# 上游调用耗时，按端点和结果（ok / failed: 5xx或429 / error: 网络错误、超时）划分；熔断拒绝的调用不计入
+UPSTREAM_SECONDS = metrics.histogram(
+    'demo_upstream_request_duration_seconds', '对回声平台的请求耗时（秒）', ('endpoint', 'outcome')
+)
+
+
+def is_upstream_failure(status: int) -> bool:
+    """5xx和429说明上游故障或过载，计入熔断器的失败率；其他4xx是请求本身的问题"""
+    return status >= 500 or status == 429
+
+
+def upstream_request(endpoint: str, method: str, url: str,
+                     session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """
+    经endpoint对应的熔断器发送请求；熔断期间立即抛出CircuitOpenError，
+    网络错误、超时、5xx和429计为失败
+    """
+    session = session or get_session(url)
+
+    def send() -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            UPSTREAM_SECONDS.labels(endpoint, 'error').observe(time.perf_counter() - started)
+            raise
+        outcome = 'failed' if is_upstream_failure(response.status_code) else 'ok'
+        UPSTREAM_SECONDS.labels(endpoint, outcome).observe(time.perf_counter() - started)
+        return response
+
+    return breakers.get(endpoint).call(
+        send,
+        is_failure=lambda response: is_upstream_failure(response.status_code)
+    )
+
+
+def auth_headers(token: Optional[str]) -> Dict[str, str]:
+    """生成单次请求的Bearer认证头"""
+    return {'Authorization': f'Bearer {token}'} if token else {}
+
+
+NOTIFICATION_ID = re.compile(r'[0-9a-fA-F]{24}')  # 回声平台的通知ID（MongoDB ObjectId）
+
+
+def is_notification_id(value) -> bool:
+    """ID格式是否正确；批量接口中任一ID格式错误，整个请求都会返回400"""
+    return isinstance(value, str) and NOTIFICATION_ID.fullmatch(value) is not None
+
+
+def rejects_items(status: Optional[int]) -> bool:
+    """认证失败、超时和限流之外的4xx说明请求体中有ID被拒绝，拆分批次可以定位到具体的ID"""
+    return status is not None and 400 <= status < 500 and status not in (401, 403, 408, 429)
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """各上游主机连接池的空闲连接数、累计新建连接数和请求数"""
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+    stats = {}
+    for origin, session in sessions:
+        pool_manager = session.get_adapter(origin).poolmanager
+        idle = connections = requests_sent = 0
+        for key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            idle += pool.pool.qsize() if pool.pool is not None else 0
+            connections += pool.num_connections
+            requests_sent += pool.num_requests
+        stats[origin] = {'idle': idle, 'connections_created': connections, 'requests': requests_sent,
+                         'max_size': HTTP_POOL_SIZE}
+    return stats
+
+
+def close_all() -> None:
+    """关闭所有共享会话及其连接"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回声外部API异步客户端 - HuisheenExternalAPI 的 asyncio 版本
+所有客户端共用一个aiohttp连接池，并通过信号量限制同时进行的上游请求数；
+fetch_notifications_many 可并发拉取大量用户的通知，按完成顺序逐个返回
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from http_pool import (HTTP_TIMEOUT, UPSTREAM_SECONDS, auth_headers, breakers, is_notification_id,
+                       is_upstream_failure, rejects_items)
+
+logger = logging.getLogger(__name__)
+
+HUISHEEN_BASE_URL = os.getenv('HUISHEEN_BASE_URL', 'http://localhost:3000')
+DEMO_BASE_URL = os.getenv('DEMO_BASE_URL', 'http://localhost:5000')
+ASYNC_CONCURRENCY = int(os.getenv('ASYNC_CONCURRENCY', '100'))  # 同时进行的上游请求上限
+BATCH_READ_CHUNK_SIZE = int(os.getenv('BATCH_READ_CHUNK_SIZE', '100'))  # 批量标记已读每次请求的ID数
+
+
+class AsyncHuisheenPool:
+    """
+    共享的异步连接池
+
+    用法:
+        async with AsyncHuisheenPool() as pool:
+            client = pool.client(token)
+            data = await client.get_notifications(limit=20)
+    """
+
+    def __init__(self, base_url: str = HUISHEEN_BASE_URL, concurrency: int = ASYNC_CONCURRENCY,
+                 timeout: float = HTTP_TIMEOUT):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'AsyncHuisheenPool':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def client(self, token: Optional[str] = None) -> 'AsyncHuisheenExternalAPI':
+        """创建使用该连接池的客户端"""
+        return AsyncHuisheenExternalAPI(self, token)
+
+    async def request(self, method: str, path: str, token: Optional[str] = None, endpoint: str = '',
+                      **kwargs) -> Tuple[int, Optional[Dict]]:
+        """
+        发送请求并返回 (状态码, JSON响应)；响应不是JSON时为None
+        经endpoint对应的熔断器（与同步客户端共用）发送，熔断期间立即抛出CircuitOpenError
+        """
+        await self.open()
+        breaker = breakers.get(endpoint or f"external{path}")
+        probe = breaker.before()
+        started = time.perf_counter()
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()  # 不计在本地信号量上排队的时间
+                async with self._session.request(method, f"{self.base_url}/api/external{path}",
+                                                 headers=auth_headers(token), **kwargs) as response:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+        except asyncio.CancelledError:
+            breaker.release(probe)
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - started
+            UPSTREAM_SECONDS.labels(breaker.name, 'error').observe(elapsed)
+            breaker.record(True, elapsed, probe)
+            raise
+        elapsed = time.perf_counter() - started
+        failed = is_upstream_failure(response.status)
+        UPSTREAM_SECONDS.labels(breaker.name, 'failed' if failed else 'ok').observe(elapsed)
+        breaker.record(failed, elapsed, probe)
+        return response.status, data
+
+    async def fetch_notifications_many(self, tokens: Iterable[str], limit: int = 20,
+                                       **filters) -> AsyncIterator[Tuple[str, Optional[Dict]]]:
+        """并发获取多个token的通知，按完成顺序逐个产出 (token, 结果)"""
+
+        async def fetch(token: str) -> Tuple[str, Optional[Dict]]:
+            return token, await self.client(token).get_notifications(limit=limit, **filters)
+
+        tasks = [asyncio.ensure_future(fetch(token)) for token in tokens]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class AsyncHuisheenExternalAPI:
+    """回声外部API异步客户端，方法与 HuisheenExternalAPI 一致"""
+
+    def __init__(self, pool: AsyncHuisheenPool, token: Optional[str] = None):
+        self.pool = pool
+        self.token = token
+
+    async def authenticate(self, notify_code: str, third_party_name: str = "Demo应用") -> Optional[Dict]:
+        """使用通知标识码获取访问Token"""
+        try:
+            status, data = await self.pool.request('POST', '/auth', endpoint='external.auth', json={
+                "notifyCode": notify_code,
+                "thirdPartyName": third_party_name,
+                "thirdPartyUrl": DEMO_BASE_URL
+            })
+
+            if status == 201:
+                # 后续请求使用新token认证
+                self.token = data["token"]
+                return data
+            else:
+                logger.error(f"认证失败: {status} - {data}")
+                return None
+
+        except Exception as e:
+            logger.error(f"认证请求异常: {e}")
+            return None
+
+    async def get_notifications(self, limit: int = 20, **filters) -> Optional[Dict]:
+        """获取未读通知"""
+        try:
+            params = {"limit": limit}
+            params.update(filters)
+
+            status, data = await self.pool.request('GET', '/notifications', self.token,
+                                                  endpoint='external.notifications', params=params)
+
+            if status == 200:
+                return data
+            else:
+                logger.error(f"获取通知失败: {status} - {data}")
+                return None
+
+        except Exception as e:
+            logger.error(f"获取通知异常: {e}")
+            return None
+
+    async def mark_as_read(self, notification_id: str) -> bool:
+        """标记通知为已读"""
+        try:
+            status, _ = await self.pool.request('PATCH', f'/notifications/{notification_id}/read', self.token,
+                                               endpoint='external.read')
+            return status == 200
+        except Exception as e:
+            logger.error(f"标记已读异常: {e}")
+            return False
+
+    async def batch_read_status(self, notification_ids: List[str]) -> Optional[int]:
+        """一次请求批量标记通知为已读，返回上游状态码；网络错误或熔断时返回None"""
+        try:
+            status, data = await self.pool.request('PATCH', '/notifications/batch/read', self.token,
+                                                  endpoint='external.batch_read',
+                                                  json={"notificationIds": notification_ids})
+            if status != 200:
+                logger.error(f"批量标记已读失败: {status} - {data}")
+            return status
+        except Exception as e:
+            logger.error(f"批量标记已读异常: {e}")
+            return None
+
+    async def mark_batch_as_read(self, notification_ids: List[str]) -> bool:
+        """一次请求批量标记通知为已读"""
+        return await self.batch_read_status(notification_ids) == 200
+
+    async def mark_chunk_as_read(self, notification_ids: List[str]) -> Dict[str, str]:
+        """标记一批通知为已读；上游因个别ID拒绝整批时二分重试，两半并发发送"""
+        status = await self.batch_read_status(notification_ids)
+        if status == 200:
+            return dict.fromkeys(notification_ids, 'read')
+        if len(notification_ids) > 1 and rejects_items(status):
+            middle = len(notification_ids) // 2
+            first, second = await asyncio.gather(self.mark_chunk_as_read(notification_ids[:middle]),
+                                                 self.mark_chunk_as_read(notification_ids[middle:]))
+            return {**first, **second}
+        return dict.fromkeys(notification_ids, 'failed')
+
+    async def mark_many_as_read(self, notification_ids: List[str],
+                                chunk_size: int = BATCH_READ_CHUNK_SIZE) -> Dict[str, str]:
+        """
+        标记任意数量的通知为已读，各批并发发送；格式错误的ID不发送。
+        返回每个ID的结果：read（已标记）、failed（上游失败）、invalid（ID格式错误）
+        """
+        ids = list(dict.fromkeys(notification_ids))
+        results = {notification_id: 'invalid' for notification_id in ids if not is_notification_id(notification_id)}
+        valid = [notification_id for notification_id in ids if notification_id not in results]
+        chunks = [valid[i:i + chunk_size] for i in range(0, len(valid), chunk_size)]
+        for outcome in await asyncio.gather(*(self.mark_chunk_as_read(chunk) for chunk in chunks)):
+            results.update(outcome)
+        return {notification_id: results[notification_id] for notification_id in ids}
+
+    async def get_stats(self) -> Optional[Dict]:
+        """获取统计信息"""
+        try:
+            status, data = await self.pool.request('GET', '/stats', self.token, endpoint='external.stats')
+            if status == 200:
+                return data
+            return None
+        except Exception as e:
+            logger.error(f"获取统计异常: {e}")
+            return None
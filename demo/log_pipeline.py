@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志管道 - 请求线程只把日志记录放入有界队列，格式化和写出都在后台线程中进行；
+队列满时丢弃记录并计数，不阻塞请求。请求/响应载荷等详细日志写到 payload 日志器，
+按采样率记录，载荷在记录真正写出时才序列化
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Union
+
+LOG_FORMAT = '%(levelname)s:%(name)s:%(message)s'  # 与logging.basicConfig的默认格式一致
+
+# 详细载荷日志（验证数据、推送的通知数据等），按采样率记录
+payload_logger = logging.getLogger('payload')
+
+
+class JsonPayload:
+    """日志参数：写出时才序列化为缩进的JSON，未写出（被采样或级别过滤掉）的记录不产生序列化开销"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: Any):
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, ensure_ascii=False, indent=2, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """按比例放行日志记录，rate为1时全部放行，为0时全部丢弃"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or random.random() < self.rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    不在调用线程中格式化记录（标准QueueHandler的prepare会先格式化消息），队列满时丢弃。
+    记录随参数对象一起入队，参数（如载荷字典）在记录后不应再修改
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # 队列满时等待后台线程腾出位置，保证停止前已入队的记录都被写出
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """根日志器上的队列处理器，加上在后台线程中把记录交给实际处理器的监听线程"""
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = 10000):
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.handler = _NonBlockingQueueHandler(self.queue)
+        self.handlers = handlers
+        self._listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+
+        self._running = False
+
+    def start(self) -> None:
+        logging.getLogger().addHandler(self.handler)
+        self._listener.start()
+        self._running = True
+
+    def stop(self) -> None:
+        """移除队列处理器并写出队列中剩余的记录"""
+        if not self._running:
+            return
+        self._running = False
+        logging.getLogger().removeHandler(self.handler)
+        self._listener.stop()
+        for handler in self.handlers:
+            handler.flush()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'queued': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'dropped': self.handler.dropped,
+            'payload_sample_rate': _sampler.rate,
+            'payload_sampled_out': _sampler.dropped
+        }
+
+
+_sampler = SampleFilter(1.0)
+payload_logger.addFilter(_sampler)
+_pipeline: Optional[LogPipeline] = None
+
+
+def setup_logging(level: Union[int, str] = logging.INFO, payload_sample_rate: float = 1.0, queue_size: int = 10000,
+                  handlers: Optional[List[logging.Handler]] = None) -> LogPipeline:
+    """
+    配置根日志器使用日志管道，替代logging.basicConfig；重复调用时替换之前的管道。
+    handlers为实际写出日志的处理器，默认写到stderr
+    """
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+    if handlers is None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [handler]
+    logging.getLogger().setLevel(level)
+    _sampler.rate = payload_sample_rate
+    _pipeline = LogPipeline(handlers, queue_size)
+    _pipeline.start()
+    return _pipeline
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if _pipeline is not None:
+        _pipeline.stop()
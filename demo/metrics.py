@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标 - 进程内的计数器、直方图和回调指标，按Prometheus文本格式导出
+计数器和直方图按线程分片记录：每个线程只写自己的分片，记录时不加锁，
+导出时合并所有分片；已结束线程的分片合并进累计值后丢弃
+"""
+
+import logging
+import math
+import threading
+from bisect import bisect_left
+from functools import partial
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的默认桶上限（秒），覆盖从本地缓存命中到上游超时的范围
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SHARD_FOLD_THRESHOLD = 256  # 分片数超过此值时合并已结束线程的分片
+
+
+class _Shards:
+    """按线程分片的计数数组，分片为长度size的列表"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.local = threading.local()  # 当前线程的分片为 local.shard
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0] * size  # 已结束线程的分片合计
+
+    def new_shard(self) -> List[float]:
+        """为当前线程创建分片（记录时 local.shard 不存在才调用）"""
+        shard = self.local.shard = [0] * self.size
+        with self._lock:
+            self._shards.append((threading.current_thread(), shard))
+            if len(self._shards) > SHARD_FOLD_THRESHOLD:
+                self._fold()
+        return shard
+
+    def _fold(self) -> None:
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for i, value in enumerate(shard):
+                    self._retired[i] += value
+        self._shards = alive
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            self._fold()
+            totals = list(self._retired)
+            for _, shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class CounterChild:
+    __slots__ = ('_shards', '_local')
+
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._local = self._shards.local
+
+    def inc(self, amount: float = 1) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shards.new_shard()
+        shard[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class HistogramChild:
+    __slots__ = ('_bounds', '_shards', '_local')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # 各桶（最后一个为+Inf）的计数，再加一项观测值总和
+        self._shards = _Shards(len(bounds) + 2)
+        self._local = self._shards.local
+
+    def observe(self, value: float) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shards.new_shard()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """返回 (累积桶计数, 总和)，累积桶与边界一一对应，最后一项为+Inf即总次数"""
+        totals = self._shards.totals()
+        cumulative, running = [], 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+
+class _LabeledMetric:
+    """按标签值划分子指标的指标，new_child为创建子指标的工厂"""
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], new_child: Callable[[], Any]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._new_child = new_child
+        self._children: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """按标签值取子指标；标签值原样作为键，导出时才转为字符串"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_LabeledMetric):
+    """只增的计数器，名称按惯例以 _total 结尾"""
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames, CounterChild)
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._items():
+            yield '', dict(zip(self.labelnames, values)), child.value()
+
+
+class Histogram(_LabeledMetric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, partial(HistogramChild, self.buckets))
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in self._items():
+            labels = dict(zip(self.labelnames, values))
+            cumulative, total = child.snapshot()
+            for bound, count in zip(self.buckets + (math.inf,), cumulative):
+                yield '_bucket', dict(labels, le=bound), count
+            yield '_sum', labels, total
+            yield '_count', labels, cumulative[-1]
+
+
+class CallbackMetric:
+    """
+    导出时调用func取值的指标，用于已有组件自己维护的数量（队列长度、存储条数、累计统计等）。
+    func无标签时返回数值，有标签时返回 (标签值元组, 数值) 的可迭代对象
+    """
+
+    def __init__(self, name: str, documentation: str, type: str, func: Callable[[], Any],
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.func = func
+
+    def samples(self):
+        result = self.func()
+        if not self.labelnames:
+            yield '', {}, result
+            return
+        for values, value in result:
+            yield '', dict(zip(self.labelnames, values)), value
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = _format_value(value) if key == 'le' else str(value)
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Registry:
+    """指标注册表，expose() 生成Prometheus文本格式（0.0.4）"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, type: str, func: Callable[[], Any],
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, type, func, labelnames))
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # 某个组件取值失败时跳过该指标，不影响其余指标导出
+                logger.warning(f"导出指标失败: {metric.name} - {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内默认注册表
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.counter(name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.histogram(name, documentation, labelnames, buckets)
+
+
+def callback(name: str, documentation: str, type: str, func: Callable[[], Any],
+             labelnames: Sequence[str] = ()) -> CallbackMetric:
+    return registry.callback(name, documentation, type, func, labelnames)
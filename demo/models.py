@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据模型 - 通知及其类型、优先级
+"""
+
+import json
+import sys
+from datetime import timedelta
+from enum import Enum
+from typing import Dict, Any, Optional
+
+from notification_store import EPOCH, parse_timestamp
+
+class NotificationType(Enum):
+    INFO = "info"
+    WARNING = "warning"
+    ERROR = "error"
+    SUCCESS = "success"
+
+class Priority(Enum):
+    LOW = "low"
+    NORMAL = "normal"
+    HIGH = "high"
+    URGENT = "urgent"
+
+# 已知的类型和优先级在记录中保存为小整数编号，未知取值保留原字符串
+_TYPE_VALUES = tuple(member.value for member in NotificationType)
+_TYPE_CODES = {value: code for code, value in enumerate(_TYPE_VALUES)}
+_PRIORITY_VALUES = tuple(member.value for member in Priority)
+_PRIORITY_CODES = {value: code for code, value in enumerate(_PRIORITY_VALUES)}
+
+
+def format_timestamp(epoch: int) -> str:
+    """epoch微秒格式化为ISO时间戳，与 get_current_timestamp() 的格式一致"""
+    return (EPOCH + timedelta(microseconds=epoch)).isoformat().replace('+00:00', 'Z')
+
+
+class Notification:
+    """
+    通知数据结构
+
+    为了在内存中保存大量通知，记录使用__slots__，并以紧凑形式保存字段：
+    时间戳保存为epoch微秒（无法按原文还原的时间戳保留原字符串），
+    类型和优先级保存为小整数编号，来源字符串驻留复用，metadata保存为
+    编码后的JSON字节串，读取时才解码。属性读写和 to_dict() 的结果与普通字段一致。
+    """
+
+    __slots__ = ('id', 'title', 'content', '_type', '_priority', 'epoch', '_timestamp',
+                 '_source', 'callback_url', '_metadata', 'seq')
+
+    def __init__(self, id: str, title: str, content: str, type: str, priority: str, timestamp: str,
+                 source: str, callback_url: str = None, metadata: Dict[str, Any] = None, seq: int = 0):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.type = type
+        self.priority = priority
+        self.timestamp = timestamp
+        self.source = source
+        self.callback_url = callback_url  # 回调链接
+        self.metadata = metadata
+        self.seq = seq  # 追加到通知表时分配的单调序号
+
+    @property
+    def type(self) -> str:
+        value = self._type
+        return _TYPE_VALUES[value] if value.__class__ is int else value
+
+    @type.setter
+    def type(self, value: str) -> None:
+        self._type = _TYPE_CODES.get(value, value)
+
+    @property
+    def priority(self) -> str:
+        value = self._priority
+        return _PRIORITY_VALUES[value] if value.__class__ is int else value
+
+    @priority.setter
+    def priority(self, value: str) -> None:
+        self._priority = _PRIORITY_CODES.get(value, value)
+
+    @property
+    def timestamp(self) -> str:
+        if self._timestamp is not None:
+            return self._timestamp
+        return format_timestamp(self.epoch)
+
+    @timestamp.setter
+    def timestamp(self, value: str) -> None:
+        # epoch供时间索引直接使用；只有能按原文还原时才丢弃字符串
+        try:
+            self.epoch = parse_timestamp(value)
+        except (ValueError, TypeError, AttributeError):
+            self.epoch = None
+            self._timestamp = value
+            return
+        self._timestamp = None if format_timestamp(self.epoch) == value else value
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    @source.setter
+    def source(self, value: str) -> None:
+        self._source = sys.intern(value) if value.__class__ is str else value
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        value = self._metadata
+        return json.loads(value) if value.__class__ is bytes else value
+
+    @metadata.setter
+    def metadata(self, value: Optional[Dict[str, Any]]) -> None:
+        if value is None:
+            self._metadata = None
+            return
+        try:
+            self._metadata = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+        except (TypeError, ValueError):
+            self._metadata = value  # 无法编码为JSON的保留原对象
+
+    @property
+    def metadata_json(self) -> Optional[bytes]:
+        """metadata编码后的JSON字节串，不经过解码"""
+        value = self._metadata
+        if value is None or value.__class__ is bytes:
+            return value
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode()
+
+    @metadata_json.setter
+    def metadata_json(self, value: Optional[bytes]) -> None:
+        self._metadata = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'type': self.type,
+            'priority': self.priority,
+            'timestamp': self.timestamp,
+            'source': self.source,
+            'callback_url': self.callback_url,
+            'metadata': self.metadata,
+            'seq': self.seq
+        }
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"Notification({fields})"
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知存储 - 带时间索引的内存通知表
+在记录旁维护一个按时间排序的epoch数组，since查询使用二分查找，limit直接切片；
+每条通知追加时分配单调递增的序号，cursor翻页是对追加日志的常数时间定位。
+可配置按条数、时间和近似字节数保留，追加时从头部逐条淘汰
+"""
+
+import base64
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_timestamp(value: str) -> int:
+    """把ISO时间戳（支持Z后缀）解析为epoch微秒，不带时区的按UTC处理"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    delta = parsed - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def estimate_size(notification) -> int:
+    """通知的近似字节数：文本字段的长度加metadata的JSON长度"""
+    size = 0
+    for value in (notification.id, notification.title, notification.content, notification.type,
+                  notification.priority, notification.timestamp, notification.source, notification.callback_url):
+        if value:
+            size += len(value)
+    metadata = notification.metadata_json
+    if metadata:
+        size += len(metadata)
+    return size
+
+
+@dataclass
+class RetentionPolicy:
+    """通知保留策略，各项为0表示不限制"""
+    max_count: int = 0  # 最多保留的通知数
+    max_age: float = 0  # 最长保留时间（秒）
+    max_bytes: int = 0  # 近似字节数上限
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_count or self.max_age or self.max_bytes)
+
+
+class InvalidCursor(ValueError):
+    """cursor参数无法解析"""
+
+
+def encode_cursor(generation: str, seq: int) -> str:
+    """把存储实例标识和序号编码为不透明的cursor"""
+    raw = f"{generation}:{seq}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(generation: str, cursor: str) -> int:
+    """
+    解析cursor得到序号
+    其他存储实例（如服务重启前）签发的cursor从头开始读取
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_generation, seq = raw.split(':')
+        seq = int(seq)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if cursor_generation != generation or seq < 0:
+        return 0
+    return seq
+
+
+class ChangeNotifier:
+    """
+    通知表变更信号：写入方调用notify()，等待方在wait()中挂起直到条件满足
+
+    所有等待方共用一个条件变量，空闲时不占用CPU。recheck不为None时，
+    即使没有收到本进程的信号也每隔recheck秒重新检查一次条件，
+    用于感知其他进程写入的共享存储。
+    """
+
+    def __init__(self, recheck: Optional[float] = None):
+        self.recheck = recheck
+        self._cond = threading.Condition()
+        self._counter = 0
+        self.waiters = 0
+
+    def notify(self) -> None:
+        with self._cond:
+            self._counter += 1
+            self._cond.notify_all()
+
+    def wait(self, predicate: Callable[[], bool], timeout: float) -> bool:
+        """等待predicate()为真，最多timeout秒；返回predicate的最终结果"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # 先记下计数再检查条件，检查之后的写入一定会改变计数
+            with self._cond:
+                seen = self._counter
+            if predicate():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self.recheck is not None:
+                remaining = min(remaining, self.recheck)
+            with self._cond:
+                self.waiters += 1
+                try:
+                    self._cond.wait_for(lambda: self._counter != seen, remaining)
+                finally:
+                    self.waiters -= 1
+
+
+class WaiterLimit:
+    """
+    同时挂起的长轮询和SSE连接数上限（进程内）
+
+    线程型服务器中每个挂起的连接占用一个线程，不加限制时少量空闲连接
+    即可占满线程，使普通请求排队。limit为0时不限制。
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        """占用一个名额；已达上限时返回False"""
+        with self._lock:
+            if self.limit and self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def info(self) -> Dict[str, int]:
+        return {'limit': self.limit, 'active': self.active, 'rejected': self.rejected}
+
+
+class NotificationStore:
+    """
+    按追加顺序保存通知，并维护非递减的epoch时间索引
+
+    通知时间戳在追加时生成，正常情况下天然有序；若系统时钟回拨，
+    索引值取前一条的时间，保证数组始终有序，可直接二分。
+
+    序号从1开始单调递增，清空后也不会复用；记录在列表中的下标
+    等于 seq - base_seq，所以按序号定位不需要查找。按ID查找走
+    字典索引（ID -> 最早的一条），与记录列表同步维护；同ID的后续通知
+    另存在只由写入方访问的队列中，追加和淘汰都是O(1)。
+
+    配置了保留策略时，每次追加后从头部淘汰超出限制的通知：只移动头部偏移，
+    已淘汰的部分超过列表一半时才整体截掉，均摊O(1)。
+
+    并发：写入方之间用锁串行化；读取方不加锁，每次读取先取一份视图
+    (记录列表, 时间索引, base_seq, 头部下标, 结束下标)，只访问视图范围内的元素。
+    列表只在末尾追加，视图范围内的元素不会被修改；截断和清空时换用新列表
+    （写时复制），旧视图仍指向旧列表。写入完成后才发布新视图，
+    批量写入对读取方整体可见。
+    """
+
+    COMPACT_MIN = 1024  # 头部至少积累这么多已淘汰的位置才截断列表
+
+    def __init__(self, retention: Optional[RetentionPolicy] = None):
+        self.retention = retention or RetentionPolicy()
+        self._lock = threading.Lock()  # 串行化写入方
+        self._records: List[Any] = []
+        self._epochs: List[int] = []
+        self._sizes: List[int] = []  # 仅在限制字节数时维护
+        self._bytes = 0
+        self._by_id: Dict[str, Any] = {}  # ID -> 同ID中最早的通知；单个字典操作，读取方无需加锁
+        self._later_by_id: Dict[str, Deque[Any]] = {}  # ID -> 同ID的其余通知，按序号排列；仅写入方访问
+        self.version = 0  # 每次写入递增，用于生成ETag
+        self._next_seq = 1
+        self._base_seq = 1  # _records[0] 的序号
+        self._head = 0  # 第一条未淘汰通知的下标
+        self._view = (self._records, self._epochs, self._base_seq, 0, 0)
+        self._evicted_seq = 0  # 最近淘汰的通知序号
+        self._evicted_epoch = 0  # 最近淘汰的通知时间
+        self.evictions = {'count': 0, 'age': 0, 'bytes': 0}  # 按原因统计的淘汰数
+        # 存储实例标识，写入cursor，用于识别重启前签发的cursor
+        self._generation = uuid.uuid4().hex[:8]
+        self.changed = ChangeNotifier()  # 写入后唤醒长轮询和SSE
+
+    def append(self, notification) -> None:
+        with self._lock:
+            self._append(notification)
+            self._evict()
+            self._publish()
+        self.changed.notify()
+
+    def extend(self, notifications: Iterable[Any]) -> None:
+        with self._lock:
+            for notification in notifications:
+                self._append(notification)
+            self._evict()
+            self._publish()
+        self.changed.notify()
+
+    def _append(self, notification) -> None:
+        epoch = notification.epoch
+        if epoch is None:
+            epoch = parse_timestamp(notification.timestamp)
+        if self._epochs and epoch < self._epochs[-1]:
+            epoch = self._epochs[-1]
+        notification.seq = self._next_seq
+        self._next_seq += 1
+        self._records.append(notification)
+        self._epochs.append(epoch)
+        if self.retention.max_bytes:
+            size = estimate_size(notification)
+            self._sizes.append(size)
+            self._bytes += size
+        if notification.id in self._by_id:
+            later = self._later_by_id.get(notification.id)
+            if later is None:
+                later = self._later_by_id[notification.id] = deque()
+            later.append(notification)
+        else:
+            self._by_id[notification.id] = notification
+
+    def _publish(self) -> None:
+        """发布新视图，之后的读取可以看到此前的全部写入"""
+        self._view = (self._records, self._epochs, self._base_seq, self._head, len(self._records))
+        # 版本号在视图之后递增：读到新版本号时一定能读到对应的数据，ETag不会对应旧内容
+        self.version += 1
+
+    def _evict(self) -> None:
+        """按保留策略从头部淘汰，至少保留最新的一条"""
+        policy = self.retention
+        if not policy.enabled:
+            return
+        age_limit = int((time.time() - policy.max_age) * 1000000) if policy.max_age else None
+        last = len(self._records) - 1
+        while self._head < last:
+            if policy.max_count and last + 1 - self._head > policy.max_count:
+                reason = 'count'
+            elif age_limit is not None and self._epochs[self._head] < age_limit:
+                reason = 'age'
+            elif policy.max_bytes and self._bytes > policy.max_bytes:
+                reason = 'bytes'
+            else:
+                break
+            self._evict_head(reason)
+        if self._head >= self.COMPACT_MIN and self._head * 2 >= len(self._records):
+            self._compact()
+
+    def _evict_head(self, reason: str) -> None:
+        # 记录本身留在列表中，旧视图仍可能读到它，截断时一并释放
+        notification = self._records[self._head]
+        if self._by_id.get(notification.id) is notification:
+            later = self._later_by_id.get(notification.id)
+            if later:
+                self._by_id[notification.id] = later.popleft()
+                if not later:
+                    del self._later_by_id[notification.id]
+            else:
+                del self._by_id[notification.id]
+        if self._sizes:
+            self._bytes -= self._sizes[self._head]
+        self._evicted_seq = notification.seq
+        self._evicted_epoch = self._epochs[self._head]
+        self._head += 1
+        self.evictions[reason] += 1
+
+    def _compact(self) -> None:
+        self._records = self._records[self._head:]
+        self._epochs = self._epochs[self._head:]
+        self._sizes = self._sizes[self._head:]
+        self._base_seq += self._head
+        self._head = 0
+
+    def get(self, notification_id: str) -> Optional[Any]:
+        """按ID查找通知，ID重复时返回最早的一条"""
+        return self._by_id.get(notification_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records = []
+            self._epochs = []
+            self._sizes = []
+            self._bytes = 0
+            self._by_id = {}
+            self._later_by_id = {}
+            self._base_seq = self._next_seq
+            self._head = 0
+            self._publish()
+        self.changed.notify()
+
+    @property
+    def generation(self) -> str:
+        return self._generation
+
+    @property
+    def last_seq(self) -> int:
+        """最后一条已发布的序号，空表时为0"""
+        _, _, base_seq, _, end = self._view
+        return base_seq + end - 1
+
+    def seq_before(self, since_epoch: Optional[int]) -> int:
+        """时间晚于since_epoch的第一条通知之前的序号"""
+        _, epochs, base_seq, head, end = self._view
+        if since_epoch is None:
+            return base_seq + head - 1
+        return base_seq + bisect_right(epochs, since_epoch, head, end) - 1
+
+    def after(self, seq: int, limit: int = 10) -> List[Any]:
+        """返回序号大于seq的前limit条通知，O(limit)"""
+        records, _, base_seq, head, end = self._view
+        start = min(max(seq - base_seq + 1, head), end)
+        return records[start:min(start + max(limit, 0), end)]
+
+    def iter_after(self, seq: int, limit: int = 10, chunk_size: int = 256) -> Iterator[Any]:
+        """逐条产出序号大于seq的前limit条通知，每次只复制chunk_size条"""
+        while limit > 0:
+            chunk = self.after(seq, min(limit, chunk_size))
+            if not chunk:
+                return
+            yield from chunk
+            seq = chunk[-1].seq
+            limit -= len(chunk)
+
+    def since(self, since_epoch: Optional[int] = None, limit: int = 10) -> List[Any]:
+        """返回时间晚于since_epoch的前limit条通知，O(log N + limit)"""
+        return self.after(self.seq_before(since_epoch), limit)
+
+    def retention_gap(self, seq: int, since_epoch: Optional[int] = None) -> bool:
+        """
+        从seq（或since_epoch）之后读取时，是否有通知已被保留策略淘汰，
+        即轮询方的位置早于保留窗口，中间的通知再也读不到
+        """
+        if since_epoch is not None:
+            return since_epoch < self._evicted_epoch
+        return seq < self._evicted_seq
+
+    def retention_stats(self) -> Dict[str, Any]:
+        return {
+            'policy': asdict(self.retention),
+            'count': len(self),
+            'bytes': self._bytes if self.retention.max_bytes else None,
+            'evicted': dict(self.evictions),
+            'evicted_through_seq': self._evicted_seq
+        }
+
+    def encode_cursor(self, seq: int) -> str:
+        return encode_cursor(self._generation, seq)
+
+    def decode_cursor(self, cursor: str) -> int:
+        return decode_cursor(self._generation, cursor)
+
+    def __len__(self) -> int:
+        _, _, _, head, end = self._view
+        return end - head
+
+    def __iter__(self) -> Iterator[Any]:
+        records, _, _, head, end = self._view
+        return iter(records[head:end])
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能分析 - 线上请求的按需分析，均需要管理员令牌：
+- ProfilingMiddleware: 带 X-Profile 头或 _profile 查询参数的请求在cProfile下执行，响应替换为分析结果
+- StackSampler: 在给定时间内定期采样正在处理请求的线程的调用栈，输出火焰图工具可用的折叠栈格式
+- AllocationTracker: 开启tracemalloc后按路由（视图函数）汇总仍存活的内存分配
+未带分析标记的请求只多一次environ查找；采样和内存跟踪只在调用期间生效
+"""
+
+import cProfile
+import gc
+import hmac
+import inspect
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from threading import get_ident
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+PROFILE_PARAM = '_profile'
+PROFILE_SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'pcalls', 'filename', 'name')
+UNATTRIBUTED = '(其他)'  # 不在请求处理中的分配（后台线程、模块导入等）
+OUTSIDE_VIEW = '(请求处理，视图外)'  # 请求处理中但不在视图函数内的分配（会话、钩子、响应压缩等）
+
+# tracemalloc快照中排除分析工具自身的分配
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+class SamplerBusy(Exception):
+    """已有采样正在进行"""
+
+
+def authorized(admin_token: str, provided: Optional[str]) -> bool:
+    """未配置管理员令牌时一律拒绝；比较使用恒定时间"""
+    if not admin_token or provided is None:
+        return False
+    return hmac.compare_digest(admin_token.encode(), provided.encode())
+
+
+# ============ 单个请求的cProfile ============
+
+class ProfilingMiddleware:
+    """
+    WSGI中间件：分析标记和管理员令牌都有效时，在cProfile下执行整个请求（含钩子、压缩和响应体生成），
+    丢弃原响应体并返回分析结果；请求本身的副作用（如推送、写入）照常发生。
+    _profile=1 返回按 _profile_sort 排序的前 _profile_limit 行文本，_profile=pstats 返回
+    pstats二进制数据（可用 snakeviz 等工具打开）。令牌无效时按普通请求处理
+    """
+
+    def __init__(self, wsgi_app: Callable, admin_token: str, sampler: 'StackSampler',
+                 route_of: Callable[[Dict[str, Any]], str], max_seconds: float = 60.0):
+        self.wsgi_app = wsgi_app
+        self.admin_token = admin_token
+        self.sampler = sampler
+        self.route_of = route_of
+        self.max_seconds = max_seconds
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable):
+        if self.admin_token:
+            mode = environ.get('HTTP_X_PROFILE')
+            if mode is None and PROFILE_PARAM in environ.get('QUERY_STRING', ''):
+                mode = parse_qs(environ['QUERY_STRING']).get(PROFILE_PARAM, [None])[0]
+            if mode and authorized(self.admin_token, environ.get('HTTP_X_ADMIN_TOKEN')):
+                return self._profile(environ, start_response, mode)
+        if self.sampler.running:
+            return self._tracked(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def _tracked(self, environ, start_response) -> Iterable[bytes]:
+        """采样期间登记处理请求的线程，覆盖到响应体生成结束（流式响应在迭代时才执行视图代码）"""
+        self.sampler.enter(f"{environ.get('REQUEST_METHOD')} {self.route_of(environ)}")
+        try:
+            result = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.sampler.exit()
+            raise
+        return _TrackedBody(result, self.sampler)
+
+    def _profile(self, environ, start_response, mode: str) -> List[bytes]:
+        params = parse_qs(environ.get('QUERY_STRING', ''))
+        sort = params.get('_profile_sort', ['cumulative'])[0]
+        if sort not in PROFILE_SORT_KEYS:
+            sort = 'cumulative'
+        try:
+            limit = int(params.get('_profile_limit', ['40'])[0])
+        except ValueError:
+            limit = 40
+        captured: Dict[str, Any] = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            return lambda data: None
+
+        profiler = cProfile.Profile()
+        size = 0
+        truncated = False
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            result = self.wsgi_app(environ, capture)
+            try:
+                for chunk in result:
+                    size += len(chunk)
+                    # 流式响应（SSE、长时间的流式轮询）只分析到上限时间为止
+                    if time.perf_counter() - started > self.max_seconds:
+                        truncated = True
+                        break
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        status = captured.get('status', '')
+        headers = [('X-Profiled-Status', status), ('X-Profiled-Seconds', f"{elapsed:.6f}"),
+                   ('Cache-Control', 'no-store')]
+        if mode == 'pstats':
+            body = marshal.dumps(pstats.Stats(profiler).stats)
+            headers += [('Content-Type', 'application/octet-stream'),
+                        ('Content-Disposition', f'attachment; filename=profile-{int(time.time())}.pstats')]
+        else:
+            stream = io.StringIO()
+            stream.write(f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')} -> {status}, "
+                         f"{size} 字节, {elapsed * 1000:.2f} ms{'（已截断）' if truncated else ''}\n")
+            pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+            body = stream.getvalue().encode('utf-8')
+            headers.append(('Content-Type', 'text/plain; charset=utf-8'))
+        headers.append(('Content-Length', str(len(body))))
+        start_response('200 OK', headers)
+        return [body]
+
+
+class _TrackedBody:
+    """包装响应体，迭代结束并关闭时注销采样登记"""
+
+    def __init__(self, result: Iterable[bytes], sampler: 'StackSampler'):
+        self.result = result
+        self.sampler = sampler
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def close(self) -> None:
+        try:
+            if hasattr(self.result, 'close'):
+                self.result.close()
+        finally:
+            self.sampler.exit()
+
+
+# ============ 调用栈采样 ============
+
+def _frame_name(code) -> str:
+    module = code.co_filename.rsplit('/', 1)[-1]
+    if module.endswith('.py'):
+        module = module[:-3]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    定期读取各线程当前的调用栈（sys._current_frames），按 "路由;外层函数;...;内层函数" 累计采样次数。
+    默认只采样正在处理请求的线程，栈底为请求的方法和路由模板；all_threads 时也包括空闲线程和后台线程，
+    栈底为线程名。同一时间只允许一个采样
+    """
+
+    def __init__(self):
+        self.running = False
+        self._lock = threading.Lock()
+        self._requests: Dict[int, str] = {}  # 线程ident -> 请求标签
+
+    def enter(self, label: str) -> None:
+        self._requests[get_ident()] = label
+
+    def exit(self) -> None:
+        self._requests.pop(get_ident(), None)
+
+    def sample(self, seconds: float, interval: float = 0.01, all_threads: bool = False) -> Tuple[Counter, int]:
+        """采样seconds秒，返回 (折叠栈计数, 采样轮数)；采样开始前已在处理的请求不计入"""
+        if not self._lock.acquire(blocking=False):
+            raise SamplerBusy()
+        stacks: Counter = Counter()
+        rounds = 0
+        me = get_ident()
+        thread_names: Dict[int, str] = {}
+        try:
+            self.running = True
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                rounds += 1
+                # CPython 3.11 中 sys._current_frames() 物化其他线程的帧、以及沿 f_back 遍历时
+                # 若触发GC，而目标线程正在创建/销毁或执行C扩展（如sqlite3），可能死锁或段错误；
+                # 采样期间关闭GC，帧只转换为函数名，不跨GC保留
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    for ident, frame in sys._current_frames().items():
+                        if ident == me:
+                            continue
+                        label = self._requests.get(ident)
+                        if label is None:
+                            if not all_threads:
+                                continue
+                            if ident not in thread_names:
+                                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                            label = thread_names.get(ident, f"thread-{ident}")
+                        names = []
+                        while frame is not None:
+                            names.append(_frame_name(frame.f_code))
+                            frame = frame.f_back
+                        names.append(label)
+                        names.reverse()
+                        stacks[';'.join(names)] += 1
+                    frame = None  # 不持有其他线程的帧
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+                time.sleep(interval)
+        finally:
+            self.running = False
+            self._requests.clear()
+            self._lock.release()
+        return stacks, rounds
+
+
+def collapsed(stacks: Counter) -> str:
+    """折叠栈文本，每行 "栈 次数"，可直接交给 flamegraph.pl、speedscope 等工具"""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# ============ 按路由的内存分配 ============
+
+def view_ranges(app) -> Dict[str, List[Tuple[int, int, str]]]:
+    """各视图函数所在文件 -> [(起始行, 结束行, 路由模板)]，去掉装饰器后按原函数的代码范围"""
+    rules: Dict[str, str] = {}
+    for rule in app.url_map.iter_rules():
+        rules.setdefault(rule.endpoint, rule.rule)
+    ranges: Dict[str, List[Tuple[int, int, str]]] = {}
+    for endpoint, view in app.view_functions.items():
+        code = getattr(inspect.unwrap(view), '__code__', None)
+        if code is None:
+            continue
+        last = max((line for _, _, line in code.co_lines() if line is not None), default=code.co_firstlineno)
+        ranges.setdefault(code.co_filename, []).append((code.co_firstlineno, last, rules.get(endpoint, endpoint)))
+    return ranges
+
+
+class AllocationTracker:
+    """
+    tracemalloc的开启、关闭和按路由汇总。开启时记录基准快照，报告为开启以来新增且仍存活的分配；
+    一次分配归属于其调用栈中的视图函数，调用栈深度（frames）需覆盖视图到实际分配处的层数。
+    开启期间每次内存分配都要记录调用栈，明显拖慢请求，用完应及时关闭
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at: Optional[float] = None
+
+    def start(self, frames: int = 32) -> None:
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            tracemalloc.start(frames)
+            self._baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            self.started_at = time.time()
+
+    def stop(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+            self.started_at = None
+
+    def info(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            'tracing': tracing,
+            'frames': tracemalloc.get_traceback_limit() if tracing else 0,
+            'started_at': self.started_at,
+            'traced_bytes': current,
+            'peak_bytes': peak,
+        }
+
+    def report(self, ranges: Dict[str, List[Tuple[int, int, str]]], limit: int = 10) -> Dict[str, Any]:
+        """按路由汇总开启以来新增的分配，每个路由列出新增字节最多的limit个分配位置"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError('tracemalloc未开启')
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            if self._baseline is not None:
+                stats = snapshot.compare_to(self._baseline, 'traceback')
+            else:
+                stats = snapshot.statistics('traceback')
+
+        routes: Dict[str, Dict[str, Any]] = {}
+        for stat in stats:
+            size_diff = getattr(stat, 'size_diff', stat.size)
+            count_diff = getattr(stat, 'count_diff', stat.count)
+            if not size_diff and not count_diff:
+                continue
+            route = _route_of(stat.traceback, ranges)
+            entry = routes.setdefault(route, {'size_diff': 0, 'count_diff': 0, 'sites': {}})
+            entry['size_diff'] += size_diff
+            entry['count_diff'] += count_diff
+            # traceback从最外层到最内层排列，最后一帧为实际分配处
+            frame = stat.traceback[-1]
+            site = entry['sites'].setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            site[0] += size_diff
+            site[1] += count_diff
+
+        result = []
+        for route, entry in sorted(routes.items(), key=lambda item: item[1]['size_diff'], reverse=True):
+            sites = sorted(entry['sites'].items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            result.append({
+                'route': route,
+                'size_diff': entry['size_diff'],
+                'count_diff': entry['count_diff'],
+                'top': [{'location': location, 'size_diff': size, 'count_diff': count}
+                        for location, (size, count) in sites]
+            })
+        return dict(self.info(), routes=result)
+
+
+def _route_of(traceback: tracemalloc.Traceback, ranges: Dict[str, List[Tuple[int, int, str]]]) -> str:
+    # 从内层向外找第一个落在视图函数范围内的帧；经过本中间件但没有视图帧的属于请求处理的其他阶段
+    in_request = False
+    for frame in reversed(traceback):
+        for first, last, route in ranges.get(frame.filename, ()):
+            if first <= frame.lineno <= last:
+                return route
+        if frame.filename == __file__:
+            in_request = True
+    return OUTSIDE_VIEW if in_request else UNATTRIBUTED
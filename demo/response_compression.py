@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应压缩 - 按 Accept-Encoding 协商压缩JSON响应
+始终支持gzip；安装了 zstandard / brotli 时优先使用zstd / br。
+带ETag的响应按 (ETag, 编码) 缓存压缩结果，通知表未变化时重复轮询不再重新压缩
+"""
+
+import gzip
+import os
+from typing import Callable, Dict, Optional
+
+from feed_cache import FragmentCache
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))  # 小于此字节数的响应不压缩
+COMPRESSED_CACHE_SIZE = int(os.getenv('COMPRESSED_CACHE_SIZE', '256'))  # 缓存的压缩响应数上限
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime固定为0，相同内容的压缩结果一致
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# 编码 -> 压缩函数，按服务端偏好排序（客户端权重相同时取靠前者）
+CODECS: Dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    CODECS['zstd'] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+if brotli is not None:
+    CODECS['br'] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+CODECS['gzip'] = _gzip
+
+compressed_cache = FragmentCache(COMPRESSED_CACHE_SIZE)
+
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """根据请求的Accept-Encoding选出编码，都不接受时返回None"""
+    return accept_encodings.best_match(list(CODECS))
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """压缩后的表示使用不同的ETag"""
+    return f"{etag}-{encoding}"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    return CODECS[encoding](data)
+
+
+def compress_response(response, accept_encodings):
+    """
+    按协商结果压缩Flask响应（原地修改并返回）
+    只压缩完整的200响应；流式响应、已编码的响应和小于阈值的响应原样返回
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    encoding = negotiate(accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    etag, _ = response.get_etag()
+    if etag:
+        data = compressed_cache.get_or_encode((etag, encoding), lambda: compress(data, encoding))
+        response.set_etag(encoded_etag(etag, encoding))
+    else:
+        data = compress(data, encoding)
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储引擎 - 可插拔的通知与token存储
+
+后端：
+- memory: 进程内存储，重启后数据丢失
+- sqlite: SQLite持久化存储（WAL模式），数据量不受内存限制
+
+两种后端通过同一个仓库接口（Storage）提供：
+- notifications: 通知表，append/extend/get/after/since/seq_before/clear 及cursor编解码，
+  可按保留策略（RetentionPolicy）在写入时淘汰旧通知
+- tokens / external_tokens / subscribers: 按键字段区分的记录表，get/upsert/delete/clear
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from models import Notification
+from notification_store import (ChangeNotifier, NotificationStore, RetentionPolicy, decode_cursor, encode_cursor,
+                                parse_timestamp)
+
+SQLITE_CHANGE_RECHECK = float(os.getenv('SQLITE_CHANGE_RECHECK', '1'))  # 长轮询检查其他进程写入的间隔（秒）
+
+
+class RecordStore:
+    """
+    内存记录表，按键字段区分记录并保持插入顺序
+    以键为索引的字典保存记录，查找、更新和删除均为O(1)；
+    每个操作都是单个字典操作，遍历时先复制，多线程读写无需额外加锁
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._records: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, key_value: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(key_value)
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        """存在相同键时原位替换，否则追加"""
+        self._records[record[self.key]] = record
+
+    def delete(self, key_value: str) -> bool:
+        return self._records.pop(key_value, None) is not None
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._records.values()))
+
+
+class SQLiteDatabase:
+    """
+    SQLite连接管理：每个线程一个连接，开启WAL以支持读写并发
+    多个进程（如gunicorn的多个worker）可以同时打开同一个数据库文件
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS notifications (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL,
+            epoch INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            title TEXT,
+            content TEXT,
+            type TEXT,
+            priority TEXT,
+            source TEXT,
+            callback_url TEXT,
+            metadata TEXT,
+            size INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_notifications_id ON notifications (id);
+        CREATE INDEX IF NOT EXISTS idx_notifications_epoch ON notifications (epoch);
+        CREATE TABLE IF NOT EXISTS tokens (
+            notify_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS external_tokens (
+            notify_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS subscribers (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    # 计数类元数据，初始为0
+    COUNTERS = ('version', 'bytes', 'evicted_seq', 'evicted_epoch', 'evicted_count', 'evicted_age', 'evicted_bytes')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        conn = self.connection()
+        conn.executescript(self.SCHEMA)
+        # 旧版本创建的数据库没有size列
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(notifications)')]
+        if 'size' not in columns:
+            conn.execute('ALTER TABLE notifications ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', ?)",
+            (uuid.uuid4().hex[:8],)
+        )
+        conn.executemany("INSERT OR IGNORE INTO meta (key, value) VALUES (?, 0)", [(key,) for key in self.COUNTERS])
+
+    def connection(self) -> sqlite3.Connection:
+        # fork出的子进程不能沿用父进程的连接，按进程重新建立
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: 单条语句自动提交，批量写入显式开启事务
+            # cached_statements: 复用预编译语句，热点查询不再重复解析SQL
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_counters(self) -> Dict[str, int]:
+        placeholders = ', '.join('?' * len(self.COUNTERS))
+        rows = self.connection().execute(f'SELECT key, value FROM meta WHERE key IN ({placeholders})', self.COUNTERS)
+        return {key: int(value) for key, value in rows}
+
+    def claim(self, key: str) -> bool:
+        """原子地占用一个标记，同一数据库上只有第一次调用返回True（跨进程）"""
+        return self.connection().execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES (?, 1)", (f'claimed:{key}',)
+        ).rowcount == 1
+
+
+class SQLiteNotificationStore:
+    """
+    SQLite通知表，接口与NotificationStore一致
+
+    每行保存近似字节数，总字节数与淘汰统计记在meta表中，和写入在同一事务里更新，
+    多个进程共享同一个数据库时也保持一致。
+    """
+
+    COLUMNS = 'seq, id, timestamp, title, content, type, priority, source, callback_url, metadata'
+
+    # epoch取与当前最大值中的较大者，保证时间索引随序号非递减（同NotificationStore）
+    INSERT_SQL = """
+        INSERT INTO notifications
+            (id, epoch, timestamp, title, content, type, priority, source, callback_url, metadata, size)
+        VALUES (?, MAX(?, IFNULL((SELECT MAX(epoch) FROM notifications), 0)), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    SELECT_AFTER_SQL = f'SELECT {COLUMNS} FROM notifications WHERE seq > ? ORDER BY seq LIMIT ?'
+    SELECT_BY_ID_SQL = f'SELECT {COLUMNS} FROM notifications WHERE id = ? ORDER BY seq LIMIT 1'
+    FIRST_AFTER_EPOCH_SQL = 'SELECT seq FROM notifications WHERE epoch > ? ORDER BY epoch, seq LIMIT 1'
+    BUMP_VERSION_SQL = "UPDATE meta SET value = value + 1 WHERE key = 'version'"
+    VERSION_SQL = "SELECT value FROM meta WHERE key = 'version'"
+    ADD_COUNTER_SQL = 'UPDATE meta SET value = value + ? WHERE key = ?'
+    EVICTED_SQL = ('SELECT COUNT(*), IFNULL(SUM(size), 0), MAX(seq), MAX(epoch) '
+                   'FROM notifications WHERE seq <= ?')
+    OLDEST_SIZES_SQL = 'SELECT seq, size FROM notifications ORDER BY seq'
+    AGE_CUTOFF_SQL = 'SELECT MAX(seq) FROM notifications WHERE epoch < ?'
+    GAP_SQL = "SELECT key, value FROM meta WHERE key IN ('evicted_seq', 'evicted_epoch')"
+
+    def __init__(self, db: SQLiteDatabase, retention: Optional[RetentionPolicy] = None):
+        self._db = db
+        self.retention = retention or RetentionPolicy()
+        self._generation = db.get_meta('generation')
+        # 其他进程写入同一数据库时收不到本进程的信号，定期重新检查
+        self.changed = ChangeNotifier(recheck=SQLITE_CHANGE_RECHECK)
+
+    @staticmethod
+    def _to_row(notification: Notification) -> tuple:
+        metadata = notification.metadata_json
+        epoch = notification.epoch
+        row = (
+            notification.id,
+            epoch if epoch is not None else parse_timestamp(notification.timestamp),
+            notification.timestamp,
+            notification.title,
+            notification.content,
+            notification.type,
+            notification.priority,
+            notification.source,
+            notification.callback_url,
+            metadata.decode() if metadata is not None else None,
+        )
+        # 近似字节数，与estimate_size口径一致：文本字段长度加metadata的JSON长度
+        size = sum(len(value) for value in row if isinstance(value, str))
+        return row + (size,)
+
+    @staticmethod
+    def _from_row(row: tuple) -> Notification:
+        seq, id_, timestamp, title, content, type_, priority, source, callback_url, metadata = row
+        notification = Notification(
+            id=id_,
+            title=title,
+            content=content,
+            type=type_,
+            priority=priority,
+            timestamp=timestamp,
+            source=source,
+            callback_url=callback_url,
+            seq=seq
+        )
+        # metadata保持编码形式，读取时才解码
+        notification.metadata_json = metadata.encode() if metadata is not None else None
+        return notification
+
+    def append(self, notification: Notification) -> None:
+        self.extend([notification])
+
+    def extend(self, notifications: Iterable[Notification]) -> None:
+        conn = self._db.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            added = 0
+            for notification in notifications:
+                row = self._to_row(notification)
+                notification.seq = conn.execute(self.INSERT_SQL, row).lastrowid
+                added += row[-1]
+            conn.execute(self.ADD_COUNTER_SQL, (added, 'bytes'))
+            conn.execute(self.BUMP_VERSION_SQL)
+            if self.retention.enabled:
+                self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.changed.notify()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按保留策略删除最旧的通知，至少保留最新的一条；调用方已开启事务"""
+        policy = self.retention
+        last = conn.execute('SELECT MAX(seq) FROM notifications').fetchone()[0]
+        if last is None:
+            return
+        if policy.max_count:
+            self._evict_through(conn, min(last - policy.max_count, last - 1), 'count')
+        if policy.max_age:
+            cutoff = int((time.time() - policy.max_age) * 1000000)
+            seq = conn.execute(self.AGE_CUTOFF_SQL, (cutoff,)).fetchone()[0]
+            if seq is not None:
+                self._evict_through(conn, min(seq, last - 1), 'age')
+        if policy.max_bytes:
+            excess = int(conn.execute("SELECT value FROM meta WHERE key = 'bytes'").fetchone()[0]) - policy.max_bytes
+            if excess > 0:
+                through = None
+                for seq, size in conn.execute(self.OLDEST_SIZES_SQL):
+                    if excess <= 0 or seq >= last:
+                        break
+                    through = seq
+                    excess -= size
+                if through is not None:
+                    self._evict_through(conn, through, 'bytes')
+
+    def _evict_through(self, conn: sqlite3.Connection, seq: int, reason: str) -> None:
+        count, size, max_seq, max_epoch = conn.execute(self.EVICTED_SQL, (seq,)).fetchone()
+        if not count:
+            return
+        conn.execute('DELETE FROM notifications WHERE seq <= ?', (seq,))
+        conn.executemany(self.ADD_COUNTER_SQL, [(-size, 'bytes'), (count, f'evicted_{reason}')])
+        conn.executemany("UPDATE meta SET value = ? WHERE key = ?",
+                         [(max_seq, 'evicted_seq'), (max_epoch, 'evicted_epoch')])
+
+    def get(self, notification_id: str) -> Optional[Notification]:
+        row = self._db.connection().execute(self.SELECT_BY_ID_SQL, (notification_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def clear(self) -> None:
+        conn = self._db.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM notifications')
+            conn.execute("UPDATE meta SET value = 0 WHERE key = 'bytes'")
+            conn.execute(self.BUMP_VERSION_SQL)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.changed.notify()
+
+    @property
+    def version(self) -> int:
+        """通知表版本，每次写入递增，多个连接间共享"""
+        return int(self._db.connection().execute(self.VERSION_SQL).fetchone()[0])
+
+    @property
+    def generation(self) -> str:
+        return self._generation
+
+    @property
+    def last_seq(self) -> int:
+        row = self._db.connection().execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'notifications'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def seq_before(self, since_epoch: Optional[int]) -> int:
+        conn = self._db.connection()
+        if since_epoch is None:
+            row = conn.execute('SELECT MIN(seq) FROM notifications').fetchone()
+            first_seq = row[0]
+        else:
+            row = conn.execute(self.FIRST_AFTER_EPOCH_SQL, (since_epoch,)).fetchone()
+            first_seq = row[0] if row else None
+        if first_seq is None:
+            return self.last_seq
+        return first_seq - 1
+
+    def after(self, seq: int, limit: int = 10) -> List[Notification]:
+        rows = self._db.connection().execute(self.SELECT_AFTER_SQL, (seq, max(limit, 0))).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def iter_after(self, seq: int, limit: int = 10) -> Iterator[Notification]:
+        """逐行读取，不一次性取出全部结果"""
+        rows = self._db.connection().execute(self.SELECT_AFTER_SQL, (seq, max(limit, 0)))
+        return (self._from_row(row) for row in rows)
+
+    def since(self, since_epoch: Optional[int] = None, limit: int = 10) -> List[Notification]:
+        return self.after(self.seq_before(since_epoch), limit)
+
+    def retention_gap(self, seq: int, since_epoch: Optional[int] = None) -> bool:
+        evicted = {key: int(value) for key, value in self._db.connection().execute(self.GAP_SQL)}
+        if since_epoch is not None:
+            return since_epoch < evicted['evicted_epoch']
+        return seq < evicted['evicted_seq']
+
+    def retention_stats(self) -> Dict[str, Any]:
+        counters = self._db.get_counters()
+        return {
+            'policy': asdict(self.retention),
+            'count': len(self),
+            'bytes': counters['bytes'],
+            'evicted': {reason: counters[f'evicted_{reason}'] for reason in ('count', 'age', 'bytes')},
+            'evicted_through_seq': counters['evicted_seq']
+        }
+
+    def encode_cursor(self, seq: int) -> str:
+        return encode_cursor(self._generation, seq)
+
+    def decode_cursor(self, cursor: str) -> int:
+        return decode_cursor(self._generation, cursor)
+
+    def __len__(self) -> int:
+        return self._db.connection().execute('SELECT COUNT(*) FROM notifications').fetchone()[0]
+
+    def __iter__(self) -> Iterator[Notification]:
+        rows = self._db.connection().execute(f'SELECT {self.COLUMNS} FROM notifications ORDER BY seq')
+        return (self._from_row(row) for row in rows)
+
+
+class SQLiteRecordStore:
+    """SQLite记录表，接口与RecordStore一致；记录以JSON保存，键字段为主键"""
+
+    def __init__(self, db: SQLiteDatabase, table: str, key: str):
+        self._db = db
+        self.key = key
+        self._select_sql = f'SELECT data FROM {table} WHERE {key} = ?'
+        self._upsert_sql = (
+            f'INSERT INTO {table} ({key}, data) VALUES (?, ?) '
+            f'ON CONFLICT ({key}) DO UPDATE SET data = excluded.data'
+        )
+        self._delete_sql = f'DELETE FROM {table} WHERE {key} = ?'
+        self._clear_sql = f'DELETE FROM {table}'
+        self._count_sql = f'SELECT COUNT(*) FROM {table}'
+        self._all_sql = f'SELECT data FROM {table} ORDER BY rowid'
+
+    def get(self, key_value: str) -> Optional[Dict[str, Any]]:
+        row = self._db.connection().execute(self._select_sql, (key_value,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        self._db.connection().execute(
+            self._upsert_sql, (record[self.key], json.dumps(record, ensure_ascii=False))
+        )
+
+    def delete(self, key_value: str) -> bool:
+        return self._db.connection().execute(self._delete_sql, (key_value,)).rowcount > 0
+
+    def clear(self) -> None:
+        self._db.connection().execute(self._clear_sql)
+
+    def __len__(self) -> int:
+        return self._db.connection().execute(self._count_sql).fetchone()[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        rows = self._db.connection().execute(self._all_sql).fetchall()
+        return (json.loads(row[0]) for row in rows)
+
+
+class Storage:
+    """存储仓库：路由通过它访问所有数据表"""
+
+    def __init__(self, backend: str, notifications, tokens, external_tokens, subscribers,
+                 db: Optional[SQLiteDatabase] = None):
+        self.backend = backend
+        self.db = db
+        self.notifications = notifications
+        self.tokens = tokens  # 主动模式已验证的token
+        self.external_tokens = external_tokens  # 外部API token
+        self.subscribers = subscribers
+
+    def claim(self, key: str) -> bool:
+        """一次性任务的占用标记：共享存储上只有一个进程能占用，进程内存储总是可以"""
+        return self.db.claim(key) if self.db is not None else True
+
+
+def create_storage(backend: str = 'memory', sqlite_path: str = 'demo.db',
+                   retention: Optional[RetentionPolicy] = None) -> Storage:
+    """按名称创建存储后端，retention为通知表的保留策略"""
+    if backend == 'memory':
+        return Storage(
+            backend,
+            notifications=NotificationStore(retention),
+            tokens=RecordStore('notify_id'),
+            external_tokens=RecordStore('notify_id'),
+            subscribers=RecordStore('id')
+        )
+    if backend == 'sqlite':
+        db = SQLiteDatabase(sqlite_path)
+        return Storage(
+            backend,
+            notifications=SQLiteNotificationStore(db, retention),
+            tokens=SQLiteRecordStore(db, 'tokens', 'notify_id'),
+            external_tokens=SQLiteRecordStore(db, 'external_tokens', 'notify_id'),
+            subscribers=SQLiteRecordStore(db, 'subscribers', 'id'),
+            db=db
+        )
+    raise ValueError(f"不支持的存储后端: {backend}")
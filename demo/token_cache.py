@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推送token缓存 - 记录token的过期时间，到期前在后台提前刷新；
+同一notify_id的并发验证合并为一次上游调用，所有等待方共享结果
+"""
+
+import base64
+import binascii
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from notification_store import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+DURATION_UNITS = {
+    '': 1, 's': 1, 'sec': 1, '秒': 1,
+    'm': 60, 'min': 60, '分': 60, '分钟': 60,
+    'h': 3600, '小时': 3600, '时': 3600,
+    'd': 86400, 'day': 86400, 'days': 86400, '天': 86400, '日': 86400,
+}
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """读取JWT载荷中的exp（epoch秒），不校验签名；不是JWT或没有exp时返回None"""
+    parts = token.split('.') if isinstance(token, str) else []
+    if len(parts) != 3:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    exp = payload.get('exp') if isinstance(payload, dict) else None
+    return float(exp) if isinstance(exp, (int, float)) and not isinstance(exp, bool) else None
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """解析时长（秒）：数字，或 '3600'、'30m'、'7d'、'30天' 这样的字符串"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([^\d\s]*)\s*', value.lower())
+    if not match or match.group(2) not in DURATION_UNITS:
+        return None
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def token_expiry(token: str, info: Optional[Dict[str, Any]], default_ttl: float = 0,
+                 now: Optional[float] = None) -> Optional[float]:
+    """
+    token的过期时间（epoch秒），依次取：JWT的exp、响应中的expiresAt、响应中的expiresIn、default_ttl；
+    都没有时返回None，表示过期时间未知
+    """
+    now = time.time() if now is None else now
+    expiry = jwt_expiry(token)
+    if expiry is not None:
+        return expiry
+    info = info or {}
+    if isinstance(info.get('expiresAt'), str):
+        try:
+            return parse_timestamp(info['expiresAt']) / 1000000
+        except ValueError:
+            pass
+    duration = parse_duration(info.get('expiresIn'))
+    if duration is not None:
+        return now + duration
+    return now + default_ttl if default_ttl > 0 else None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同一个键同一时刻只执行一次函数，并发的调用方等待并共享结果（或异常）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.shared = 0  # 等待并共享了他人结果的调用次数
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class TokenCache:
+    """
+    主动推送token缓存
+
+    token记录保存在store（tokens_db）中，多个worker共享；记录中的 expires_at 为过期时间
+    （epoch秒，None表示未知，视为长期有效）。verify(notify_id, notify_code, source) 调用上游验证，
+    返回 (新记录, 验证结果)，失败时抛出异常。
+
+    - get(): 返回未过期的记录；距离过期不足refresh_margin秒时在后台提前刷新，调用方不等待
+    - verify(): 同一notify_id的并发验证只发起一次上游调用；在等待期间已有其他调用方
+      （或其他worker）写入了有效token时直接使用
+    """
+
+    def __init__(self, store, verify: Callable[[str, str, str], Tuple[Dict[str, Any], Any]],
+                 refresh_margin: float = 300, retry_interval: float = 30, refresh_workers: int = 2):
+        self.store = store
+        self._verify = verify
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval  # 后台刷新失败后，同一token再次尝试的间隔
+        self._flight = SingleFlight()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='token-refresh')
+        self._refresh_attempts: Dict[str, float] = {}  # notify_id -> 上次后台刷新时间
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'verifies': 0, 'refreshes': 0, 'refresh_failures': 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def needs_refresh(self, record: Dict[str, Any], now: Optional[float] = None) -> bool:
+        expires_at = record.get('expires_at')
+        return expires_at is not None and expires_at - (time.time() if now is None else now) <= self.refresh_margin
+
+    @staticmethod
+    def expired(record: Dict[str, Any], now: Optional[float] = None) -> bool:
+        expires_at = record.get('expires_at')
+        return expires_at is not None and expires_at <= (time.time() if now is None else now)
+
+    def get(self, notify_id: str) -> Optional[Dict[str, Any]]:
+        """返回未过期的token记录，没有或已过期时返回None"""
+        record = self.store.get(notify_id)
+        if record is None:
+            self._count('misses')
+            return None
+        now = time.time()
+        if self.expired(record, now):
+            self._count('expired')
+            return None
+        self._count('hits')
+        if self.needs_refresh(record, now):
+            self._schedule_refresh(record, now)
+        return record
+
+    def verify(self, notify_id: str, notify_code: str, source: str) -> Tuple[Dict[str, Any], Any]:
+        """验证notify_code获取token并保存，返回 (记录, 验证结果)；等待期间已有有效token时验证结果为None"""
+        def run():
+            # 排队等待期间可能已有其他调用方（或其他worker）完成验证
+            record = self.store.get(notify_id)
+            if record is not None and not self.needs_refresh(record):
+                return record, None
+            self._count('verifies')
+            record, verify_result = self._verify(notify_id, notify_code, source)
+            self.store.upsert(record)
+            return record, verify_result
+
+        return self._flight.do(notify_id, run)
+
+    def invalidate(self, notify_id: str) -> None:
+        """上游拒绝了token（如401）时标记为已过期，下次使用时重新验证"""
+        record = self.store.get(notify_id)
+        if record is not None:
+            self.store.upsert(dict(record, expires_at=0))
+
+    def _schedule_refresh(self, record: Dict[str, Any], now: float) -> None:
+        notify_id = record['notify_id']
+        if not record.get('notify_code') or self._flight.in_flight(notify_id):
+            return
+        with self._lock:
+            if now - self._refresh_attempts.get(notify_id, 0) < self.retry_interval:
+                return
+            self._refresh_attempts[notify_id] = now
+        self._refresher.submit(self._refresh, record)
+
+    def _refresh(self, record: Dict[str, Any]) -> None:
+        notify_id = record['notify_id']
+        try:
+            self.verify(notify_id, record['notify_code'], record.get('third_party_name'))
+            self._count('refreshes')
+            logger.info(f"token已提前刷新: {notify_id}")
+        except Exception as e:
+            self._count('refresh_failures')
+            logger.warning(f"token提前刷新失败，将在{self.retry_interval:.0f}秒后重试: {notify_id} - {e}")
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        return dict(stats, shared_verifies=self._flight.shared)
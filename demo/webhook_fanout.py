@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Webhook扇出 - 把新通知推送给所有订阅者的webhook
+所有订阅者共用一组后台线程；每个订阅者有自己的待发送队列，同一时刻只由一个线程处理，
+保证按通知顺序送达。慢或故障的订阅者只阻塞自己的队列，失败按有上限的指数退避重试
+"""
+
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _SubscriberState:
+    """单个订阅者的待发送队列和统计"""
+
+    def __init__(self, subscriber: Dict[str, Any], latency_samples: int):
+        self.subscriber = subscriber
+        self.pending = deque()  # (入队时间, 请求体)
+        self.scheduled = False  # 已在就绪队列、发送中或等待重试
+        self.attempts = 0  # 队首事件已尝试的次数
+        self.removed = False
+        self.samples = deque(maxlen=latency_samples)  # (完成时间, 延迟秒数)
+        self.last_error: Optional[str] = None
+        self.stats = {'published': 0, 'delivered': 0, 'failed': 0, 'retried': 0, 'dropped': 0}
+
+
+class WebhookFanout:
+    """
+    按订阅者保序的webhook扇出
+
+    send(subscriber, body) 发送一个事件，失败时抛出异常；is_retryable(exc) 判断是否重试。
+    每个订阅者最多积压max_pending个事件，超出时丢弃最旧的事件。
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any], bytes], Any],
+                 is_retryable: Callable[[Exception], bool] = lambda exc: True,
+                 workers: int = 16, max_pending: int = 1000, max_attempts: int = 5,
+                 base_delay: float = 0.5, max_delay: float = 30.0, latency_samples: int = 1000):
+        self._send = send
+        self._is_retryable = is_retryable
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_samples = latency_samples
+
+        self._cond = threading.Condition()
+        self._ready = deque()  # 待处理的订阅者
+        self._delayed = []  # (到期时间, 序号, 订阅者) 小顶堆
+        self._delayed_counter = 0
+        self._subscribers: Dict[str, _SubscriberState] = {}
+        self._threads = []
+        self._stopping = False
+        # 进程内累计统计，删除订阅者后不减少，供计数器类指标使用
+        self.stats = {'published': 0, 'delivered': 0, 'failed': 0, 'retried': 0, 'dropped': 0}
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'webhook-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def publish(self, subscribers: Iterable[Dict[str, Any]], body: bytes) -> int:
+        """把同一个请求体加入每个订阅者的队列，返回订阅者数"""
+        count = 0
+        enqueued_at = time.monotonic()
+        with self._cond:
+            for subscriber in subscribers:
+                state = self._subscribers.get(subscriber['id'])
+                if state is None:
+                    state = self._subscribers[subscriber['id']] = _SubscriberState(subscriber, self.latency_samples)
+                state.subscriber = subscriber  # 订阅者地址可能已更新
+                if len(state.pending) >= self.max_pending:
+                    state.pending.popleft()
+                    state.attempts = 0
+                    self._count(state, 'dropped')
+                state.pending.append((enqueued_at, body))
+                self._count(state, 'published')
+                if not state.scheduled:
+                    state.scheduled = True
+                    self._ready.append(state)
+                count += 1
+            self._cond.notify(min(count, self.workers))
+        return count
+
+    def remove(self, subscriber_id: str) -> None:
+        """删除订阅者并丢弃其待发送事件"""
+        with self._cond:
+            state = self._subscribers.pop(subscriber_id, None)
+            if state is not None:
+                state.removed = True
+                state.pending.clear()
+
+    def clear(self) -> None:
+        with self._cond:
+            for state in self._subscribers.values():
+                state.removed = True
+                state.pending.clear()
+            self._subscribers.clear()
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间：指数退避，在[0, 上限]内随机抖动"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def metrics(self, subscriber_id: Optional[str] = None) -> Dict[str, Any]:
+        """单个订阅者的统计；不指定时返回全部订阅者及汇总"""
+        with self._cond:
+            if subscriber_id is not None:
+                state = self._subscribers.get(subscriber_id)
+                return self._metrics(state) if state else None
+            per_subscriber = {sub_id: self._metrics(state) for sub_id, state in self._subscribers.items()}
+        totals = {key: sum(m[key] for m in per_subscriber.values())
+                  for key in ('published', 'delivered', 'failed', 'retried', 'dropped', 'pending')}
+        return {'subscribers': per_subscriber, 'totals': totals}
+
+    def _metrics(self, state: _SubscriberState) -> Dict[str, Any]:
+        latencies = sorted(latency for _, latency in state.samples)
+        metrics = dict(state.stats, pending=len(state.pending), last_error=state.last_error)
+        if latencies:
+            window = state.samples[-1][0] - state.samples[0][0]
+            metrics.update(
+                latency_p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+                latency_p99_ms=round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 1),
+                latency_max_ms=round(latencies[-1] * 1000, 1),
+                throughput_per_sec=round(len(latencies) / window, 1) if window > 0 else None
+            )
+        return metrics
+
+    def _count(self, state: _SubscriberState, key: str) -> None:
+        # 调用方持有锁
+        state.stats[key] += 1
+        self.stats[key] += 1
+
+    def _next(self) -> Optional[_SubscriberState]:
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[2])
+                while self._ready:
+                    state = self._ready.popleft()
+                    if state.pending and not state.removed:
+                        return state
+                    state.scheduled = False
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._cond.wait(timeout)
+            return None
+
+    def _run(self) -> None:
+        while True:
+            state = self._next()
+            if state is None:
+                return
+            self._attempt(state)
+
+    def _reschedule(self, state: _SubscriberState) -> None:
+        # 调用方持有锁
+        if state.pending and not state.removed:
+            self._ready.append(state)
+            self._cond.notify()
+        else:
+            state.scheduled = False
+
+    def _attempt(self, state: _SubscriberState) -> None:
+        with self._cond:
+            if not state.pending or state.removed:
+                state.scheduled = False
+                return
+            event = state.pending[0]
+            subscriber = state.subscriber
+            state.attempts += 1
+            attempts = state.attempts
+
+        enqueued_at, body = event
+        try:
+            self._send(subscriber, body)
+        except Exception as e:
+            retry = self._is_retryable(e) and attempts < self.max_attempts
+            with self._cond:
+                state.last_error = str(e)
+                # 发送期间事件可能已因积压被丢弃
+                if not state.pending or state.pending[0] is not event:
+                    self._reschedule(state)
+                    return
+                if retry and not state.removed:
+                    delay = self.backoff(attempts)
+                    self._count(state, 'retried')
+                    self._delayed_counter += 1
+                    heapq.heappush(self._delayed, (time.monotonic() + delay, self._delayed_counter, state))
+                    self._cond.notify()
+                else:
+                    state.pending.popleft()
+                    state.attempts = 0
+                    self._count(state, 'failed')
+                    self._reschedule(state)
+            if retry:
+                logger.warning(f"webhook发送失败，{delay:.2f}秒后重试 ({attempts}/{self.max_attempts}): "
+                               f"{subscriber['id']} - {e}")
+            else:
+                logger.error(f"webhook发送失败，不再重试: {subscriber['id']} - {e}")
+            return
+
+        finished_at = time.monotonic()
+        with self._cond:
+            if state.pending and state.pending[0] is event:
+                state.pending.popleft()
+                state.attempts = 0
+            self._count(state, 'delivered')
+            state.samples.append((finished_at, finished_at - enqueued_at))
+            self._reschedule(state)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(state.pending) for state in self._subscribers.values())
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI入口 - 供gunicorn等WSGI服务器加载
+多worker部署时每个worker各自导入本模块，通知、token等数据通过sqlite后端共享：
+
+    STORAGE_BACKEND=sqlite gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import app, init_sample_data
+
+# 共享存储上只有第一个启动的worker会写入示例数据
+init_sample_data()